@@ -1,23 +1,33 @@
 import sys
 
+import numpy as np
+
 from pypregel import Pypregel
 from pypregel.vertex import Vertex, Edge
 from pypregel.reader import Reader
+from pypregel.binary import BinaryReader
 from pypregel.writer import Writer
-from pypregel.combiner import Combiner
+from pypregel.combiner import SumCombiner
+from pypregel.aggregator import SumAggregator
+
+
+MAX_SUPERSTEPS = 30
+
+# stop when the L1 norm of the change of all values is below EPSILON
+EPSILON = 1e-3
 
 
 class PageRankVertex(Vertex):
     def compute(self):
         if self.superstep() >= 1:
-            s = 0
-            while self.has_message():
-                msg = self.get_message()
-                s += msg
+            s = sum(self.get_messages())
+            value = 0.15 / self.get_num_of_vertices() + 0.85 * s
+            if self.get_value() is not None:
+                self.aggregate("delta", abs(value - self.get_value()))
 
-            self.set_value(0.15 / self.get_num_of_vertices() + 0.85 * s)
+            self.set_value(value)
 
-        if self.superstep() < 30:
+        if self.superstep() < MAX_SUPERSTEPS:
             n = len(self.get_out_edges())
             if n > 0:
                 self.send_message_to_all_neighbors(self.get_value() / n)
@@ -51,25 +61,45 @@ class PageRankWriter(Writer):
         return vertex.get_vertex_id(), str(vertex.get_value())
 
 
-class PageRankCombiner(Combiner):
-    def combine(self, msg_x, msg_y):
-        msg_x_value = msg_x[1]
-        msg_y_value = msg_y[1]
-        return None, msg_x_value + msg_y_value
+def converged(superstep, aggregated_values):
+    # no vertex has a previous value in the first superstep
+    return superstep >= 2 and aggregated_values["delta"] < EPSILON
 
 
 def main():
     if len(sys.argv) < 4:
-        print("usage: python %s [config] [graph] [out_file]" % sys.argv[0])
+        print("usage: python %s [config] [graph] [out_file] [engine] "
+              "[metrics_file]" % sys.argv[0])
         return
 
-    pagerank_reader = PageRankReader(sys.argv[1], sys.argv[2])
+    # "mpi" (default) under mpirun, or "local" in this process
+    engine = sys.argv[4] if len(sys.argv) >= 5 else "mpi"
+
+    # the metrics of every superstep are written as JSON if given
+    metrics_file = sys.argv[5] if len(sys.argv) >= 6 else None
+
+    # a binary graph file from `python -m pypregel.convert` is memory-mapped
+    # and loaded by all workers in parallel; it needs no config file
+    binary = sys.argv[2].endswith(".bin")
+    if binary:
+        pagerank_reader = BinaryReader(sys.argv[2], PageRankVertex)
+    else:
+        pagerank_reader = PageRankReader(sys.argv[1], sys.argv[2])
+
     pagerank_writer = PageRankWriter(sys.argv[3])
-    pagerank_combiner = PageRankCombiner()
+    pagerank_combiner = SumCombiner()
     pagerank = Pypregel(
         reader=pagerank_reader,
         writer=pagerank_writer,
-        combiner=pagerank_combiner
+        combiner=pagerank_combiner,
+        msg_dtype=np.float64,
+        anonymous_messages=True,
+        storage="csr" if binary else "object",
+        parallel_load=binary and engine == "mpi",
+        engine=engine,
+        metrics_file=metrics_file,
+        aggregators={"delta": SumAggregator()},
+        halt_condition=converged
     )
 
     pagerank.run()
@@ -0,0 +1,73 @@
+import sys
+
+import numpy as np
+
+from pypregel import Pypregel
+from pypregel.binary import BinaryReader
+from pypregel.combiner import SumCombiner
+from pypregel.aggregator import SumAggregator
+from pypregel.program import PartitionProgram
+
+from pagerank import MAX_SUPERSTEPS, PageRankReader, PageRankVertex, \
+    PageRankWriter, converged
+
+
+class PageRankProgram(PartitionProgram):
+    value_dtype = np.float64
+
+    def compute(self, partition):
+        # the same supersteps as PageRankVertex, for all vertices at once
+        values = 0.15 / partition.num_of_vertices + 0.85 * partition.messages
+
+        if partition.superstep >= 2:
+            partition.aggregate(
+                "delta", np.abs(values - partition.values).sum().item()
+            )
+
+        if partition.superstep >= MAX_SUPERSTEPS:
+            return values, np.zeros(len(values), dtype=bool), None, None
+
+        degrees = partition.degrees
+        msg_values = np.repeat(values / np.maximum(degrees, 1), degrees)
+
+        return values, np.ones(len(values), dtype=bool), \
+            partition.dst, msg_values
+
+
+def main():
+    if len(sys.argv) < 4:
+        print("usage: python %s [config] [graph] [out_file] [engine] "
+              "[metrics_file]" % sys.argv[0])
+        return
+
+    # "mpi" (default) under mpirun, or "local" in this process
+    engine = sys.argv[4] if len(sys.argv) >= 5 else "mpi"
+
+    # the metrics of every superstep are written as JSON if given
+    metrics_file = sys.argv[5] if len(sys.argv) >= 6 else None
+
+    binary = sys.argv[2].endswith(".bin")
+    if binary:
+        pagerank_reader = BinaryReader(sys.argv[2], PageRankVertex)
+    else:
+        pagerank_reader = PageRankReader(sys.argv[1], sys.argv[2])
+
+    pagerank = Pypregel(
+        reader=pagerank_reader,
+        writer=PageRankWriter(sys.argv[3]),
+        combiner=SumCombiner(),
+        msg_dtype=np.float64,
+        storage="csr",
+        parallel_load=binary and engine == "mpi",
+        engine=engine,
+        metrics_file=metrics_file,
+        aggregators={"delta": SumAggregator()},
+        halt_condition=converged,
+        program=PageRankProgram()
+    )
+
+    pagerank.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,13 @@
 import sys
 
+import numpy as np
+
 from pypregel import Pypregel
 from pypregel.vertex import Vertex, Edge
 from pypregel.reader import Reader
+from pypregel.binary import BinaryReader
 from pypregel.writer import Writer
-from pypregel.combiner import Combiner
+from pypregel.combiner import MinCombiner
 
 
 INT_MAX = 1e10
@@ -16,20 +19,17 @@ class SSSPVertex(Vertex):
         if self.superstep() == 1:
             if self.get_vertex_id() == START_VERTEX_ID:
                 self.set_value(0)
-                for e in self.get_out_edges():
-                    self.send_message_to_vertex(e.get_dst_vid(), e.get_value())
+                dst_vids, weights = self.get_out_edge_arrays()
+                self.send_messages(dst_vids, weights)
             else:
                 self.set_value(INT_MAX)
         else:
-            mm = INT_MAX
-            while self.has_message():
-                msg = self.get_message()
-                mm = min(mm, msg)
+            mm = min(self.get_messages(), default=INT_MAX)
 
             if self.get_value() > mm:
                 self.set_value(mm)
-                for e in self.get_out_edges():
-                    self.send_message_to_vertex(e.get_dst_vid(), mm + e.get_value())
+                dst_vids, weights = self.get_out_edge_arrays()
+                self.send_messages(dst_vids, mm + weights)
 
         self.vote_to_halt()
 
@@ -57,28 +57,47 @@ class SSSPReader(Reader):
 
 class SSSPWriter(Writer):
     def write_vertex(self, vertex):
-        return vertex.get_vertex_id(), str(vertex.get_value())
-
+        # unreachable vertices are written as INT_MAX, also when their
+        # distance is an int64 of sssp_program.py
+        value = vertex.get_value()
+        if value >= INT_MAX:
+            value = INT_MAX
 
-class SSSPCombiner(Combiner):
-    def combine(self, msg_x, msg_y):
-        msg_x_value = msg_x[1]
-        msg_y_value = msg_y[1]
-        return None, min(msg_x_value, msg_y_value)
+        return vertex.get_vertex_id(), str(value)
 
 
 def main():
     if len(sys.argv) < 4:
-        print("usage: python %s [config] [graph] [out_file]" % sys.argv[0])
+        print("usage: python %s [config] [graph] [out_file] [engine] "
+              "[metrics_file]" % sys.argv[0])
         return
 
-    sssp_reader = SSSPReader(sys.argv[1], sys.argv[2])
+    # "mpi" (default) under mpirun, or "local" in this process
+    engine = sys.argv[4] if len(sys.argv) >= 5 else "mpi"
+
+    # the metrics of every superstep are written as JSON if given
+    metrics_file = sys.argv[5] if len(sys.argv) >= 6 else None
+
+    # a binary graph file from `python -m pypregel.convert` is memory-mapped
+    # and loaded by all workers in parallel; it needs no config file
+    binary = sys.argv[2].endswith(".bin")
+    if binary:
+        sssp_reader = BinaryReader(sys.argv[2], SSSPVertex)
+    else:
+        sssp_reader = SSSPReader(sys.argv[1], sys.argv[2])
+
     sssp_writer = SSSPWriter(sys.argv[3])
-    sssp_combiner = SSSPCombiner()
+    sssp_combiner = MinCombiner()
     sssp = Pypregel(
         reader=sssp_reader,
         writer=sssp_writer,
-        combiner=sssp_combiner
+        combiner=sssp_combiner,
+        msg_dtype=np.int64,
+        anonymous_messages=True,
+        storage="csr" if binary else "object",
+        parallel_load=binary and engine == "mpi",
+        engine=engine,
+        metrics_file=metrics_file
     )
 
     sssp.run()
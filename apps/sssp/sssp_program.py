@@ -0,0 +1,75 @@
+import sys
+
+import numpy as np
+
+from pypregel import Pypregel
+from pypregel.binary import BinaryReader
+from pypregel.combiner import MinCombiner
+from pypregel.program import PartitionProgram
+
+from sssp import INT_MAX, START_VERTEX_ID, SSSPReader, SSSPVertex, \
+    SSSPWriter
+
+
+class SSSPProgram(PartitionProgram):
+    value_dtype = np.int64
+
+    def compute(self, partition):
+        if partition.superstep == 1:
+            changed = partition.vids == START_VERTEX_ID
+            values = np.full(len(changed), INT_MAX, dtype=np.int64)
+            values[changed] = 0
+        else:
+            messages = partition.messages
+            changed = partition.has_messages & \
+                (messages < partition.values)
+            values = np.where(changed, messages, partition.values)
+
+        # the vertices whose distance changed relax their out edges
+        sources, edges = partition.get_edges(np.flatnonzero(changed))
+
+        # every vertex votes to halt
+        active = np.zeros(len(values), dtype=bool)
+
+        if len(edges) == 0:
+            return values, active, None, None
+
+        msg_values = values[sources] + partition.weights[edges]
+        return values, active, partition.dst[edges], msg_values
+
+
+def main():
+    if len(sys.argv) < 4:
+        print("usage: python %s [config] [graph] [out_file] [engine] "
+              "[metrics_file]" % sys.argv[0])
+        return
+
+    # "mpi" (default) under mpirun, or "local" in this process
+    engine = sys.argv[4] if len(sys.argv) >= 5 else "mpi"
+
+    # the metrics of every superstep are written as JSON if given
+    metrics_file = sys.argv[5] if len(sys.argv) >= 6 else None
+
+    binary = sys.argv[2].endswith(".bin")
+    if binary:
+        sssp_reader = BinaryReader(sys.argv[2], SSSPVertex)
+    else:
+        sssp_reader = SSSPReader(sys.argv[1], sys.argv[2])
+
+    sssp = Pypregel(
+        reader=sssp_reader,
+        writer=SSSPWriter(sys.argv[3]),
+        combiner=MinCombiner(),
+        msg_dtype=np.int64,
+        storage="csr",
+        parallel_load=binary and engine == "mpi",
+        engine=engine,
+        metrics_file=metrics_file,
+        program=SSSPProgram()
+    )
+
+    sssp.run()
+
+
+if __name__ == "__main__":
+    main()
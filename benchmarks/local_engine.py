@@ -0,0 +1,109 @@
+# compare the local engine (engine="local", one process, no MPI)
+# against the MPI engine on the example apps, including process startup;
+# uniform graphs are generated by pypregel.benchmark.graphs
+#
+# usage: python local_engine.py [num_vertices ...]
+#
+# environment variables:
+#     MPIRUN  the mpirun command, e.g. "mpirun --allow-run-as-root"
+#     NP      the number of MPI processes (default 2: a master and a worker)
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from pypregel.benchmark.graphs import uniform_graph, write_graph
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+APPS = {
+    "pagerank": os.path.join(ROOT, "apps", "pagerank", "pagerank.py"),
+    "sssp": os.path.join(ROOT, "apps", "sssp", "sssp.py"),
+}
+
+
+def gen_graph(app, num_vertices, graph_file, config_file):
+    """
+    write a uniform random graph of an app, weighted for sssp;
+    a graph_file ending with .bin is written in the binary format
+    """
+
+    graph = uniform_graph(num_vertices, weighted=app == "sssp", seed=0)
+    write_graph(graph_file, graph, config_file)
+
+
+def run(command, env):
+    """
+    run a command and return its wall time in seconds
+    """
+
+    start_time = time.time()
+    subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL)
+    return time.time() - start_time
+
+
+def read_output(output_file):
+    values = dict()
+    with open(output_file) as f:
+        for line in f:
+            vid, value = line.split()
+            values[int(vid)] = float(value)
+
+    return values
+
+
+def same(x, y):
+    """
+    check whether two outputs are equal up to rounding
+    """
+
+    if x.keys() != y.keys():
+        return False
+
+    return all(abs(x[k] - y[k]) <= 1e-9 * max(abs(x[k]), abs(y[k]), 1e-300)
+               or x[k] == y[k] for k in x)
+
+
+def main():
+    sizes = [int(x) for x in sys.argv[1:]] or [100, 10000, 50000]
+    mpirun = os.environ.get("MPIRUN", "mpirun").split()
+    num_procs = os.environ.get("NP", "2")
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+
+    print("%-9s %9s %10s %10s %8s %7s" %
+          ("app", "vertices", "mpi sec", "local sec", "speedup", "output"))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for app, script in APPS.items():
+            for n in sizes:
+                graph_file = os.path.join(tmp, "graph.txt")
+                config_file = os.path.join(tmp, "config.txt")
+                gen_graph(app, n, graph_file, config_file)
+
+                mpi_output = os.path.join(tmp, "mpi.txt")
+                local_output = os.path.join(tmp, "local.txt")
+
+                mpi_time = run(
+                    mpirun + ["-np", num_procs, sys.executable, script,
+                              config_file, graph_file, mpi_output, "mpi"],
+                    env
+                )
+                local_time = run(
+                    [sys.executable, script,
+                     config_file, graph_file, local_output, "local"],
+                    env
+                )
+
+                print("%-9s %9d %10.2f %10.2f %7.1fx %7s" %
+                      (app, n, mpi_time, local_time, mpi_time / local_time,
+                       "same" if same(read_output(mpi_output),
+                                      read_output(local_output))
+                       else "DIFF"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# compare the memory of one worker partition stored as
+# Vertex objects with lists of Edge objects ("object")
+# against the compact CSR arrays ("csr") on sssp graphs;
+# uniform weighted graphs are generated by pypregel.benchmark.graphs
+#
+# usage: python partition_memory.py [num_vertices]
+#        python partition_memory.py --file graph_file
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from pypregel.benchmark.graphs import uniform_graph, write_graph
+from pypregel.vertex import Vertex, Edge
+from pypregel.partition import _CSRPartition
+
+
+def read_lines(graph_file):
+    with open(graph_file) as f:
+        for line in f:
+            yield line
+
+
+def parse(line):
+    line = line.strip().split(':')
+    vertex_id = int(line[0])
+
+    edges = []
+    if line[1]:
+        for e in line[1].split(' '):
+            dst, weight = e.split(',')
+            edges.append(Edge(int(dst), int(weight)))
+
+    return Vertex(vertex_id, None, edges)
+
+
+def measure(lines, storage):
+    """
+    load all lines into one partition and return (traced bytes,
+    bytes of the CSR arrays, number of vertices, number of edges)
+    """
+
+    tracemalloc.start()
+
+    vertex_map = dict()
+    partition = _CSRPartition() if storage == "csr" else None
+    num_of_edges = 0
+
+    for line in lines:
+        v = parse(line)
+        num_of_edges += len(v.get_out_edges())
+        vertex_map[v.get_vertex_id()] = v
+        if partition is not None:
+            partition.add_vertex(v)
+
+    array_size = 0
+    if partition is not None:
+        partition.finalize()
+        array_size = partition.nbytes()
+
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return size, array_size, len(vertex_map), num_of_edges
+
+
+def compare(graph_file):
+    results = dict()
+    for storage in ("object", "csr"):
+        size, array_size, n, m = measure(read_lines(graph_file), storage)
+        results[storage] = size
+        print("%-6s vertices %d edges %d: %.1f MB, %.1f bytes/edge "
+              "(CSR arrays %.1f MB)" %
+              (storage, n, m, size / 2 ** 20, size / max(m, 1),
+               array_size / 2 ** 20))
+
+    print("csr uses %.1f%% of the object layout" %
+          (100.0 * results["csr"] / results["object"]))
+
+
+def main():
+    if len(sys.argv) >= 3 and sys.argv[1] == "--file":
+        compare(sys.argv[2])
+        return
+
+    num_vertices = int(sys.argv[1]) if len(sys.argv) >= 2 else 100000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        graph_file = os.path.join(tmp, "graph.txt")
+        write_graph(graph_file,
+                    uniform_graph(num_vertices, weighted=True, seed=0))
+        compare(graph_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# compare the partition programs (apps/*/..._program.py) against the
+# vertex programs of the example apps; both run with storage="csr" on
+# binary graphs generated by pypregel.benchmark.graphs, and the time of
+# the supersteps in the metrics files of the apps is compared
+#
+# usage: python partition_program.py [num_vertices ...]
+#
+# environment variables:
+#     MPIRUN  the mpirun command, e.g. "mpirun --allow-run-as-root"
+#     NP      the number of MPI processes (default 2: a master and a worker)
+#     ENGINE  "mpi" (default) or "local"
+import os
+import subprocess
+import sys
+import tempfile
+
+from local_engine import gen_graph, read_output, same
+from pypregel.benchmark.runner import read_metrics
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+APPS = {
+    "pagerank": (os.path.join(ROOT, "apps", "pagerank", "pagerank.py"),
+                 os.path.join(ROOT, "apps", "pagerank",
+                              "pagerank_program.py")),
+    "sssp": (os.path.join(ROOT, "apps", "sssp", "sssp.py"),
+             os.path.join(ROOT, "apps", "sssp", "sssp_program.py")),
+}
+
+
+def run(command, metrics_file, env):
+    """
+    run an app that writes metrics_file and return the seconds
+    of its supersteps
+    """
+
+    subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL)
+    return read_metrics(metrics_file)["compute_sec"]
+
+
+def main():
+    sizes = [int(x) for x in sys.argv[1:]] or [10000, 100000]
+    mpirun = os.environ.get("MPIRUN", "mpirun").split()
+    num_procs = os.environ.get("NP", "2")
+    engine = os.environ.get("ENGINE", "mpi")
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+
+    print("%-9s %9s %12s %12s %8s %7s" %
+          ("app", "vertices", "vertex sec", "program sec", "speedup",
+           "output"))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for app, scripts in APPS.items():
+            for n in sizes:
+                binary_file = os.path.join(tmp, "graph.bin")
+                config_file = os.path.join(tmp, "config.txt")
+                metrics_file = os.path.join(tmp, "metrics.json")
+                gen_graph(app, n, binary_file, config_file)
+
+                seconds = []
+                outputs = []
+                for i, script in enumerate(scripts):
+                    output_file = os.path.join(tmp, "out-%d.txt" % i)
+                    command = [sys.executable, script, config_file,
+                               binary_file, output_file, engine,
+                               metrics_file]
+                    if engine == "mpi":
+                        command = mpirun + ["-np", num_procs] + command
+
+                    seconds.append(run(command, metrics_file, env))
+                    outputs.append(read_output(output_file))
+
+                print("%-9s %9d %12.2f %12.2f %7.1fx %7s" %
+                      (app, n, seconds[0], seconds[1],
+                       seconds[0] / seconds[1],
+                       "same" if same(*outputs) else "DIFF"))
+
+
+if __name__ == "__main__":
+    main()
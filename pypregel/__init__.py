@@ -1,6 +1,12 @@
-from mpi4py import MPI
-from pypregel.master import _Master
-from pypregel.worker import _Worker
+import array
+import numpy as np
+import warnings
+
+from pypregel.aggregator import _AggregatorSet
+from pypregel.checkpoint import _Checkpointer
+from pypregel.local import _LocalEngine
+from pypregel.partitioner import HashPartitioner
+from pypregel.tuning import Tuning
 import time
 
 
@@ -9,15 +15,355 @@ class Pypregel:
     Pypregel is the app class and its object is a starter
     """
 
-    def __init__(self, reader, writer, combiner=None, rtt=0.001):
+    def __init__(self, reader, writer, combiner=None, rtt=None,
+                 storage="object", msg_dtype=None, aggregators=None,
+                 halt_condition=None, parallel_load=False, partitioner=None,
+                 write_mode="master", checkpoint_dir=None,
+                 checkpoint_interval=None, restart=False,
+                 dedicated_master=True, engine="mpi",
+                 anonymous_messages=False, program=None, metrics_file=None,
+                 metrics_format="json", hooks=None, hot_vertices=0,
+                 hot_vertex_interval=16, hub_threshold=None,
+                 message_budget=None, spill_dir=None, edge_dir=None,
+                 compression=None, compression_threshold=256, tuning=None):
+        """
+        :param reader: a Reader object
+        :param writer: a Writer object
+        :param combiner: a Combiner object or None
+        :param rtt: deprecated and ignored; a superstep ends as soon as
+            every message sent in it has been received, and the sizes
+            of batches are set by tuning
+        :param storage: "object" keeps a list of Edge objects per vertex;
+            "csr" keeps the out edges of a worker in compact NumPy arrays;
+            "disk" keeps them in files of the worker in the same layout
+            and reads the edges of the active vertices during each
+            superstep, which computes them in the order of the files
+        :param msg_dtype: a numeric NumPy dtype of all message values or None;
+            if given, remote messages are sent as NumPy arrays
+            instead of pickled objects
+        :param aggregators: a dict of name -> Aggregator object or None
+        :param halt_condition: a function (superstep, dict of name ->
+            aggregated value) -> Boolean called by the master after
+            each superstep, or None; the computation stops when it is True
+        :param parallel_load: Boolean; if True, every worker parses its own
+            byte range of the graph file instead of receiving vertices
+            from the master
+        :param partitioner: a Partitioner object deciding the worker
+            of each vertex; a HashPartitioner by default
+        :param write_mode: "master" gathers all vertices to the master,
+            which writes the output file; "parts" lets every worker write
+            OUTPUT_FILE.part-INDEX; "mpiio" lets all workers write
+            into the output file at their own offsets with MPI-IO
+        :param checkpoint_dir: a directory in which every worker saves
+            its state after every checkpoint_interval supersteps, or None;
+            it may be local to each node if a restarted job places
+            the workers on the same nodes
+        :param checkpoint_interval: int, the number of supersteps
+            between two checkpoints
+        :param restart: Boolean; if True, the computation resumes from
+            the latest checkpoint in checkpoint_dir that every worker
+            has completed, or starts from the beginning if there is none
+        :param dedicated_master: Boolean; if True, rank 0 is a master
+            that owns no vertex; if False, every rank is a worker,
+            rank 0 also reads and writes for the master and all workers
+            stop together after the all-reduce of each superstep, so
+            halt_condition must give the same result on every rank
+        :param engine: "mpi" runs the app on the processes of mpirun;
+            "local" runs it in this process without MPI and delivers
+            messages in memory; it raises a ValueError for
+            parallel_load, partitioner, dedicated_master=False,
+            hub_threshold, message_budget, spill_dir, compression,
+            tuning and checkpoint_dir
+        :param anonymous_messages: Boolean; if True, a message is only
+            its value and the combiner gets None as its source vertex id;
+            typed messages are always anonymous
+        :param program: a PartitionProgram object computing all vertices
+            of a worker at once in each superstep instead of their
+            compute(), or None; it needs storage "csr", msg_dtype
+            and a combiner
+        :param metrics_file: a file to which rank 0 writes the metrics of
+            every worker in every superstep (times of the phases,
+            messages and bytes sent and received, active vertices),
+            or None
+        :param metrics_format: "json" writes the metrics by superstep
+            with the slowest worker of each; "chrome" writes a timeline
+            for chrome://tracing or Perfetto
+        :param hooks: a list of Hook objects called before and after
+            loading, around every superstep and before writing, or None
+        :param hot_vertices: int; if positive, compute() of every
+            hot_vertex_interval-th active vertex is timed and rank 0
+            prints this many of the slowest vertices with their
+            supersteps and numbers of out edges
+        :param hot_vertex_interval: int, the number of active vertices
+            per timed vertex; 1 times every vertex
+        :param hub_threshold: int or None; vertices with at least this
+            many out edges are hubs, whose edges are also split among
+            the workers of their destinations at load time; a hub's
+            send_message_to_all_neighbors() then sends its value to
+            every worker once at the end of the superstep and each
+            worker sends it to the neighbors it owns. The out edges of
+            hubs must not change
+        :param message_budget: int or None; a worker keeps at most this
+            many received messages of the next superstep in its map of
+            next messages and spills the others to temporary files sorted
+            by destination vertex, which are merged back while the next
+            superstep computes its active vertices in ascending id order.
+            It bounds only that map: spilled messages are written in runs
+            of at least 16384, and typed messages are all in the send and
+            receive arrays of the exchange before any of them is spilled
+        :param spill_dir: the directory of the spilled messages,
+            or None for the default temporary directory
+        :param edge_dir: the directory of the edge files of storage
+            "disk", or None for the default temporary directory
+        :param compression: None, "zlib" or "lzma"; if given, a batch
+            of pickled messages is sorted by destination vertex, the ids
+            are sent as delta-encoded varints and the source ids and
+            values are compressed with this codec
+        :param compression_threshold: int; a batch with fewer messages
+            is not compressed
+        :param tuning: a Tuning object with the sizes of the batches of
+            pickled messages and of loading, or None for the defaults;
+            see pypregel.tuning
+        """
+
+        if rtt is not None:
+            warnings.warn("rtt is no longer used.", DeprecationWarning)
+
+        if engine not in ("mpi", "local"):
+            raise ValueError("engine should be either 'mpi' or 'local'.")
+
+        if storage not in ("object", "csr", "disk"):
+            raise ValueError(
+                "storage should be 'object', 'csr' or 'disk'."
+            )
+
+        if write_mode not in ("master", "parts", "mpiio"):
+            raise ValueError(
+                "write mode should be 'master', 'parts' or 'mpiio'."
+            )
+
+        self._write_mode = write_mode
+
+        if metrics_format not in ("json", "chrome"):
+            raise ValueError(
+                "metrics format should be either 'json' or 'chrome'."
+            )
+
+        if hot_vertices > 0:
+            if hot_vertex_interval <= 0:
+                raise ValueError("hot vertex interval should be positive.")
+
+            if program is not None:
+                raise ValueError(
+                    "a partition program has no vertices to sample."
+                )
+
+        if hub_threshold is not None:
+            if hub_threshold <= 0:
+                raise ValueError("hub threshold should be positive.")
+
+            if program is not None:
+                raise ValueError(
+                    "a partition program sends its messages as arrays; "
+                    "it has no hubs."
+                )
+
+        if message_budget is not None:
+            if message_budget < 0:
+                raise ValueError("message budget should not be negative.")
+
+            if program is not None:
+                raise ValueError(
+                    "a partition program keeps its messages in arrays; "
+                    "they are not spilled."
+                )
+
+            if checkpoint_dir is not None:
+                raise ValueError(
+                    "spilled messages do not support checkpointing."
+                )
+
+        if compression is not None:
+            if compression not in ("zlib", "lzma"):
+                raise ValueError(
+                    "compression should be None, 'zlib' or 'lzma'."
+                )
+
+            if msg_dtype is not None:
+                raise ValueError(
+                    "typed messages are exchanged as arrays; "
+                    "they are not compressed."
+                )
+
+        if checkpoint_dir is not None and \
+                (checkpoint_interval is None or checkpoint_interval <= 0):
+            raise ValueError("checkpoint interval should be positive.")
+
+        if restart and checkpoint_dir is None:
+            raise ValueError("restart needs a checkpoint directory.")
+
+        if msg_dtype is not None:
+            msg_dtype = np.dtype(msg_dtype)
+            if msg_dtype.kind not in "iuf" or \
+                    msg_dtype.char not in array.typecodes:
+                raise TypeError("message dtype should be a numeric type.")
+
+        if program is not None:
+            if storage != "csr":
+                raise ValueError("a partition program needs storage 'csr'.")
+
+            if msg_dtype is None or combiner is None:
+                raise ValueError(
+                    "a partition program needs msg_dtype and a combiner."
+                )
+
+            if checkpoint_dir is not None:
+                raise ValueError(
+                    "a partition program does not support checkpointing."
+                )
+
+        # the number of active vertices and all aggregators
+        # are reduced together once per superstep
+        aggregators = _AggregatorSet(aggregators or dict())
+
+        self._hooks = list(hooks or [])
+
+        self._local = None
+        if engine == "local":
+            if checkpoint_dir is not None:
+                raise ValueError("checkpointing needs the mpi engine.")
+
+            # the options of the processes and of the message exchange
+            # among them do not apply to a single process
+            mpi_options = (
+                ("parallel_load", parallel_load),
+                ("partitioner", partitioner is not None),
+                ("dedicated_master", not dedicated_master),
+                ("hub_threshold", hub_threshold is not None),
+                ("message_budget", message_budget is not None),
+                ("spill_dir", spill_dir is not None),
+                ("compression", compression is not None),
+                ("tuning", tuning is not None),
+            )
+            for name, given in mpi_options:
+                if given:
+                    raise ValueError("%s needs the mpi engine." % name)
+
+            self.rank = 0
+
+            for hook in self._hooks:
+                hook.before_load(self.rank)
+
+            self._local = _LocalEngine(
+                reader=reader,
+                writer=writer,
+                combiner=combiner,
+                storage=storage,
+                msg_dtype=msg_dtype,
+                aggregators=aggregators,
+                halt_condition=halt_condition,
+                anonymous_messages=anonymous_messages,
+                program=program,
+                metrics_file=metrics_file,
+                metrics_format=metrics_format,
+                hooks=self._hooks,
+                hot_vertices=hot_vertices,
+                hot_vertex_interval=hot_vertex_interval,
+                edge_dir=edge_dir
+            )
+
+            for hook in self._hooks:
+                hook.after_load(self.rank)
+            return
+
+        # MPI is imported only by the mpi engine
+        from mpi4py import MPI
+        from pypregel.master import _Master
+        from pypregel.worker import _Worker
+
         # MPI is used to pass messages among processes
         self._comm = MPI.COMM_WORLD
         self.rank = self._comm.Get_rank()
 
-        if self.rank == 0:
-            self._master = _Master(self._comm, reader, writer)
+        # rank 0 is the master only if it is dedicated
+        self._is_master = dedicated_master and self.rank == 0
+
+        # workers exchange typed messages by collective operations
+        # on a communicator without the master
+        worker_comm = self._comm.Split(
+            MPI.UNDEFINED if self._is_master else 1,
+            self.rank
+        )
+
+        if partitioner is None:
+            partitioner = HashPartitioner()
+
+        if tuning is None:
+            tuning = Tuning()
+
+        checkpointing = checkpoint_dir is not None
+
+        for hook in self._hooks:
+            hook.before_load(self.rank)
+
+        if self._is_master:
+            self._master = _Master(
+                comm=self._comm,
+                reader=reader,
+                writer=writer,
+                aggregators=aggregators,
+                halt_condition=halt_condition,
+                parallel_load=parallel_load,
+                partitioner=partitioner,
+                checkpointing=checkpointing,
+                restart=restart,
+                metrics_file=metrics_file,
+                metrics_format=metrics_format,
+                hot_vertices=hot_vertices,
+                load_batch_size=tuning.load_batch_size
+            )
         else:
-            self._worker = _Worker(self._comm, writer, combiner, rtt)
+            checkpointer = None
+            if checkpointing:
+                checkpointer = _Checkpointer(
+                    checkpoint_dir, checkpoint_interval,
+                    worker_comm.Get_rank(), worker_comm.Get_size()
+                )
+
+            # without a dedicated master, worker 0 reads the graph
+            self._worker = _Worker(
+                comm=self._comm,
+                worker_comm=worker_comm,
+                reader=reader if parallel_load or self.rank == 0 else None,
+                writer=writer,
+                combiner=combiner,
+                storage=storage,
+                msg_dtype=msg_dtype,
+                aggregators=aggregators,
+                partitioner=partitioner,
+                checkpointer=checkpointer,
+                restart=restart,
+                parallel_load=parallel_load,
+                halt_condition=halt_condition,
+                dedicated_master=dedicated_master,
+                anonymous_messages=anonymous_messages,
+                program=program,
+                metrics_file=metrics_file,
+                metrics_format=metrics_format,
+                hooks=self._hooks,
+                hot_vertices=hot_vertices,
+                hot_vertex_interval=hot_vertex_interval,
+                hub_threshold=hub_threshold,
+                message_budget=message_budget,
+                spill_dir=spill_dir,
+                edge_dir=edge_dir,
+                compression=compression,
+                compression_threshold=compression_threshold,
+                tuning=tuning
+            )
+
+        for hook in self._hooks:
+            hook.after_load(self.rank)
 
         self._comm.Barrier()
 
@@ -27,15 +373,42 @@ class Pypregel:
         :return: None
         """
 
-        if self.rank == 0:
-            start_time = time.time()
-            self._master.run()
-            self._comm.Barrier()
-            print("--- %f sec ---" % (time.time() - start_time))
-            # gather results and write to file
-            self._master.write()
-        else:
-            self._worker.run()
+        start_time = time.time()
+
+        try:
+            if self._local is not None:
+                self._local.run()
+                print("--- %f sec ---" % (time.time() - start_time))
+
+                for hook in self._hooks:
+                    hook.before_write(self.rank)
+
+                self._local.write(self._write_mode)
+                return
+
+            if self._is_master:
+                self._master.run()
+            else:
+                self._worker.run()
+
             self._comm.Barrier()
-            # call writer to serialize vertices
-            self._worker.write()
+
+            if self.rank == 0:
+                print("--- %f sec ---" % (time.time() - start_time))
+
+            for hook in self._hooks:
+                hook.before_write(self.rank)
+
+            if not self._is_master:
+                # call writer to serialize vertices
+                self._worker.write(self._write_mode)
+            elif self._write_mode == "master":
+                # gather results and write to file
+                self._master.write()
+        finally:
+            # the edge files of disk storage are deleted
+            # even if the app raises
+            if self._local is not None:
+                self._local.close()
+            elif not self._is_master:
+                self._worker.close()
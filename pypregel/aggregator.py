@@ -0,0 +1,174 @@
+import numpy as np
+
+
+class Aggregator:
+    """
+    Aggregator is a public class that user may extend;
+    vertices contribute numeric values to it during a superstep and
+    the aggregated value is visible to every vertex in the next superstep
+    """
+    def __init__(self, initial_value):
+        """
+        :param initial_value: the identity value of aggregate()
+        """
+
+        self._initial_value = initial_value
+
+    def get_initial_value(self):
+        """
+        get the value of this aggregator before any contribution
+        :return: a number
+        """
+
+        return self._initial_value
+
+    def aggregate(self, value_x, value_y):
+        """
+        user needs to overwrite this method;
+        it should be commutative and associative
+        :param value_x: a number
+        :param value_y: a number
+        :return: a number
+        """
+
+        raise NotImplementedError("Aggregator aggregate not implemented")
+
+
+class SumAggregator(Aggregator):
+    """
+    SumAggregator adds up the contributed values
+    """
+    def __init__(self):
+        super().__init__(0.0)
+
+    def aggregate(self, value_x, value_y):
+        return value_x + value_y
+
+
+class MinAggregator(Aggregator):
+    """
+    MinAggregator keeps the minimum of the contributed values
+    """
+    def __init__(self):
+        super().__init__(float("inf"))
+
+    def aggregate(self, value_x, value_y):
+        return min(value_x, value_y)
+
+
+class MaxAggregator(Aggregator):
+    """
+    MaxAggregator keeps the maximum of the contributed values
+    """
+    def __init__(self):
+        super().__init__(float("-inf"))
+
+    def aggregate(self, value_x, value_y):
+        return max(value_x, value_y)
+
+
+class _AggregatorSet:
+    """
+    _AggregatorSet is an inner class that packs the number of active
+    vertices and all aggregators into one float64 vector, so that
+    they are reduced by a single Allreduce per superstep
+    """
+
+    def __init__(self, aggregators):
+        """
+        :param aggregators: a dict of name -> Aggregator object
+        """
+
+        # every process must use the same slot order
+        self._names = sorted(aggregators)
+        self._aggregators = [aggregators[name] for name in self._names]
+
+        # slot 0 is the number of active vertices
+        self._slots = {name: i + 1 for i, name in enumerate(self._names)}
+
+        # the MPI operation is created on the first all-reduce,
+        # so that the local engine does not import MPI
+        self._op = None
+
+    def _reduce(self, in_buf, inout_buf, datatype):
+        """
+        the reduction function of the MPI operation
+        """
+
+        x = np.frombuffer(in_buf, dtype=np.float64)
+        y = np.frombuffer(inout_buf, dtype=np.float64)
+
+        y[0] += x[0]
+        for i, aggregator in enumerate(self._aggregators, 1):
+            y[i] = aggregator.aggregate(x[i], y[i])
+
+    def names(self):
+        """
+        get the names of the aggregators in slot order
+        :return: list of str
+        """
+
+        return list(self._names)
+
+    def get_slot(self, name):
+        """
+        get the position of an aggregator in the packed vector
+        :param name: str
+        :return: int
+        """
+
+        if name not in self._slots:
+            raise KeyError("aggregator %s is not registered" % name)
+
+        return self._slots[name]
+
+    def initial_values(self):
+        """
+        get a packed list of initial values with no active vertex
+        :return: list of numbers
+        """
+
+        return [0] + [a.get_initial_value() for a in self._aggregators]
+
+    def aggregate(self, values, slot, value):
+        """
+        contribute a value to a slot of a packed list in place
+        :param values: list of numbers
+        :param slot: int
+        :param value: a number
+        :return: None
+        """
+
+        values[slot] = self._aggregators[slot - 1].aggregate(
+            values[slot], value
+        )
+
+    def allreduce(self, comm, values):
+        """
+        reduce packed lists over all processes
+        :param comm: MPI communicator
+        :param values: list of numbers
+        :return: a tuple (number of active vertices,
+            dict of name -> aggregated value)
+        """
+
+        from mpi4py import MPI
+
+        if self._op is None:
+            self._op = MPI.Op.Create(self._reduce, commute=True)
+
+        reduced = np.zeros(len(values), dtype=np.float64)
+        comm.Allreduce(np.array(values, dtype=np.float64), reduced,
+                       op=self._op)
+
+        return self.unpack(reduced.tolist())
+
+    def unpack(self, values):
+        """
+        split a packed list of values
+        :param values: list of numbers
+        :return: a tuple (number of active vertices,
+            dict of name -> aggregated value)
+        """
+
+        return int(values[0]), dict(zip(self._names, values[1:]))
@@ -0,0 +1,262 @@
+# generate reproducible random graphs for benchmarks
+#
+# usage: python -m pypregel.benchmark.graphs KIND NUM_VERTICES GRAPH_FILE
+#            [--degree D] [--weighted] [--seed S] [--config CONFIG_FILE]
+#
+# KIND is "uniform", "rmat" or "grid"; a GRAPH_FILE ending with .bin
+# is written in the binary format of pypregel.binary, otherwise in the
+# text format of the example apps (vertex_id:dst dst ... or
+# vertex_id:dst,w dst,w ...)
+import argparse
+import numpy as np
+import time
+
+from pypregel.binary import write_binary_graph
+
+
+# edge weights are integers in [0, _MAX_WEIGHT], as in apps/sssp
+_MAX_WEIGHT = 100
+
+# the quadrant probabilities of R-MAT (a, b, c; d = 1 - a - b - c),
+# the parameters of the Graph500 benchmark
+_RMAT_PROBABILITIES = (0.57, 0.19, 0.19)
+
+# the probability that a grid edge exists, so that roads are missing
+_GRID_EDGE_PROBABILITY = 0.9
+
+# the number of vertices written to a text file at once
+_TEXT_BATCH_SIZE = 10000
+
+
+def _to_csr(num_of_vertices, src, dst):
+    """
+    sort edges by source vertex into CSR arrays
+    :param num_of_vertices: int
+    :param src: int64 array of source vertex ids
+    :param dst: int64 array of destination vertex ids
+    :return: a tuple (vids, offsets, dst, order); order sorts the edges
+    """
+
+    order = np.argsort(src, kind="stable")
+    offsets = np.zeros(num_of_vertices + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=num_of_vertices), out=offsets[1:])
+
+    return np.arange(num_of_vertices, dtype=np.int64), offsets, \
+        dst[order], order
+
+
+def _weights(rng, num_of_edges, weighted):
+    if not weighted:
+        return None
+
+    return rng.integers(0, _MAX_WEIGHT, num_of_edges, endpoint=True)
+
+
+def uniform_graph(num_of_vertices, degree=10, weighted=False, seed=0):
+    """
+    every vertex has a uniformly random number of out edges in
+    [0, 2 * degree] to uniformly random vertices, like the generators
+    of the example apps; self loops are dropped
+    :param num_of_vertices: int
+    :param degree: int, the average out degree
+    :param weighted: Boolean, whether edges have integer weights
+    :param seed: int
+    :return: a tuple (vids, offsets, dst, weights) of NumPy arrays;
+        weights is None if not weighted
+    """
+
+    rng = np.random.default_rng(seed)
+
+    degrees = rng.integers(0, 2 * degree, num_of_vertices, endpoint=True)
+    src = np.repeat(np.arange(num_of_vertices, dtype=np.int64), degrees)
+    dst = rng.integers(0, num_of_vertices, len(src))
+    weights = _weights(rng, len(src), weighted)
+
+    keep = src != dst
+    src = src[keep]
+    dst = dst[keep]
+
+    offsets = np.zeros(num_of_vertices + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=num_of_vertices), out=offsets[1:])
+
+    return np.arange(num_of_vertices, dtype=np.int64), offsets, dst, \
+        None if weights is None else weights[keep]
+
+
+def rmat_graph(num_of_vertices, degree=10, weighted=False, seed=0):
+    """
+    a recursive matrix (R-MAT) graph with power-law degrees:
+    each of num_of_vertices * degree edges picks a quadrant of the
+    adjacency matrix at each of log2(num_of_vertices) levels;
+    vertex ids are permuted so that hubs are not the smallest ids,
+    and self loops and edges beyond num_of_vertices are dropped
+    :param num_of_vertices: int
+    :param degree: int, the average out degree before dropping
+    :param weighted: Boolean, whether edges have integer weights
+    :param seed: int
+    :return: a tuple (vids, offsets, dst, weights) of NumPy arrays;
+        weights is None if not weighted
+    """
+
+    rng = np.random.default_rng(seed)
+    a, b, c = _RMAT_PROBABILITIES
+
+    scale = max(int(np.ceil(np.log2(max(num_of_vertices, 2)))), 1)
+    num_of_edges = num_of_vertices * degree
+
+    src = np.zeros(num_of_edges, dtype=np.int64)
+    dst = np.zeros(num_of_edges, dtype=np.int64)
+    for _ in range(scale):
+        r = rng.random(num_of_edges)
+
+        # quadrants: a (0, 0), b (0, 1), c (1, 0), d (1, 1)
+        src_bit = r >= a + b
+        dst_bit = ((r >= a) & (r < a + b)) | (r >= a + b + c)
+
+        src = (src << 1) | src_bit
+        dst = (dst << 1) | dst_bit
+
+    keep = (src < num_of_vertices) & (dst < num_of_vertices) & (src != dst)
+    permutation = rng.permutation(num_of_vertices)
+    src = permutation[src[keep]]
+    dst = permutation[dst[keep]]
+
+    vids, offsets, dst, _ = _to_csr(num_of_vertices, src, dst)
+    weights = _weights(rng, len(dst), weighted)
+
+    return vids, offsets, dst, weights
+
+
+def grid_graph(num_of_vertices, degree=None, weighted=False, seed=0):
+    """
+    a road-like two-dimensional grid: vertex i is at row i // width and
+    column i % width, and neighboring vertices are connected in both
+    directions with the same weight; a few grid edges are missing
+    :param num_of_vertices: int
+    :param degree: ignored; a vertex has at most 4 neighbors
+    :param weighted: Boolean, whether edges have integer weights
+    :param seed: int
+    :return: a tuple (vids, offsets, dst, weights) of NumPy arrays;
+        weights is None if not weighted
+    """
+
+    rng = np.random.default_rng(seed)
+
+    width = max(int(np.sqrt(num_of_vertices)), 1)
+    vids = np.arange(num_of_vertices, dtype=np.int64)
+
+    # the right and the lower neighbor of every vertex
+    right = vids[(vids % width != width - 1) & (vids + 1 < num_of_vertices)]
+    down = vids[vids + width < num_of_vertices]
+
+    u = np.concatenate((right, down))
+    v = np.concatenate((right + 1, down + width))
+
+    keep = rng.random(len(u)) < _GRID_EDGE_PROBABILITY
+    u = u[keep]
+    v = v[keep]
+
+    weights = _weights(rng, len(u), weighted)
+
+    _, offsets, dst, order = _to_csr(
+        num_of_vertices, np.concatenate((u, v)), np.concatenate((v, u))
+    )
+    if weights is not None:
+        weights = np.concatenate((weights, weights))[order]
+
+    return vids, offsets, dst, weights
+
+
+GENERATORS = {
+    "uniform": uniform_graph,
+    "rmat": rmat_graph,
+    "grid": grid_graph,
+}
+
+
+def write_text_graph(file_name, vids, offsets, dst, weights=None):
+    """
+    write a graph in CSR layout in the text format of the example apps
+    :param file_name: str
+    :param vids: int64 array of vertex ids
+    :param offsets: int64 array; the out edges of vids[i] are
+        dst[offsets[i]:offsets[i + 1]]
+    :param dst: int64 array of destination vertex ids
+    :param weights: numeric array of edge values or None
+    :return: None
+    """
+
+    with open(file_name, "w") as f:
+        for lo in range(0, len(vids), _TEXT_BATCH_SIZE):
+            hi = min(lo + _TEXT_BATCH_SIZE, len(vids))
+            first, last = offsets[lo], offsets[hi]
+
+            # format the edges of a batch of vertices at once
+            tokens = dst[first:last].astype(str)
+            if weights is not None:
+                tokens = np.char.add(
+                    np.char.add(tokens, ","),
+                    weights[first:last].astype(str)
+                )
+            tokens = tokens.tolist()
+
+            bounds = (offsets[lo:hi + 1] - first).tolist()
+
+            lines = []
+            for i, vid in enumerate(vids[lo:hi].tolist()):
+                edges = tokens[bounds[i]:bounds[i + 1]]
+                lines.append("%d:%s\n" % (vid, " ".join(edges)))
+
+            f.write("".join(lines))
+
+
+def write_graph(graph_file, graph, config_file=None):
+    """
+    write a generated graph in the binary format if the file name ends
+    with .bin, otherwise in the text format
+    :param graph_file: str
+    :param graph: a tuple (vids, offsets, dst, weights)
+    :param config_file: str or None; a configuration file of the example
+        apps holding the number of vertices
+    :return: None
+    """
+
+    if graph_file.endswith(".bin"):
+        write_binary_graph(graph_file, *graph)
+    else:
+        write_text_graph(graph_file, *graph)
+
+    if config_file is not None:
+        with open(config_file, "w") as f:
+            f.write("%d\n" % len(graph[0]))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m pypregel.benchmark.graphs",
+        description="generate a reproducible random graph"
+    )
+    parser.add_argument("kind", choices=sorted(GENERATORS))
+    parser.add_argument("num_of_vertices", type=int)
+    parser.add_argument("graph_file")
+    parser.add_argument("--degree", type=int, default=10,
+                        help="average out degree (default 10)")
+    parser.add_argument("--weighted", action="store_true",
+                        help="give every edge an integer weight")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--config", metavar="CONFIG_FILE",
+                        help="also write a configuration file")
+    args = parser.parse_args()
+
+    start_time = time.time()
+
+    graph = GENERATORS[args.kind](args.num_of_vertices, args.degree,
+                                  args.weighted, args.seed)
+    write_graph(args.graph_file, graph, args.config)
+
+    print("%d vertices, %d edges generated in %f sec" %
+          (len(graph[0]), len(graph[2]), time.time() - start_time))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,411 @@
+# run the example apps over a matrix of generated graphs, numbers of
+# MPI processes and engines, and record the results as JSON
+#
+# usage: python -m pypregel.benchmark.runner [--spec SPEC_FILE]
+#            [--out RESULT_FILE] [--workdir DIR] [--apps A,B] [--graphs G,H]
+#            [--sizes N,M] [--ranks P,Q] [--engines E,F] [--formats txt,bin]
+#            [--repeats R]
+#        python -m pypregel.benchmark.runner --compare BASELINE_FILE
+#            RESULT_FILE [--tolerance T]
+#
+# a spec file is a JSON object with any keys of DEFAULT_SPEC; options on
+# the command line override it. Each run records the wall time of the
+# process, the time of all supersteps and of each superstep, the number
+# of messages and messages per second, and the peak resident set size
+# of the largest process (mpirun or a rank). The times and messages are
+# read from the metrics file that the app writes (metrics_file of
+# Pypregel), not from the output of the ranks.
+#
+# environment variables:
+#     MPIRUN  the mpirun command, e.g. "mpirun --allow-run-as-root"
+import argparse
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+# app name -> (script relative to the repository, weighted graph)
+APPS = {
+    "pagerank": ("apps/pagerank/pagerank.py", False),
+    "pagerank_program": ("apps/pagerank/pagerank_program.py", False),
+    "sssp": ("apps/sssp/sssp.py", True),
+    "sssp_program": ("apps/sssp/sssp_program.py", True),
+}
+
+DEFAULT_SPEC = {
+    "apps": ["pagerank", "sssp"],
+    "graphs": ["uniform", "rmat", "grid"],
+    "sizes": [10000, 100000],
+    "degree": 10,
+    "seed": 0,
+    "formats": ["bin"],
+    "engines": ["mpi", "local"],
+    "ranks": [2, 3],
+    "repeats": 1,
+    "timeout": 1800,
+}
+
+# seconds between checks whether an app has exited
+_POLL_INTERVAL = 0.05
+
+# the keys that identify the same benchmark in two result files
+_KEY = ("app", "graph", "vertices", "format", "engine", "ranks")
+
+_GENERATED = re.compile(r"^\d+ vertices, (\d+) edges generated",
+                        re.MULTILINE)
+
+
+def prepare_graph(workdir, kind, num_of_vertices, degree, seed, weighted,
+                  file_format, env):
+    """
+    generate a graph and its configuration file unless they exist
+    :return: a tuple (config file, graph file, number of edges)
+    """
+
+    name = "%s-%d-d%d-s%d%s" % (kind, num_of_vertices, degree, seed,
+                                "-w" if weighted else "")
+    graph_file = os.path.join(workdir, "%s.%s" % (name, file_format))
+    config_file = os.path.join(workdir, "%s.config" % name)
+    edges_file = os.path.join(workdir, "%s.edges" % name)
+
+    # in another process: the peak RSS of an app started by this process
+    # includes the RSS this process had (see run_app)
+    if not os.path.exists(graph_file):
+        command = [sys.executable, "-m", "pypregel.benchmark.graphs", kind,
+                   str(num_of_vertices), graph_file, "--degree", str(degree),
+                   "--seed", str(seed), "--config", config_file]
+        if weighted:
+            command.append("--weighted")
+
+        output = subprocess.run(command, env=env, check=True,
+                                stdout=subprocess.PIPE, text=True).stdout
+        num_of_edges = int(_GENERATED.search(output).group(1))
+
+        with open(edges_file, "w") as f:
+            f.write("%d\n" % num_of_edges)
+
+    with open(edges_file) as f:
+        num_of_edges = int(f.read())
+
+    return config_file, graph_file, num_of_edges
+
+
+def read_metrics(metrics_file):
+    """
+    read the times and messages of a run from its metrics file
+    :param metrics_file: str, a JSON metrics file of Pypregel
+    :return: dict
+    """
+
+    with open(metrics_file) as f:
+        supersteps = json.load(f)["supersteps"]
+
+    # a superstep takes as long as its slowest worker
+    superstep_sec = [max(w["total_sec"] for w in s["workers"])
+                     for s in supersteps]
+    num_of_messages = sum(w["local_messages"] + w["remote_messages"]
+                          for s in supersteps for w in s["workers"])
+    compute_sec = sum(superstep_sec)
+
+    return {
+        "compute_sec": compute_sec,
+        "superstep_sec": superstep_sec,
+        "messages": num_of_messages,
+        "messages_per_sec": num_of_messages / max(compute_sec, 1e-9),
+    }
+
+
+def run_app(command, metrics_file, env, timeout):
+    """
+    run an app and measure it
+    :param command: list of str, writing the metrics to metrics_file
+    :param metrics_file: str
+    :param env: dict of environment variables
+    :param timeout: seconds
+    :return: dict
+    """
+
+    if os.path.exists(metrics_file):
+        os.remove(metrics_file)
+
+    with tempfile.TemporaryFile("w+") as log:
+        start_time = time.time()
+        proc = subprocess.Popen(command, env=env, stdout=log,
+                                stderr=subprocess.STDOUT, text=True)
+
+        # wait4 returns the resource usage of the process and of the
+        # descendants it has waited for, i.e. the ranks under mpirun;
+        # ru_maxrss is the peak of the largest one of them. Linux also
+        # counts the RSS of this process at the time of exec, so this
+        # module does not import NumPy and leaves the graphs to others.
+        deadline = start_time + timeout
+        while True:
+            pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+            if pid != 0:
+                break
+
+            if time.time() > deadline:
+                proc.kill()
+                pid, status, usage = os.wait4(proc.pid, 0)
+                break
+
+            time.sleep(_POLL_INTERVAL)
+        # end of while
+
+        wall_time = time.time() - start_time
+        proc.returncode = os.waitstatus_to_exitcode(status)
+
+        log.seek(0)
+        output = log.read()
+
+    result = {
+        "returncode": proc.returncode,
+        "wall_sec": wall_time,
+        "compute_sec": None,
+        "superstep_sec": [],
+        "messages": None,
+        "messages_per_sec": None,
+        "peak_rss_kb": usage.ru_maxrss,
+    }
+
+    if proc.returncode == 0 and os.path.exists(metrics_file):
+        result.update(read_metrics(metrics_file))
+
+    if proc.returncode != 0:
+        result["output_tail"] = output[-2000:]
+
+    return result
+
+
+def _command_output(command, env=None):
+    try:
+        return subprocess.run(
+            command, cwd=ROOT, env=env, check=True, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_matrix(spec, workdir, mpirun):
+    """
+    run every combination of app, graph, size, format, engine and
+    number of processes of a spec; the local engine runs once per
+    combination, whatever the numbers of processes
+    :param spec: dict with the keys of DEFAULT_SPEC
+    :param workdir: str, the directory of generated graphs and outputs
+    :param mpirun: list of str, the mpirun command
+    :return: list of dict, one per run
+    """
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+
+    results = []
+    for app in spec["apps"]:
+        if app not in APPS:
+            raise KeyError("unknown app %s, expected one of %s" %
+                           (app, ", ".join(sorted(APPS))))
+        script, weighted = APPS[app]
+
+        for kind in spec["graphs"]:
+            for n in spec["sizes"]:
+                for file_format in spec["formats"]:
+                    config_file, graph_file, num_of_edges = prepare_graph(
+                        workdir, kind, n, spec["degree"], spec["seed"],
+                        weighted, file_format, env
+                    )
+                    output_file = os.path.join(workdir, "output.txt")
+                    metrics_file = os.path.join(workdir, "metrics.json")
+
+                    for engine in spec["engines"]:
+                        ranks = spec["ranks"] if engine == "mpi" else [1]
+
+                        for num_procs in ranks:
+                            command = [sys.executable,
+                                       os.path.join(ROOT, script),
+                                       config_file, graph_file, output_file,
+                                       engine, metrics_file]
+                            if engine == "mpi":
+                                command = mpirun + ["-np", str(num_procs)] \
+                                    + command
+
+                            for repeat in range(spec["repeats"]):
+                                result = {
+                                    "app": app,
+                                    "graph": kind,
+                                    "vertices": n,
+                                    "edges": num_of_edges,
+                                    "format": file_format,
+                                    "engine": engine,
+                                    "ranks": num_procs,
+                                    "repeat": repeat,
+                                }
+                                result.update(run_app(command, metrics_file,
+                                                      env, spec["timeout"]))
+                                results.append(result)
+
+                                print("%-16s %-7s %9d %-3s %-5s %2d %8s %10s"
+                                      " %12s %10s" %
+                                      (app, kind, n, file_format, engine,
+                                       num_procs,
+                                       _format(result["wall_sec"], "%.2f"),
+                                       _format(result["compute_sec"],
+                                               "%.2f"),
+                                       _format(result["messages_per_sec"],
+                                               "%.0f"),
+                                       _format(result["peak_rss_kb"], "%d")),
+                                      flush=True)
+    # end of for
+
+    return results
+
+
+def _format(value, fmt):
+    return "-" if value is None else fmt % value
+
+
+def _best(records):
+    """
+    the fastest successful run of each benchmark
+    :return: dict of key tuple -> record
+    """
+
+    best = dict()
+    for record in records:
+        if record["returncode"] != 0 or record["compute_sec"] is None:
+            continue
+
+        key = tuple(record[k] for k in _KEY)
+        if key not in best or \
+                record["compute_sec"] < best[key]["compute_sec"]:
+            best[key] = record
+
+    return best
+
+
+def compare(baseline, results, tolerance):
+    """
+    compare the fastest runs of the same benchmarks of two result files
+    :param baseline: dict loaded from a result file
+    :param results: dict loaded from a result file
+    :param tolerance: float; a benchmark regresses if it takes more than
+        tolerance times as long as the baseline
+    :return: the number of regressions
+    """
+
+    old = _best(baseline["results"])
+    new = _best(results["results"])
+
+    print("%-16s %-7s %9s %-3s %-5s %2s %10s %10s %7s" %
+          ("app", "graph", "vertices", "fmt", "eng", "np", "base sec",
+           "new sec", "ratio"))
+
+    regressions = 0
+    for key in sorted(set(old) & set(new)):
+        ratio = new[key]["compute_sec"] / max(old[key]["compute_sec"], 1e-9)
+        slower = ratio > tolerance
+        regressions += slower
+
+        print("%-16s %-7s %9d %-3s %-5s %2d %10.2f %10.2f %6.2fx%s" %
+              (key + (old[key]["compute_sec"], new[key]["compute_sec"],
+                      ratio, " SLOWER" if slower else "")))
+
+    missing = len(set(old) - set(new))
+    if missing:
+        print("%d benchmarks of the baseline are missing" % missing)
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m pypregel.benchmark.runner",
+        description="run the example apps over generated graphs and "
+                    "record the results as JSON"
+    )
+    parser.add_argument("--spec", metavar="SPEC_FILE",
+                        help="JSON object overriding DEFAULT_SPEC")
+    parser.add_argument("--out", metavar="RESULT_FILE",
+                        default="benchmark-results.json")
+    parser.add_argument("--workdir",
+                        help="keep generated graphs in this directory")
+    for key in ("apps", "graphs", "engines", "formats"):
+        parser.add_argument("--" + key, type=lambda s: s.split(","),
+                            help="comma separated list")
+    for key in ("sizes", "ranks"):
+        parser.add_argument("--" + key,
+                            type=lambda s: [int(x) for x in s.split(",")],
+                            help="comma separated list")
+    parser.add_argument("--degree", type=int)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--repeats", type=int)
+    parser.add_argument("--timeout", type=int, help="seconds per run")
+    parser.add_argument("--compare", nargs=2,
+                        metavar=("BASELINE_FILE", "RESULT_FILE"),
+                        help="compare two result files instead of running")
+    parser.add_argument("--tolerance", type=float, default=1.1,
+                        help="ratio of seconds that counts as a regression "
+                             "(default 1.1)")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            baseline = json.load(f)
+        with open(args.compare[1]) as f:
+            results = json.load(f)
+
+        sys.exit(1 if compare(baseline, results, args.tolerance) else 0)
+
+    spec = dict(DEFAULT_SPEC)
+    if args.spec:
+        with open(args.spec) as f:
+            spec.update(json.load(f))
+    for key in DEFAULT_SPEC:
+        if getattr(args, key, None) is not None:
+            spec[key] = getattr(args, key)
+
+    for key in spec:
+        if key not in DEFAULT_SPEC:
+            raise KeyError("unknown spec key %s" % key)
+
+    mpirun = os.environ.get("MPIRUN", "mpirun").split()
+
+    metadata = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "numpy": _command_output(
+            [sys.executable, "-c", "import numpy; print(numpy.__version__)"]
+        ),
+        "revision": _command_output(["git", "rev-parse", "HEAD"]),
+        "mpirun": mpirun,
+        "spec": spec,
+    }
+
+    print("%-16s %-7s %9s %-3s %-5s %2s %8s %10s %12s %10s" %
+          ("app", "graph", "vertices", "fmt", "eng", "np", "wall sec",
+           "compute sec", "messages/sec", "peak KB"))
+
+    if args.workdir:
+        os.makedirs(args.workdir, exist_ok=True)
+        results = run_matrix(spec, args.workdir, mpirun)
+    else:
+        with tempfile.TemporaryDirectory() as workdir:
+            results = run_matrix(spec, workdir, mpirun)
+
+    with open(args.out, "w") as f:
+        json.dump({"metadata": metadata, "results": results}, f, indent=1)
+
+    print("%d runs written to %s" % (len(results), args.out))
+
+
+if __name__ == "__main__":
+    main()
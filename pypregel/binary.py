@@ -0,0 +1,213 @@
+import numpy as np
+import struct
+
+from pypregel.reader import Reader
+from pypregel.vertex import Edge
+
+
+# layout of a binary graph file (little endian):
+#   header (64 bytes): magic, version, flags, number of vertices,
+#                      number of edges, weight dtype
+#   vids:    int64[num_of_vertices]
+#   offsets: int64[num_of_vertices + 1]
+#   dst:     int64[num_of_edges]
+#   weights: weight dtype[num_of_edges], only if weighted
+_MAGIC = b"PYPREGEL"
+_VERSION = 1
+_HEADER = struct.Struct("<8sIIqq8s")
+_HEADER_SIZE = 64
+
+_WEIGHTED = 1
+
+
+def write_binary_graph(file_name, vids, offsets, dst, weights=None):
+    """
+    write a graph in CSR layout to a binary graph file
+    :param file_name: str
+    :param vids: int64 array of vertex ids
+    :param offsets: int64 array; the out edges of vids[i] are
+        dst[offsets[i]:offsets[i + 1]]
+    :param dst: int64 array of destination vertex ids
+    :param weights: numeric array of edge values or None
+    :return: None
+    """
+
+    vids = np.asarray(vids, dtype="<i8")
+    offsets = np.asarray(offsets, dtype="<i8")
+    dst = np.asarray(dst, dtype="<i8")
+
+    if len(offsets) != len(vids) + 1 or offsets[-1] != len(dst):
+        raise ValueError("offsets do not match vertices and edges.")
+
+    flags = 0
+    weight_dtype = b""
+    if weights is not None:
+        weights = np.asarray(weights)
+        if weights.dtype.kind not in "iuf" or len(weights) != len(dst):
+            raise ValueError("weights should be numeric, one per edge.")
+
+        weights = weights.astype(weights.dtype.newbyteorder("<"))
+        flags |= _WEIGHTED
+        weight_dtype = weights.dtype.str.encode()
+
+    with open(file_name, "wb") as f:
+        header = _HEADER.pack(_MAGIC, _VERSION, flags, len(vids), len(dst),
+                              weight_dtype)
+        f.write(header.ljust(_HEADER_SIZE, b"\0"))
+
+        for a in (vids, offsets, dst, weights):
+            if a is not None:
+                f.write(a.tobytes())
+
+
+class _BinaryGraph:
+    """
+    _BinaryGraph is a private class that memory-maps a binary graph file;
+    its arrays are read-only views of the file
+    """
+
+    def __init__(self, file_name):
+        with open(file_name, "rb") as f:
+            header = f.read(_HEADER_SIZE)
+
+        if len(header) < _HEADER_SIZE or header[:len(_MAGIC)] != _MAGIC:
+            raise ValueError("%s is not a binary graph file" % file_name)
+
+        _, version, flags, n, m, weight_dtype = \
+            _HEADER.unpack(header[:_HEADER.size])
+
+        if version != _VERSION:
+            raise ValueError("unsupported binary graph version %d" % version)
+
+        self.num_of_vertices = n
+        self.num_of_edges = m
+
+        pos = _HEADER_SIZE
+        sections = [("vids", "<i8", n), ("offsets", "<i8", n + 1),
+                    ("dst", "<i8", m)]
+        if flags & _WEIGHTED:
+            sections.append(
+                ("weights", weight_dtype.rstrip(b"\0").decode(), m)
+            )
+
+        self.weights = None
+        for name, dtype, count in sections:
+            a = np.memmap(file_name, dtype=dtype, mode="r",
+                          offset=pos, shape=(count,)) if count > 0 \
+                else np.empty(0, dtype=dtype)
+            setattr(self, name, a)
+            pos += count * np.dtype(dtype).itemsize
+
+
+class BinaryReader(Reader):
+    """
+    BinaryReader is a public Reader of binary graph files written by
+    write_binary_graph() or `python -m pypregel.convert`;
+    the file is memory-mapped and no configuration file is needed
+    """
+
+    def __init__(self, graph, vertex_class, initial_value=None):
+        """
+        :param graph: str, binary graph file name
+        :param vertex_class: a subclass of Vertex to create vertices
+        :param initial_value: the value of every vertex after reading
+        """
+
+        self.graph_file = graph
+        self._graph = _BinaryGraph(graph)
+        self._vertex_class = vertex_class
+        self._initial_value = initial_value
+
+        # rows [self._lo, self._hi) are read by read_vertex()
+        self._lo = 0
+        self._hi = self._graph.num_of_vertices
+        self._next = self._lo
+
+    def read_num_of_vertices(self):
+        """
+        the number of vertices is stored in the file header
+        :return: int
+        """
+
+        return self._graph.num_of_vertices
+
+    def create_vertex(self, vid, out_edges):
+        """
+        create a vertex with the initial value
+        :param vid: int
+        :param out_edges: list of Edges
+        :return: a Vertex object
+        """
+
+        return self._vertex_class(vid, self._initial_value, out_edges)
+
+    def read_vertex(self):
+        """
+        read the next vertex of the current range
+        :return: a Vertex object or None
+        """
+
+        if self._next >= self._hi:
+            return None
+
+        g = self._graph
+        i = self._next
+        self._next += 1
+
+        lo = g.offsets[i].item()
+        hi = g.offsets[i + 1].item()
+
+        dst_vids = g.dst[lo:hi].tolist()
+        if g.weights is None:
+            weights = [None] * len(dst_vids)
+        else:
+            weights = g.weights[lo:hi].tolist()
+
+        return self.create_vertex(
+            g.vids[i].item(),
+            [Edge(dst_vids[k], weights[k]) for k in range(len(dst_vids))]
+        )
+
+    def set_shard(self, index, num_of_shards):
+        """
+        restrict reading to one of num_of_shards row ranges
+        :param index: int, 0 <= index < num_of_shards
+        :param num_of_shards: int
+        :return: None
+        """
+
+        if not 0 <= index < num_of_shards:
+            raise ValueError("shard index out of range.")
+
+        n = self._graph.num_of_vertices
+        self._lo = n * index // num_of_shards
+        self._hi = n * (index + 1) // num_of_shards
+        self._next = self._lo
+
+    def read_csr(self):
+        """
+        get the remaining rows of the current range as CSR arrays;
+        vids, dst and weights are zero-copy views of the file
+        :return: a tuple (vids, offsets, dst, weights)
+        """
+
+        g = self._graph
+        lo, hi = self._next, self._hi
+        self._next = hi
+
+        offsets = g.offsets[lo:hi + 1]
+        start, end = offsets[0].item(), offsets[-1].item()
+
+        weights = None
+        if g.weights is not None:
+            weights = g.weights[start:end]
+
+        return g.vids[lo:hi], offsets - start, g.dst[start:end], weights
+
+    def __del__(self):
+        """
+        the memory maps are closed with the arrays
+        :return: None
+        """
+
+        pass
@@ -0,0 +1,223 @@
+import numpy as np
+import os
+import pickle
+import time
+
+from threading import Thread
+
+
+def _pack(values):
+    """
+    store a list of Python ints or of Python floats as a NumPy array;
+    other values, mixed ones included, are pickled right away, so that
+    changing them later does not affect the checkpoint and a restart
+    gets back the same values of the same types
+    :param values: list
+    :return: NumPy array or bytes
+    """
+
+    if all(type(x) is int for x in values):
+        try:
+            return np.array(values, dtype=np.int64)
+        except OverflowError:
+            pass
+    elif all(type(x) is float for x in values):
+        return np.array(values, dtype=np.float64)
+
+    return pickle.dumps(values, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _unpack(values):
+    """
+    reverse _pack()
+    :param values: NumPy array or bytes
+    :return: list
+    """
+
+    if isinstance(values, np.ndarray):
+        return values.tolist()
+
+    return pickle.loads(values)
+
+
+def _find_latest_checkpoint(comm, checkpoints):
+    """
+    agree on the latest superstep that every worker has a checkpoint of,
+    taken with the current number of workers; a collective operation on
+    comm, so that all processes raise together if there are only
+    checkpoints of another number of workers
+    :param comm: MPI communicator of the master and all workers
+    :param checkpoints: a tuple (number of workers, set of tuples
+        (superstep, number of workers) of the checkpoints of this worker),
+        or None on the master
+    :return: int, or None if there is no checkpoint
+    """
+
+    num_of_workers = None
+    common = None
+    other_counts = set()
+
+    for item in comm.allgather(checkpoints):
+        if item is None:
+            continue
+
+        num_of_workers, found = item
+        supersteps = set()
+        for superstep, count in found:
+            if count == num_of_workers:
+                supersteps.add(superstep)
+            else:
+                other_counts.add(count)
+
+        common = supersteps if common is None else common & supersteps
+
+    if common:
+        return max(common)
+
+    if other_counts:
+        raise ValueError(
+            "checkpoints were taken with %s workers, not %d" %
+            (" or ".join(str(c) for c in sorted(other_counts)),
+             num_of_workers)
+        )
+
+    return None
+
+
+class _Checkpointer:
+    """
+    _Checkpointer is an inner class that saves the state of one worker
+    every few supersteps; a file is written by a background thread
+    into DIRECTORY/superstep-S/worker-INDEX-of-N.ckpt, N the number of
+    workers, and renamed into place only when it is complete
+    """
+
+    def __init__(self, directory, interval, worker_index, num_of_workers):
+        self._directory = directory
+        self._interval = interval
+        self._worker_index = worker_index
+        self._num_of_workers = num_of_workers
+
+        self._thread = None
+
+        # (superstep, capture sec, write sec, bytes) of each checkpoint
+        self._reports = []
+
+    def _path(self, superstep):
+        return os.path.join(
+            self._directory,
+            "superstep-%08d" % superstep,
+            "worker-%05d-of-%05d.ckpt" %
+            (self._worker_index, self._num_of_workers)
+        )
+
+    def due(self, superstep):
+        """
+        check whether a checkpoint should be taken after a superstep
+        :param superstep: int
+        :return: Boolean
+        """
+
+        return superstep % self._interval == 0
+
+    def save(self, superstep, state, capture_time):
+        """
+        write a captured state in the background
+        :param superstep: int
+        :param state: dict of picklable objects
+        :param capture_time: float, seconds spent to capture the state
+        :return: None
+        """
+
+        # at most one checkpoint is written at a time
+        self.wait()
+
+        state["num_of_workers"] = self._num_of_workers
+        state["superstep"] = superstep
+
+        self._thread = Thread(
+            target=self._write,
+            args=(superstep, state, capture_time)
+        )
+        self._thread.start()
+
+    def _write(self, superstep, state, capture_time):
+        """
+        the target function of the writing thread
+        """
+
+        start_time = time.time()
+
+        path = self._path(superstep)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(path + ".tmp", path)
+
+        self._reports.append((
+            superstep,
+            capture_time,
+            time.time() - start_time,
+            os.path.getsize(path)
+        ))
+
+    def wait(self):
+        """
+        wait until the checkpoint being written is complete
+        :return: None
+        """
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def get_reports(self):
+        """
+        get the overhead of the checkpoints written so far
+        :return: list of tuples (superstep, capture sec, write sec, bytes)
+        """
+
+        return list(self._reports)
+
+    def available_checkpoints(self):
+        """
+        get the complete checkpoints of the worker with this index,
+        with any number of workers, for _find_latest_checkpoint()
+        :return: a tuple (number of workers, set of tuples
+            (superstep, number of workers))
+        """
+
+        checkpoints = set()
+        if not os.path.isdir(self._directory):
+            return self._num_of_workers, checkpoints
+
+        prefix = "worker-%05d-of-" % self._worker_index
+
+        for name in os.listdir(self._directory):
+            if not name.startswith("superstep-"):
+                continue
+
+            superstep = int(name[len("superstep-"):])
+            for file_name in os.listdir(os.path.join(self._directory, name)):
+                if file_name.startswith(prefix) and \
+                        file_name.endswith(".ckpt"):
+                    count = int(file_name[len(prefix):-len(".ckpt")])
+                    checkpoints.add((superstep, count))
+
+        # end of for
+
+        return self._num_of_workers, checkpoints
+
+    def load(self, superstep):
+        """
+        read the checkpoint of a superstep
+        :param superstep: int
+        :return: dict
+        """
+
+        with open(self._path(superstep), "rb") as f:
+            return pickle.load(f)
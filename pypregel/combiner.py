@@ -1,3 +1,14 @@
+import numpy as np
+
+
+# a batch of typed messages is combined in a table indexed by destination
+# id if the ids span at most this many times the number of messages
+_DENSE_RANGE_FACTOR = 4
+
+# ufuncs that give the same result when a value is applied twice
+_IDEMPOTENT_UFUNCS = (np.minimum, np.maximum, np.fmin, np.fmax)
+
+
 class Combiner:
     """
     Combiner is a public class that user has to extend
@@ -15,3 +26,154 @@ class Combiner:
         """
 
         raise NotImplementedError("Combiner aggregate not implemented")
+
+    def combine_batch(self, dst_vids, values):
+        """
+        combine a batch of typed messages so that each destination
+        vertex gets only one message; by default combine() is called
+        once for each pair of messages
+        :param dst_vids: NumPy array of destination vertex ids
+        :param values: NumPy array of message values
+        :return: a tuple (dst_vids, values) of NumPy arrays
+        """
+
+        combined = dict()
+        for dst_vid, msg_value in zip(dst_vids.tolist(), values.tolist()):
+            if dst_vid in combined:
+                _, msg_value = self.combine(
+                    (None, combined[dst_vid]),
+                    (None, msg_value)
+                )
+
+            combined[dst_vid] = msg_value
+
+        return (
+            np.fromiter(combined.keys(), dtype=dst_vids.dtype,
+                        count=len(combined)),
+            np.fromiter(combined.values(), dtype=values.dtype,
+                        count=len(combined))
+        )
+
+
+class UfuncCombiner(Combiner):
+    """
+    UfuncCombiner is a public class that combines message values
+    by a binary NumPy ufunc such as np.add or np.minimum;
+    a batch of messages is reduced at once instead of pair by pair
+    """
+    def __init__(self, ufunc):
+        super().__init__()
+
+        if not isinstance(ufunc, np.ufunc) or ufunc.nin != 2:
+            raise TypeError("combiner needs a binary NumPy ufunc.")
+
+        self._ufunc = ufunc
+
+    def combine(self, msg_x, msg_y):
+        """
+        combine two messages by the ufunc
+        :param msg_x: a tuple (message source vertex id, message value)
+        :param msg_y: a tuple (message source vertex id, message value)
+        :return: a tuple (None, message value)
+        """
+
+        msg_value = self._ufunc(msg_x[1], msg_y[1])
+        if isinstance(msg_value, np.generic):
+            msg_value = msg_value.item()
+
+        return None, msg_value
+
+    def combine_batch(self, dst_vids, values):
+        """
+        sort a batch of messages by destination vertex id and
+        reduce the values of each destination by ufunc.reduceat
+        :param dst_vids: NumPy array of destination vertex ids
+        :param values: NumPy array of message values
+        :return: a tuple (dst_vids, values) of NumPy arrays
+        """
+
+        if len(dst_vids) <= 1:
+            return dst_vids, values
+
+        lo = dst_vids.min()
+        size = dst_vids.max().item() - lo.item() + 1
+
+        if size <= _DENSE_RANGE_FACTOR * len(dst_vids) and \
+                (self._ufunc.identity is not None or
+                 self._ufunc in _IDEMPOTENT_UFUNCS):
+            return self._combine_dense(dst_vids - lo, values, size, lo)
+
+        order = np.argsort(dst_vids, kind="stable")
+        dst_vids = dst_vids[order]
+        values = values[order]
+
+        # the first position of every run of equal destination ids
+        starts = np.flatnonzero(
+            np.concatenate(([True], dst_vids[1:] != dst_vids[:-1]))
+        )
+
+        return dst_vids[starts], self._ufunc.reduceat(values, starts)
+
+    def _combine_dense(self, index, values, size, lo):
+        """
+        reduce a batch of messages whose destination ids lie in a small
+        range into a table with one slot for each id by ufunc.at,
+        which is much faster than sorting the batch
+        :param index: NumPy array of destination ids minus lo
+        :param values: NumPy array of message values
+        :param size: int, the number of slots
+        :param lo: the smallest destination id
+        :return: a tuple (dst_vids, values) of NumPy arrays
+        """
+
+        if self._ufunc.identity is not None:
+            table = np.full(size, self._ufunc.identity, dtype=values.dtype)
+        else:
+            # applying the ufunc once more to a value does not change
+            # the result, so a slot may start with any of its values
+            table = np.empty(size, dtype=values.dtype)
+            table[index] = values
+
+        self._ufunc.at(table, index, values)
+
+        received = np.zeros(size, dtype=bool)
+        received[index] = True
+        index = np.flatnonzero(received)
+
+        return index + lo, table[index]
+
+
+class SumCombiner(UfuncCombiner):
+    """
+    SumCombiner adds up the messages to the same vertex
+    """
+    def __init__(self):
+        super().__init__(np.add)
+
+    def combine(self, msg_x, msg_y):
+        # a Python operator is much faster than a ufunc on two scalars
+        return None, msg_x[1] + msg_y[1]
+
+
+class MinCombiner(UfuncCombiner):
+    """
+    MinCombiner keeps the minimum of the messages to the same vertex
+    """
+    def __init__(self):
+        super().__init__(np.minimum)
+
+    def combine(self, msg_x, msg_y):
+        # a Python operator is much faster than a ufunc on two scalars
+        return None, min(msg_x[1], msg_y[1])
+
+
+class MaxCombiner(UfuncCombiner):
+    """
+    MaxCombiner keeps the maximum of the messages to the same vertex
+    """
+    def __init__(self):
+        super().__init__(np.maximum)
+
+    def combine(self, msg_x, msg_y):
+        # a Python operator is much faster than a ufunc on two scalars
+        return None, max(msg_x[1], msg_y[1])
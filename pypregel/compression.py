@@ -0,0 +1,148 @@
+import lzma
+import numpy as np
+import pickle
+import zlib
+
+
+# codec name -> (compress, decompress); the fastest levels are used,
+# since a batch is compressed while the vertices are computed
+_CODECS = {
+    "zlib": (lambda data: zlib.compress(data, 1), zlib.decompress),
+    "lzma": (lambda data: lzma.compress(data, preset=1), lzma.decompress),
+}
+
+# the first byte of a batch tells whether it is compressed
+_PLAIN = b"\x00"
+_COMPRESSED = b"\x01"
+
+
+def _encode_varints(values):
+    """
+    encode non-negative integers as LEB128 varints:
+    7 bits per byte, the high bit set on all bytes but the last
+    :param values: uint64 NumPy array
+    :return: bytes
+    """
+
+    if len(values) == 0:
+        return b""
+
+    # the number of bytes of each value, at least one
+    lengths = np.ones(len(values), dtype=np.int64)
+    rest = values >> np.uint64(7)
+    while np.any(rest):
+        lengths += rest > 0
+        rest >>= np.uint64(7)
+
+    starts = np.cumsum(lengths) - lengths
+    out = np.empty(lengths.sum(), dtype=np.uint8)
+
+    for k in range(lengths.max()):
+        has = lengths > k
+        byte = (values[has] >> np.uint64(7 * k)) & np.uint64(0x7f)
+        byte |= np.where(lengths[has] > k + 1, 0x80, 0).astype(np.uint64)
+        out[starts[has] + k] = byte
+
+    return out.tobytes()
+
+
+def _decode_varints(data):
+    """
+    decode LEB128 varints
+    :param data: bytes
+    :return: uint64 NumPy array
+    """
+
+    if len(data) == 0:
+        return np.empty(0, dtype=np.uint64)
+
+    buf = np.frombuffer(data, dtype=np.uint8)
+
+    # a value ends at a byte without the high bit
+    ends = (buf & 0x80) == 0
+    starts = np.flatnonzero(np.concatenate(([True], ends[:-1])))
+
+    # the position of each byte within its value
+    positions = np.arange(len(buf)) - np.repeat(starts, np.diff(
+        np.append(starts, len(buf))
+    ))
+
+    parts = (buf & 0x7f).astype(np.uint64) << \
+        (np.uint64(7) * positions.astype(np.uint64))
+    return np.add.reduceat(parts, starts)
+
+
+class _BatchCodec:
+    """
+    _BatchCodec is an inner class that turns the batches of pickled
+    messages into bytes and back. A batch with at least threshold
+    messages is sorted by destination vertex; the ids are delta and
+    varint encoded and the pickled source ids and values are
+    compressed by zlib or lzma. Smaller batches are only pickled
+    """
+
+    def __init__(self, codec, threshold):
+        """
+        :param codec: str, "zlib" or "lzma"
+        :param threshold: int, the smallest number of messages
+            of a compressed batch
+        """
+
+        self._compress, self._decompress = _CODECS[codec]
+        self._threshold = threshold
+
+    def encode(self, superstep, dsts, srcs, values):
+        """
+        :param superstep: int
+        :param dsts: array of destination vertex ids
+        :param srcs: list of source vertex ids or None
+        :param values: list of message values
+        :return: a tuple (bytes, the number of bytes before
+            compression or None if the batch is not compressed)
+        """
+
+        if len(dsts) < self._threshold:
+            return _PLAIN + pickle.dumps(
+                (superstep, dsts, srcs, values),
+                protocol=pickle.HIGHEST_PROTOCOL
+            ), None
+
+        dsts = np.frombuffer(dsts, dtype=np.int64)
+        order = np.argsort(dsts, kind="stable")
+        dsts = dsts[order]
+
+        order = order.tolist()
+        values = [values[i] for i in order]
+        if srcs is not None:
+            srcs = [srcs[i] for i in order]
+
+        # the first id is kept as it is, then the gaps
+        deltas = np.diff(dsts, prepend=0).astype(np.uint64)
+        dst_data = _encode_varints(deltas)
+
+        payload = pickle.dumps((srcs, values),
+                               protocol=pickle.HIGHEST_PROTOCOL)
+
+        data = _COMPRESSED + pickle.dumps(
+            (superstep, dst_data, self._compress(payload)),
+            protocol=pickle.HIGHEST_PROTOCOL
+        )
+
+        return data, dsts.nbytes + len(payload)
+
+    def decode(self, data):
+        """
+        :param data: bytes or bytearray of an encoded batch
+        :return: a tuple (superstep, list of dst_vid,
+            list of src_vid or None, list of values)
+        """
+
+        if data[:1] == _PLAIN:
+            return pickle.loads(memoryview(data)[1:])
+
+        superstep, dst_data, payload = pickle.loads(memoryview(data)[1:])
+
+        dsts = np.cumsum(_decode_varints(dst_data).astype(np.int64))
+        srcs, values = pickle.loads(self._decompress(payload))
+
+        return superstep, dsts.tolist(), srcs, values
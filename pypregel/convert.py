@@ -0,0 +1,88 @@
+# convert a text adjacency graph into a binary graph file
+#
+# usage: python -m pypregel.convert GRAPH_FILE BINARY_FILE
+#
+# every line of the text graph is
+#     vertex_id:dst_id dst_id ...           (unweighted, e.g. pagerank)
+#     vertex_id:dst_id,w dst_id,w ...       (weighted, e.g. sssp)
+import sys
+import time
+
+from array import array
+
+from pypregel.binary import write_binary_graph
+
+
+def parse_text_graph(graph_fp):
+    """
+    parse a text adjacency graph into CSR arrays
+    :param graph_fp: a text file object
+    :return: a tuple (vids, offsets, dst, weights);
+        weights is None for an unweighted graph
+    """
+
+    vids = array("q")
+    offsets = array("q", [0])
+    dst = array("q")
+    int_weights = array("q")
+    float_weights = None
+
+    weighted = None
+
+    for line in graph_fp:
+        line = line.strip()
+        if not line:
+            continue
+
+        vertex_id, _, edges = line.partition(':')
+        vids.append(int(vertex_id))
+
+        for e in edges.split():
+            dst_vid, _, weight = e.partition(',')
+            dst.append(int(dst_vid))
+
+            if weighted is None:
+                weighted = bool(weight)
+            elif weighted != bool(weight):
+                raise ValueError("either all or no edges should have values.")
+
+            if not weighted:
+                continue
+
+            if float_weights is None:
+                try:
+                    int_weights.append(int(weight))
+                    continue
+                except ValueError:
+                    # switch to float weights from now on
+                    float_weights = array("d", int_weights)
+
+            float_weights.append(float(weight))
+
+        offsets.append(len(dst))
+
+    weights = None
+    if weighted:
+        weights = float_weights if float_weights is not None else int_weights
+
+    return vids, offsets, dst, weights
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("usage: python -m pypregel.convert [graph] [binary_graph]")
+        return
+
+    start_time = time.time()
+
+    with open(sys.argv[1], "r") as graph_fp:
+        vids, offsets, dst, weights = parse_text_graph(graph_fp)
+
+    write_binary_graph(sys.argv[2], vids, offsets, dst, weights)
+
+    print("%d vertices, %d edges converted in %f sec" %
+          (len(vids), len(dst), time.time() - start_time))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,467 @@
+import numpy as np
+import os
+import queue
+import tempfile
+import weakref
+
+from array import array
+from threading import Thread
+
+from pypregel.partition import _CSRPartition
+from pypregel.vertex import Edge, _EdgeView
+
+
+# the buffered edges are appended to the edge files
+# whenever there are this many of them
+_FLUSH_SIZE = 1 << 20
+
+# the read-ahead thread reads at most this many edges at once
+_BLOCK_SIZE = 1 << 16
+
+# the edges of two active vertices are read together if at most
+# this many edges of other vertices lie between them
+_MAX_GAP = 1 << 8
+
+# the number of blocks read ahead of the compute loop
+_READ_AHEAD = 8
+
+
+def _pread(fd, dtype, lo, hi):
+    """
+    read the items lo to hi of a file of one dtype
+    :param fd: int, file descriptor
+    :param dtype: NumPy dtype of the items
+    :param lo: int
+    :param hi: int
+    :return: read-only NumPy array
+    """
+
+    itemsize = np.dtype(dtype).itemsize
+    buf = os.pread(fd, (hi - lo) * itemsize, lo * itemsize)
+    return np.frombuffer(buf, dtype=dtype)
+
+
+def _write(fd, data):
+    """
+    write all bytes to a file; os.write() may write only a part,
+    e.g. at most about 2 GiB at once on Linux
+    :param fd: int, file descriptor
+    :param data: bytes-like object
+    :return: None
+    """
+
+    view = memoryview(data).cast("B")
+    while len(view) > 0:
+        view = view[os.write(fd, view):]
+
+
+def _remove_files(fds, file_names):
+    """
+    close and delete the edge files of a _DiskPartition; the finalizer
+    of the partition, called at the latest when the interpreter exits
+    :param fds: list of int, file descriptors
+    :param file_names: list of str
+    :return: None
+    """
+
+    for fd in fds:
+        os.close(fd)
+
+    for file_name in file_names:
+        if os.path.exists(file_name):
+            os.remove(file_name)
+
+
+def _blocks(los, his):
+    """
+    group the edge ranges of the vertices to compute into blocks read
+    at once; the ranges of a block follow each other in the file
+    with small gaps, and the blocks are in the order of the vertices
+    :param los: int64 array, the first edge of each vertex
+    :param his: int64 array, the end of the edges of each vertex
+    :return: a tuple of int64 arrays (starts, ends) of the blocks
+    """
+
+    non_empty = his > los
+    los = los[non_empty]
+    his = his[non_empty]
+    if len(los) == 0:
+        return los, his
+
+    # a run of ranges is broken where a range does not start
+    # shortly after the previous one ends
+    breaks = np.ones(len(los), dtype=bool)
+    breaks[1:] = (los[1:] < his[:-1]) | (los[1:] - his[:-1] > _MAX_GAP)
+    run_starts = los[breaks][np.cumsum(breaks) - 1]
+
+    # a run is cut into blocks of about _BLOCK_SIZE edges
+    keys = (his - run_starts) // _BLOCK_SIZE
+    firsts = breaks
+    firsts[1:] |= keys[1:] != keys[:-1]
+
+    lasts = np.empty(len(los), dtype=bool)
+    lasts[:-1] = firsts[1:]
+    lasts[-1] = True
+
+    return los[firsts], his[lasts]
+
+
+class _DiskPartition(_CSRPartition):
+    """
+    _DiskPartition is an inner class that keeps the out edges of the
+    vertices of one worker in two temporary files, the destination ids
+    and the edge values in CSR order; only the vertex ids and the
+    edge offsets are in memory.
+    While the active vertices are computed, a thread reads their edges
+    in blocks ahead of the compute loop; otherwise the files are
+    memory-mapped
+    """
+
+    def __init__(self, directory):
+        """
+        :param directory: str, the directory of the edge files,
+            or None for the default temporary directory
+        """
+
+        super().__init__()
+
+        self._dst_fd, self._dst_file = tempfile.mkstemp(
+            prefix="pypregel-edges-", suffix=".dst", dir=directory
+        )
+        self._weight_fd, self._weight_file = tempfile.mkstemp(
+            prefix="pypregel-edges-", suffix=".weights", dir=directory
+        )
+        self._weight_dtype = np.float64
+
+        # the files are deleted by close(), or when the partition is
+        # garbage-collected or the interpreter exits after an error
+        self._finalizer = weakref.finalize(
+            self, _remove_files, [self._dst_fd, self._weight_fd],
+            [self._dst_file, self._weight_file]
+        )
+
+        # the number of edges already appended to the files
+        self._num_of_flushed_edges = 0
+
+        # vertex id -> index in this partition
+        self._positions = None
+
+        # the read-ahead thread of a superstep puts tuples
+        # (lo, hi, dst array, weight array or None) into self._blocks
+        # and None after the last block
+        self._thread = None
+        self._blocks = None
+        self._stop = False
+        self._block = None
+        self._num_of_read_bytes = 0
+
+    def add_vertex(self, vertex):
+        """
+        move the out edges of a vertex into the edge files
+        and replace them by a read-only view
+        :param vertex: a Vertex object
+        :return: None
+        """
+
+        if self.dst is not None:
+            raise AttributeError("partition is already finalized")
+
+        lo = self._num_of_flushed_edges + len(self._dst_buf)
+
+        for e in vertex.get_out_edges():
+            self._dst_buf.append(e.get_dst_vid())
+            self._add_weight(e.get_value())
+
+        hi = self._num_of_flushed_edges + len(self._dst_buf)
+
+        self._vid_buf.append(vertex.get_vertex_id())
+        self._offset_buf.append(hi)
+
+        vertex.set_out_edges(_EdgeView(self, lo, hi))
+
+        if len(self._dst_buf) >= _FLUSH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        """
+        append the buffered edges to the edge files
+        :return: None
+        """
+
+        _write(self._dst_fd, self._dst_buf)
+        _write(self._weight_fd, self._weight_buf)
+
+        self._num_of_flushed_edges += len(self._dst_buf)
+        self._dst_buf = array("q")
+        self._weight_buf = array(self._weight_buf.typecode)
+
+    def _to_float_weights(self):
+        """
+        store the weights as floats from now on; the int weights in the
+        file are converted in place, since both take 8 bytes
+        :return: None
+        """
+
+        super()._to_float_weights()
+
+        if self._num_of_flushed_edges == 0:
+            return
+
+        weights = np.memmap(self._weight_file, dtype=np.int64, mode="r+",
+                            shape=(self._num_of_flushed_edges,))
+        for lo in range(0, len(weights), _FLUSH_SIZE):
+            chunk = weights[lo:lo + _FLUSH_SIZE]
+            chunk.view(np.float64)[:] = chunk.astype(np.float64)
+
+        weights.flush()
+        del weights
+
+    def load_arrays(self, vids, offsets, dst, weights):
+        """
+        write complete CSR arrays to the edge files
+        instead of adding vertices
+        :param vids: int64 array of vertex ids
+        :param offsets: int64 array of len(vids) + 1 edge offsets
+        :param dst: int64 array of destination vertex ids
+        :param weights: numeric array of edge values or None
+        :return: None
+        """
+
+        if len(self._vid_buf) > 0:
+            raise AttributeError("partition already has vertices")
+
+        for lo in range(0, len(dst), _FLUSH_SIZE):
+            hi = lo + _FLUSH_SIZE
+            _write(self._dst_fd,
+                   np.ascontiguousarray(dst[lo:hi], dtype=np.int64))
+            if weights is not None:
+                _write(self._weight_fd, np.ascontiguousarray(weights[lo:hi]))
+
+        self._num_of_flushed_edges = len(dst)
+        self._weighted = weights is not None
+        if weights is not None:
+            self._weight_dtype = weights.dtype
+
+        self.vids = np.array(vids, dtype=np.int64)
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self._map_files()
+
+    def finalize(self):
+        """
+        write the last buffered edges and map the edge files
+        :return: None
+        """
+
+        if self.dst is not None:
+            # the arrays were loaded directly
+            return
+
+        self._flush()
+
+        self.vids = np.frombuffer(self._vid_buf, dtype=np.int64)
+        self.offsets = np.frombuffer(self._offset_buf, dtype=np.int64)
+
+        if self._weight_buf.typecode == "q":
+            self._weight_dtype = np.int64
+
+        self._map_files()
+
+    def _map_files(self):
+        """
+        memory-map the edge files for the edges read outside of a stream
+        :return: None
+        """
+
+        num_of_edges = self._num_of_flushed_edges
+
+        # an empty file cannot be mapped
+        if num_of_edges == 0:
+            self.dst = np.empty(0, dtype=np.int64)
+        else:
+            self.dst = np.memmap(self._dst_file, dtype=np.int64, mode="r",
+                                 shape=(num_of_edges,))
+
+        if not self._weighted:
+            self.weights = None
+        elif num_of_edges == 0:
+            self.weights = np.empty(0, dtype=self._weight_dtype)
+        else:
+            self.weights = np.memmap(self._weight_file,
+                                     dtype=self._weight_dtype, mode="r",
+                                     shape=(num_of_edges,))
+
+        self._positions = dict(
+            zip(self.vids.tolist(), range(len(self.vids)))
+        )
+
+    def sort_vertices(self, vids):
+        """
+        sort vertex ids in the order of their edges in the files
+        :param vids: list of vertex ids of this partition
+        :return: None
+        """
+
+        vids.sort(key=self._positions.__getitem__)
+
+    def start_stream(self, vids):
+        """
+        start reading the edges of the vertices to compute in the
+        background; their edges must be accessed in the same order
+        :param vids: list of vertex ids
+        :return: None
+        """
+
+        positions = self._positions
+        indices = np.fromiter((positions[vid] for vid in vids),
+                              dtype=np.int64, count=len(vids))
+        starts, ends = _blocks(self.offsets[indices],
+                               self.offsets[indices + 1])
+
+        self._blocks = queue.Queue(maxsize=_READ_AHEAD)
+        self._stop = False
+        self._block = None
+        self._num_of_read_bytes = 0
+
+        self._thread = Thread(target=self._read_blocks,
+                              args=(starts.tolist(), ends.tolist()))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _read_blocks(self, starts, ends):
+        """
+        the target function of the read-ahead thread
+        :param starts: list of int, the first edge of each block
+        :param ends: list of int, the end of the edges of each block
+        :return: None
+        """
+
+        for lo, hi in zip(starts, ends):
+            if self._stop:
+                break
+
+            dst = _pread(self._dst_fd, np.int64, lo, hi)
+            weights = None
+            if self._weighted:
+                weights = _pread(self._weight_fd, self._weight_dtype, lo, hi)
+                self._num_of_read_bytes += weights.nbytes
+
+            self._num_of_read_bytes += dst.nbytes
+            self._blocks.put((lo, hi, dst, weights))
+
+        # end of for
+
+        self._blocks.put(None)
+
+    def stop_stream(self):
+        """
+        stop the read-ahead thread of this superstep
+        :return: int, the number of bytes it read
+        """
+
+        if self._thread is None:
+            return 0
+
+        self._stop = True
+
+        # the thread may wait for room in the queue
+        while self._blocks is not None:
+            if self._blocks.get() is None:
+                self._blocks = None
+
+        self._thread.join()
+        self._thread = None
+        self._block = None
+
+        return self._num_of_read_bytes
+
+    def _find_block(self, lo, hi):
+        """
+        find the block with the edges lo to hi; the blocks before it
+        belong to vertices computed already and are dropped
+        :param lo: int
+        :param hi: int
+        :return: a tuple (lo, hi, dst array, weight array or None),
+            or None if no block has these edges
+        """
+
+        block = self._block
+        if block is not None and block[0] <= lo and hi <= block[1]:
+            return block
+
+        while self._blocks is not None:
+            block = self._blocks.get()
+            if block is None:
+                self._blocks = None
+                break
+
+            self._block = block
+            if block[0] <= lo and hi <= block[1]:
+                return block
+
+        # end of while
+
+        return None
+
+    def get_dst(self, lo, hi):
+        """
+        get the destination vertex ids of the edges lo to hi
+        :param lo: int
+        :param hi: int
+        :return: int64 NumPy array
+        """
+
+        if lo < hi and self._thread is not None:
+            block = self._find_block(lo, hi)
+            if block is not None:
+                return block[2][lo - block[0]:hi - block[0]]
+
+        return self.dst[lo:hi]
+
+    def get_weights(self, lo, hi):
+        """
+        get the values of the edges lo to hi
+        :param lo: int
+        :param hi: int
+        :return: NumPy array or None if the edges have no value
+        """
+
+        if self.weights is None:
+            return None
+
+        if lo < hi and self._thread is not None:
+            block = self._find_block(lo, hi)
+            if block is not None:
+                return block[3][lo - block[0]:hi - block[0]]
+
+        return self.weights[lo:hi]
+
+    def get_edge(self, index):
+        """
+        create an Edge object for the edge at a position of the files
+        :param index: int
+        :return: an Edge object
+        """
+
+        weight = None
+        weights = self.get_weights(index, index + 1)
+        if weights is not None:
+            weight = weights[0].item()
+
+        return Edge(self.get_dst(index, index + 1)[0].item(), weight)
+
+    def nbytes(self):
+        """
+        get the number of bytes of the partition kept in memory
+        :return: int
+        """
+
+        return self.vids.nbytes + self.offsets.nbytes
+
+    def close(self):
+        """
+        delete the edge files
+        :return: None
+        """
+
+        self.stop_stream()
+        self._finalizer()
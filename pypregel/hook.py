@@ -0,0 +1,177 @@
+import cProfile
+import heapq
+import time
+
+
+class Hook:
+    """
+    Hook is a public class that user may extend to run code at points of
+    a computation; every method does nothing by default. A hook object
+    is called on every rank: load and write on all ranks, supersteps
+    on the ranks that compute vertices
+    """
+
+    def before_load(self, rank):
+        """
+        called before the graph is read and distributed
+        :param rank: int, the MPI rank (0 with the local engine)
+        :return: None
+        """
+
+        pass
+
+    def after_load(self, rank):
+        """
+        called once the vertices of this rank are ready
+        :param rank: int
+        :return: None
+        """
+
+        pass
+
+    def superstep_start(self, rank, superstep):
+        """
+        called before the vertices of a superstep are computed
+        :param rank: int
+        :param superstep: int
+        :return: None
+        """
+
+        pass
+
+    def superstep_end(self, rank, superstep, seconds):
+        """
+        called after a superstep, once its messages are delivered and
+        the active vertices and aggregated values are known
+        :param rank: int
+        :param superstep: int
+        :param seconds: float, the time of the superstep on this rank
+        :return: None
+        """
+
+        pass
+
+    def before_write(self, rank):
+        """
+        called after the last superstep, before the output is written
+        :param rank: int
+        :return: None
+        """
+
+        pass
+
+
+class ProfileHook(Hook):
+    """
+    ProfileHook profiles some supersteps of every rank with cProfile and
+    writes the statistics of each rank to PREFIX.rank-RANK.prof before
+    the output is written; they can be read with the pstats module
+    """
+
+    def __init__(self, supersteps, prefix="pypregel"):
+        """
+        :param supersteps: an iterable of the supersteps to profile
+        :param prefix: str, the path prefix of the statistics files
+        """
+
+        self._supersteps = set(supersteps)
+        self._prefix = prefix
+        self._profiler = cProfile.Profile()
+        self._profiled = False
+
+    def superstep_start(self, rank, superstep):
+        if superstep in self._supersteps:
+            self._profiled = True
+            self._profiler.enable()
+
+    def superstep_end(self, rank, superstep, seconds):
+        if superstep in self._supersteps:
+            self._profiler.disable()
+
+    def before_write(self, rank):
+        if not self._profiled:
+            return
+
+        file_name = "%s.rank-%d.prof" % (self._prefix, rank)
+        self._profiler.dump_stats(file_name)
+
+        print("--- profile of rank %d written to %s ---" % (rank, file_name))
+
+
+class _VertexSampler:
+    """
+    _VertexSampler is an inner class that times compute() of every
+    interval-th active vertex and keeps the slowest samples
+    """
+
+    def __init__(self, num_of_hot_vertices, interval):
+        """
+        :param num_of_hot_vertices: int, the number of samples to keep
+        :param interval: int, the number of active vertices per sample
+        """
+
+        self._num_of_hot_vertices = num_of_hot_vertices
+        self.interval = interval
+
+        # a min-heap of the slowest samples
+        # (seconds, vertex id, superstep, number of out edges)
+        self._samples = []
+
+    def get_offset(self, superstep):
+        """
+        the position of the first sampled active vertex; it moves with
+        the superstep so that other vertices are sampled next time
+        :param superstep: int
+        :return: int
+        """
+
+        return superstep % self.interval
+
+    def compute(self, vertex, superstep):
+        """
+        compute a vertex and record its time
+        :param vertex: a Vertex object
+        :param superstep: int
+        :return: None
+        """
+
+        start_time = time.perf_counter()
+        vertex.compute()
+        seconds = time.perf_counter() - start_time
+
+        samples = self._samples
+        if len(samples) < self._num_of_hot_vertices:
+            heapq.heappush(samples, (seconds, vertex.get_vertex_id(),
+                                     superstep, len(vertex.get_out_edges())))
+        elif seconds > samples[0][0]:
+            heapq.heapreplace(samples, (seconds, vertex.get_vertex_id(),
+                                        superstep,
+                                        len(vertex.get_out_edges())))
+
+    def get_hot_vertices(self):
+        """
+        :return: list of the kept samples (seconds, vertex id, superstep,
+            number of out edges), the slowest first
+        """
+
+        return sorted(self._samples, reverse=True)
+
+
+def _print_hot_vertices(gathered, num_of_hot_vertices):
+    """
+    print the slowest sampled compute() calls of all workers
+    :param gathered: list of the hot vertex lists of all workers,
+        by worker index
+    :param num_of_hot_vertices: int
+    :return: None
+    """
+
+    samples = []
+    for index, hot_vertices in enumerate(gathered):
+        samples.extend(sample + (index,) for sample in hot_vertices)
+
+    samples = sorted(samples, reverse=True)[:num_of_hot_vertices]
+
+    for seconds, vid, superstep, degree, index in samples:
+        print("--- hot vertex %d: %f sec in superstep %d, %d out edges, "
+              "worker %d ---" % (vid, seconds, superstep, degree, index))
@@ -0,0 +1,288 @@
+import numpy as np
+import time
+
+from pypregel.binary import BinaryReader
+from pypregel.disk import _DiskPartition
+from pypregel.hook import _VertexSampler, _print_hot_vertices
+from pypregel.messaging import _MessageHandler
+from pypregel.metrics import _Metrics, _write_metrics
+from pypregel.partition import _CSRPartition
+from pypregel.program import Partition
+
+
+# the number of vertices serialized at once when writing
+_WRITE_BATCH_SIZE = 10000
+
+
+class _LocalEngine(_MessageHandler):
+    """
+    _LocalEngine is an inner class that runs an app in one process
+    without MPI; it plays the master and a single worker, and messages
+    are delivered directly into the message map of the next superstep
+    with the message handling of the workers
+    """
+
+    def __init__(self, *, reader, writer, combiner, storage, msg_dtype,
+                 aggregators, halt_condition, anonymous_messages, program,
+                 metrics_file, metrics_format, hooks, hot_vertices,
+                 hot_vertex_interval, edge_dir):
+        super().__init__(combiner, msg_dtype, anonymous_messages,
+                         aggregators)
+
+        self._reader = reader
+        self._writer = writer
+        self._halt_condition = halt_condition
+
+        self._num_of_vertices = reader.read_num_of_vertices()
+        self._num_of_messages = 0
+
+        # there is no communication, so only the compute and receive
+        # (delivering typed messages) times are measured
+        self._metrics = _Metrics()
+        self._metrics_file = metrics_file
+        self._metrics_format = metrics_format
+
+        self._hooks = hooks
+        self._num_of_hot_vertices = hot_vertices
+        self._vertex_sampler = None
+        if hot_vertices > 0:
+            self._vertex_sampler = _VertexSampler(hot_vertices,
+                                                  hot_vertex_interval)
+
+        self._partition = None
+        if storage == "csr":
+            self._partition = _CSRPartition()
+
+        # with disk storage, the edges of the active vertices are read
+        # ahead of the compute loop, which visits them in file order
+        if storage == "disk":
+            self._partition = self._disk_partition = \
+                _DiskPartition(edge_dir)
+
+        self._read()
+
+        # a partition program computes all vertices at once
+        if program is not None:
+            self._program_partition = Partition(
+                program, self._partition, msg_dtype, self
+            )
+
+    def _read(self):
+        """
+        read all vertices of the graph file
+        :return: None
+        """
+
+        reader = self._reader
+        partition = self._partition
+
+        if partition is not None and isinstance(reader, BinaryReader):
+            # take the mapped arrays as they are
+            vids, offsets, dst, weights = reader.read_csr()
+            partition.load_arrays(vids, offsets, dst, weights)
+
+            for i, vid in enumerate(vids.tolist()):
+                self._add_vertex(
+                    reader.create_vertex(vid, partition.get_edge_view(i))
+                )
+
+            return
+
+        while True:
+            v = reader.read_vertex()
+            if v is None:
+                break
+
+            self._add_vertex(v)
+
+            if partition is not None:
+                partition.add_vertex(v)
+
+        if partition is not None:
+            partition.finalize()
+
+    def _add_vertex(self, vertex):
+        """
+        :param vertex: a Vertex object
+        :return: None
+        """
+
+        vertex.set_worker(self)
+        self._vertex_map[vertex.get_vertex_id()] = vertex
+        self._active_vertices.append(vertex.get_vertex_id())
+
+    def send_cur_message(self, src_vid, dst_vid, msg_value):
+        """
+        deliver a message from src_vid to dst_vid in the next superstep
+        :param src_vid: int, source vertex id
+        :param dst_vid: int, destination vertex id
+        :param msg_value: message value (user may decide its type)
+        :return: None
+        """
+
+        if self._msg_dtype is not None:
+            self._typed_dst_buf.append(dst_vid)
+            self._typed_value_buf.append(msg_value)
+            return
+
+        self._num_of_messages += 1
+        self._put_next_message(src_vid, dst_vid, msg_value)
+
+    def _deliver_typed_messages(self):
+        """
+        combine the buffered typed messages and
+        put them into the map of next messages
+        :return: None
+        """
+
+        start_time = time.time()
+
+        dst = np.frombuffer(self._typed_dst_buf, dtype=np.int64)
+        values = np.frombuffer(self._typed_value_buf, dtype=self._msg_dtype)
+        self._num_of_messages += len(dst)
+
+        if self._combiner:
+            dst, values = self._combiner.combine_batch(dst, values)
+
+        self._put_next_arrays(dst, values)
+
+        self._reset_typed_bufs()
+        self._metrics.receive_sec += time.time() - start_time
+
+    def run(self):
+        """
+        start a loop until no vertex is active or the halt condition holds;
+        the supersteps are the same as with MPI
+        :return: None
+        """
+
+        superstep = 1
+        metrics = self._metrics
+        start_time = time.time()
+        num_of_active_vertices = len(self._active_vertices)
+
+        while num_of_active_vertices > 0:
+            self._local_superstep = superstep
+
+            for hook in self._hooks:
+                hook.superstep_start(0, superstep)
+
+            metrics.start(superstep, num_of_active_vertices)
+
+            self._swap_messages()
+
+            compute_start_time = time.time()
+
+            if self._program_partition is not None:
+                msg_dst, msg_values = \
+                    self._program_partition._compute(superstep)
+                if msg_dst is not None:
+                    self.send_cur_messages(None, msg_dst, msg_values)
+                metrics.compute_sec = time.time() - compute_start_time
+
+                self._deliver_typed_messages()
+                num_of_active_vertices = \
+                    self._program_partition.get_num_of_active_vertices()
+            else:
+                if self._disk_partition is not None:
+                    self._disk_partition.start_stream(self._active_vertices)
+
+                if self._vertex_sampler is not None:
+                    self._compute_sampled(superstep)
+                else:
+                    for v in self._active_vertices:
+                        self._vertex_map[v].compute()
+
+                if self._disk_partition is not None:
+                    metrics.read_bytes = self._disk_partition.stop_stream()
+                metrics.compute_sec = time.time() - compute_start_time
+
+                if self._msg_dtype is not None:
+                    self._deliver_typed_messages()
+
+                self._update_active_vertices()
+                num_of_active_vertices = len(self._active_vertices)
+
+            _, self._aggregated_values = self._aggregators.unpack(
+                self._aggregating_values
+            )
+            self._aggregating_values = self._aggregators.initial_values()
+
+            seconds = metrics.finish(self._num_of_messages, 0)
+            print("worker 0 finishes %d in %f sec" % (superstep, seconds))
+
+            for hook in self._hooks:
+                hook.superstep_end(0, superstep, seconds)
+
+            if self._halt_condition is not None and \
+                    self._halt_condition(superstep, self._aggregated_values):
+                break
+
+            superstep += 1
+
+        # end of while
+
+        if self._program_partition is not None:
+            self._program_partition._store_values(self._vertex_map.values())
+
+        print("--- messages: %d local, 0 cross-worker (0.0%%), "
+              "%.0f messages/sec ---" %
+              (self._num_of_messages,
+               self._num_of_messages / max(time.time() - start_time, 1e-9)))
+
+        if self._metrics_file is not None:
+            _write_metrics(self._metrics_file, self._metrics_format,
+                           [metrics.get_rows()])
+
+        if self._vertex_sampler is not None:
+            _print_hot_vertices([self._vertex_sampler.get_hot_vertices()],
+                                self._num_of_hot_vertices)
+
+    def _compute_sampled(self, superstep):
+        """
+        compute the active vertices and time some of them
+        :param superstep: int
+        :return: None
+        """
+
+        sampler = self._vertex_sampler
+        interval = sampler.interval
+        offset = sampler.get_offset(superstep)
+
+        for i, v in enumerate(self._active_vertices):
+            if i % interval == offset:
+                sampler.compute(self._vertex_map[v], superstep)
+            else:
+                self._vertex_map[v].compute()
+
+    def write(self, write_mode):
+        """
+        serialize all vertices and write them to the output file,
+        or to part 0 in "parts" mode
+        :param write_mode: "master", "parts" or "mpiio"
+        :return: None
+        """
+
+        writer = self._writer
+        if write_mode == "parts":
+            writer.open_part(0)
+
+        vertex_list = []
+        for v in self._vertex_map.values():
+            vertex_list.append(writer.write_vertex(v))
+
+            if len(vertex_list) >= _WRITE_BATCH_SIZE:
+                writer.write_batch_to_file(vertex_list)
+                vertex_list = []
+
+        writer.write_batch_to_file(vertex_list)
+        writer.close()
+
+    def close(self):
+        """
+        delete the edge files of disk storage
+        :return: None
+        """
+
+        if self._disk_partition is not None:
+            self._disk_partition.close()
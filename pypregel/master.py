@@ -1,25 +1,176 @@
 import numpy as np
+import time
 
 from mpi4py import MPI
+from pypregel.checkpoint import _find_latest_checkpoint
+from pypregel.hook import _print_hot_vertices
+from pypregel.metrics import _write_metrics
 
 
 # define several Marcos
 _MASTER_MSG_TAG = 0
 
-# this is a parameter of this system
-_BATCH_SIZE = 1000
 _EOF = "$$$"
 
 
+def _scatter_vertices(comm, reader, partitioner, num_of_workers,
+                      batch_size, add_vertices=None):
+    """
+    read the graph batch by batch on rank 0 and scatter the vertices to
+    their workers; worker i is rank i + (size of comm - num_of_workers),
+    so rank 0 is either a dedicated master or worker 0
+    :param comm: MPI communicator
+    :param reader: a Reader object
+    :param partitioner: a Partitioner object
+    :param num_of_workers: int
+    :param batch_size: int, the number of vertices read at once
+    :param add_vertices: a function taking the vertices of rank 0,
+        or None if rank 0 owns no vertex
+    :return: None
+    """
+
+    first_worker_rank = comm.Get_size() - num_of_workers
+
+    while True:
+        # set a infinite loop and read a batch of vertices
+        vertex_list = reader.read_batch(batch_size)
+
+        # if no remaining vertex, then break
+        if len(vertex_list) == 0:
+            break
+
+        send_list = [[] for _ in range(comm.Get_size())]
+
+        for v in vertex_list:
+            if not partitioner.static:
+                partitioner.assign(
+                    v.get_vertex_id(),
+                    [e.get_dst_vid() for e in v.get_out_edges()]
+                )
+
+            # set the target rank
+            target = partitioner.get_worker(v.get_vertex_id())
+            send_list[target + first_worker_rank].append(v)
+
+        vertex_list = comm.scatter(send_list, root=0)
+        if add_vertices is not None:
+            add_vertices(vertex_list)
+
+    # end of while
+
+    # tell each worker reading should be over
+    comm.scatter([_EOF] * comm.Get_size(), root=0)
+
+    # share the vertex placement of a locality-aware partitioner
+    comm.bcast(partitioner.get_owner_array(), root=0)
+
+
+def _print_edge_cut(reduced):
+    """
+    :param reduced: int64 NumPy array [number of cut edges, number of edges]
+    :return: None
+    """
+
+    num_of_cut_edges, num_of_edges = reduced.tolist()
+    print("--- edge cut: %d of %d edges (%.1f%%) ---" %
+          (num_of_cut_edges, num_of_edges,
+           100.0 * num_of_cut_edges / max(num_of_edges, 1)))
+
+
+def _print_messages(reduced, seconds):
+    """
+    :param reduced: int64 NumPy array [number of local messages,
+        number of cross-worker messages]
+    :param seconds: float, the time of all supersteps
+    :return: None
+    """
+
+    num_of_local_messages, num_of_remote_messages = reduced.tolist()
+    num_of_messages = num_of_local_messages + num_of_remote_messages
+    print("--- messages: %d local, %d cross-worker (%.1f%%), "
+          "%.0f messages/sec ---" %
+          (num_of_local_messages, num_of_remote_messages,
+           100.0 * num_of_remote_messages / max(num_of_messages, 1),
+           num_of_messages / max(seconds, 1e-9)))
+
+
+def _print_compression(reduced):
+    """
+    :param reduced: float64 NumPy array [number of compressed batches,
+        bytes before compression, bytes after compression,
+        seconds of encoding, seconds of decoding] of all workers
+    :return: None
+    """
+
+    num_of_batches, num_of_bytes, num_of_compressed_bytes, \
+        compress_time, decompress_time = reduced.tolist()
+    print("--- compression: %d batches, %d bytes to %d bytes (%.2fx), "
+          "%f sec encoding, %f sec decoding ---" %
+          (num_of_batches, num_of_bytes, num_of_compressed_bytes,
+           num_of_bytes / max(num_of_compressed_bytes, 1),
+           compress_time, decompress_time))
+
+
+def _print_restart(superstep):
+    """
+    :param superstep: int or None, the superstep of the restored checkpoint
+    :return: None
+    """
+
+    if superstep is None:
+        print("--- no complete checkpoint, starting from superstep 1 ---")
+    else:
+        print("--- restarting from the checkpoint of superstep %d ---" %
+              superstep)
+
+
+def _print_checkpoint_reports(gathered):
+    """
+    print the overhead of each checkpoint:
+    the longest time a worker stopped computing to capture its state,
+    the longest time a worker spent writing in the background
+    and the total size of the files
+    :param gathered: list of the report lists of all workers
+    :return: None
+    """
+
+    # per_superstep: superstep -> [capture sec, write sec, bytes]
+    per_superstep = dict()
+    for reports in gathered:
+        for superstep, capture_time, write_time, size in reports:
+            report = per_superstep.setdefault(superstep, [0.0, 0.0, 0])
+            report[0] = max(report[0], capture_time)
+            report[1] = max(report[1], write_time)
+            report[2] += size
+
+    for superstep in sorted(per_superstep):
+        capture_time, write_time, size = per_superstep[superstep]
+        print("--- checkpoint %d: capture %f sec, "
+              "background write %f sec, %d bytes ---" %
+              (superstep, capture_time, write_time, size))
+
+
 class _Master:
     """
     _Master is an inner class used to define methods of the master of Pypregel
     """
 
-    def __init__(self, comm, reader, writer):
+    def __init__(self, *, comm, reader, writer, aggregators, halt_condition,
+                 parallel_load, partitioner, checkpointing, restart,
+                 metrics_file, metrics_format, hot_vertices,
+                 load_batch_size):
         self._comm = comm
         self._reader = reader
+        self._partitioner = partitioner
+        self._parallel_load = parallel_load
         self._writer = writer
+        self._aggregators = aggregators
+        self._halt_condition = halt_condition
+        self._checkpointing = checkpointing
+        self._metrics_file = metrics_file
+        self._metrics_format = metrics_format
+        self._num_of_hot_vertices = hot_vertices
+        self._load_batch_size = load_batch_size
         self._superstep = 0
         self._num_of_workers = comm.Get_size() - 1
 
@@ -27,10 +178,20 @@ class _Master:
             raise ValueError("the number of workers should be positive.")
 
         self._num_of_vertices = reader.read_num_of_vertices()
-        self._num_of_active_vertices = 0
+        self._num_of_active_vertices = self._num_of_vertices
+
+        # the computation starts from this superstep
+        self._first_superstep = 1
+
+        partitioner.setup(self._num_of_vertices, self._num_of_workers)
 
         self._split_work()
 
+        self._report_edge_cut()
+
+        if restart:
+            self._restore()
+
     def _split_work(self):
         """
         split a batch into different workers
@@ -38,70 +199,97 @@ class _Master:
         """
 
         comm = self._comm
-        reader = self._reader
 
         # Master broadcasts the configuration information
         comm.bcast((self._num_of_vertices, self._num_of_workers), root=0)
 
-        while True:
-            # set a infinite loop and read a batch of vertices
-            vertex_list = reader.read_batch(_BATCH_SIZE)
+        if self._parallel_load:
+            # workers read their own shards of the graph file
+            return
 
-            # if no remaining vertex, then break
-            if len(vertex_list) == 0:
-                break
+        _scatter_vertices(comm, self._reader, self._partitioner,
+                          self._num_of_workers, self._load_batch_size)
 
-            send_list = [[] for _ in range(self._num_of_workers)]
+    def _report_edge_cut(self):
+        """
+        reduce and print the number of edges between different workers
+        :return: None
+        """
 
-            for v in vertex_list:
-                # set the target worker id
-                target = v.get_vertex_id() % self._num_of_workers
-                send_list[target].append(v)
+        reduced = np.zeros(2, dtype=np.int64)
+        self._comm.Reduce(np.zeros(2, dtype=np.int64), reduced,
+                          op=MPI.SUM, root=0)
 
-            for i in range(self._num_of_workers):
-                if len(send_list[i]) > 0:
-                    comm.send(send_list[i], dest=i + 1, tag=_MASTER_MSG_TAG)
+        _print_edge_cut(reduced)
 
-        # end of while
+    def _restore(self):
+        """
+        find the latest checkpoint of all workers and
+        resume from the superstep after it
+        :return: None
+        """
 
-        # tell each worker reading should be over
-        for i in range(self._num_of_workers):
-            comm.send(_EOF, dest=i + 1, tag=_MASTER_MSG_TAG)
+        comm = self._comm
+
+        superstep = _find_latest_checkpoint(comm, None)
+        self._num_of_active_vertices = comm.allreduce(0, op=MPI.SUM)
+
+        if superstep is not None:
+            self._first_superstep = superstep + 1
+
+        _print_restart(superstep)
 
     def run(self):
         """
         start a loop until the number of active vertices is 0
+        or the halt condition holds
             1. master broadcasts superstep and worker synchronizes it
             2. waiting for workers and reduce the number of active vertices
+                together with the aggregators
         """
 
-        self._superstep = 1
-        self._num_of_active_vertices = self._num_of_vertices
+        self._superstep = self._first_superstep
         comm = self._comm
+        start_time = time.time()
 
         while self._num_of_active_vertices > 0:
             # master broadcasts the global superstep
             comm.bcast(self._superstep, root=0)
 
-            # this barrier corresponds to the barrier in workers
-            comm.Barrier()
-
-            # reset the number of active vertices
-            reduced_active_vertices = np.zeros(1)
+            # the master has no vertex and contributes initial values
+            self._num_of_active_vertices, aggregated_values = \
+                self._aggregators.allreduce(
+                    comm, self._aggregators.initial_values()
+                )
 
-            comm.Reduce(np.zeros(1),
-                        reduced_active_vertices,
-                        op=MPI.SUM,
-                        root=0)
+            if self._halt_condition is not None and \
+                    self._halt_condition(self._superstep, aggregated_values):
+                break
 
             # increase the global superstep by one
             self._superstep += 1
 
-            # set the number of active vertices
-            self._num_of_active_vertices = reduced_active_vertices[0]
-
         # broadcast to all workers that the computation is over
         comm.bcast(-1, root=0)
+        seconds = time.time() - start_time
+
+        reduced = np.zeros(2, dtype=np.int64)
+        comm.Reduce(np.zeros(2, dtype=np.int64), reduced, op=MPI.SUM, root=0)
+
+        _print_messages(reduced, seconds)
+
+        if self._checkpointing:
+            # the master has no checkpoint
+            _print_checkpoint_reports(comm.gather(None, root=0)[1:])
+
+        if self._metrics_file is not None:
+            # the master has no metrics
+            _write_metrics(self._metrics_file, self._metrics_format,
+                           comm.gather(None, root=0)[1:])
+
+        if self._num_of_hot_vertices > 0:
+            _print_hot_vertices(comm.gather([], root=0)[1:],
+                                self._num_of_hot_vertices)
 
     def write(self):
         """
@@ -121,3 +309,5 @@ class _Master:
 
             # write this vertex list to file
             self._writer.write_batch_to_file(vertex_list)
+
+        self._writer.close()
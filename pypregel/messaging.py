@@ -0,0 +1,390 @@
+import numpy as np
+import sys
+
+from array import array
+from collections import deque
+
+from pypregel.partition import _extend
+
+
+class _MessageHandler:
+    """
+    _MessageHandler is an inner class with the state and the methods that
+    vertices call on the _Worker and the _LocalEngine: buffering,
+    combining and delivering messages, voting to halt and aggregating.
+    A subclass decides where send_cur_message() sends a message and
+    when the typed message buffers are delivered
+    """
+
+    def __init__(self, combiner, msg_dtype, anonymous_messages,
+                 aggregators):
+        """
+        :param combiner: a Combiner object or None
+        :param msg_dtype: NumPy dtype of message values or None
+        :param anonymous_messages: Boolean
+        :param aggregators: an _AggregatorSet object
+        """
+
+        self._combiner = combiner
+
+        # with a message dtype, message values are numbers of this type;
+        # they are buffered in two arrays until the end of the superstep
+        self._msg_dtype = msg_dtype
+
+        # an anonymous message is only its value; otherwise a message is
+        # a tuple (src_vid, value) and the source goes to the combiner.
+        # typed messages are always anonymous
+        self._anonymous = anonymous_messages or msg_dtype is not None
+
+        # self._aggregated_values: name -> value of the last superstep
+        # self._aggregating_values: packed values of this superstep
+        self._aggregators = aggregators
+        self._aggregated_values = dict(
+            zip(aggregators.names(), aggregators.initial_values()[1:])
+        )
+        self._aggregating_values = aggregators.initial_values()
+
+        self._local_superstep = 0
+        self._num_of_vertices = None
+
+        # self._vertex_map: vid -> vertex object
+        self._vertex_map = dict()
+
+        # a _DiskPartition object with disk storage, whose edges are
+        # read in the order of its files
+        self._disk_partition = None
+
+        # a Partition object if a PartitionProgram computes
+        # all vertices at once instead of their compute()
+        self._program_partition = None
+
+        # self._active_vertices: list of the vertex ids to compute
+        # in the next superstep, each once;
+        # self._halt_vertices: set of the vertex ids that voted to halt
+        # and have not received a message since
+        self._active_vertices = []
+        self._halt_vertices = set()
+
+        # self._cur_messages: vertex_id -> deque of messages
+        self._cur_messages = dict()
+
+        # self._next_messages: vertex_id -> deque of messages;
+        # with a combiner, a deque holds one combined message
+        self._next_messages = dict()
+
+        # at most self._message_budget messages of the next superstep
+        # are kept in self._next_messages; the others go to _spill(),
+        # which only a _Worker with a message budget has
+        self._message_budget = sys.maxsize
+        self._num_of_next_messages = 0
+
+        # typed message buffers: an array of destination vertex ids
+        # and an array of message values
+        self._typed_dst_buf = None
+        self._typed_value_buf = None
+        if msg_dtype is not None:
+            self._reset_typed_bufs()
+
+    def has_cur_message(self, vertex_id):
+        """
+        check whether this vertex has message
+        :param vertex_id: int
+        :return: Boolean
+        """
+
+        if vertex_id not in self._cur_messages:
+            return False
+
+        return len(self._cur_messages[vertex_id]) > 0
+
+    def get_cur_message(self, vertex_id):
+        """
+        get the value of a piece of message from this vertex
+        :param vertex_id: int
+        :return: a value object; user-defined type
+        """
+
+        if not self.has_cur_message(vertex_id):
+            raise AttributeError("no more message")
+
+        msg = self._cur_messages[vertex_id].popleft()
+        return msg if self._anonymous else msg[1]
+
+    def send_cur_message(self, src_vid, dst_vid, msg_value):
+        """
+        a subclass needs to overwrite this method
+        :param src_vid: int, source vertex id
+        :param dst_vid: int, destination vertex id
+        :param msg_value: message value (user may decide its type)
+        :return: None
+        """
+
+        raise NotImplementedError(
+            "_MessageHandler send_cur_message() interface not implemented"
+        )
+
+    def get_cur_messages(self, vertex_id):
+        """
+        take the values of all messages of this vertex
+        :param vertex_id: int
+        :return: list of values
+        """
+
+        msgs = self._cur_messages.pop(vertex_id, None)
+        if msgs is None:
+            return []
+
+        if self._anonymous:
+            return list(msgs)
+
+        return [msg[1] for msg in msgs]
+
+    def send_cur_messages(self, src_vid, dst_vids, msg_values):
+        """
+        send a message from src_vid to each of dst_vids
+        :param src_vid: int, source vertex id
+        :param dst_vids: list or NumPy array of destination vertex ids
+        :param msg_values: list or NumPy array of message values
+        :return: None
+        """
+
+        if self._msg_dtype is not None:
+            _extend(self._typed_dst_buf, dst_vids, np.int64)
+            _extend(self._typed_value_buf, msg_values, self._msg_dtype)
+            return
+
+        if isinstance(dst_vids, np.ndarray):
+            dst_vids = dst_vids.tolist()
+        if isinstance(msg_values, np.ndarray):
+            msg_values = msg_values.tolist()
+
+        send_cur_message = self.send_cur_message
+        for dst_vid, msg_value in zip(dst_vids, msg_values):
+            send_cur_message(src_vid, dst_vid, msg_value)
+
+    def send_cur_message_to_all(self, src_vid, dst_vids, msg_value):
+        """
+        send the same message from src_vid to each of dst_vids
+        :param src_vid: int, source vertex id
+        :param dst_vids: list or NumPy array of destination vertex ids
+        :param msg_value: message value
+        :return: None
+        """
+
+        if self._msg_dtype is not None:
+            _extend(self._typed_dst_buf, dst_vids, np.int64)
+            self._typed_value_buf.extend(
+                array(self._typed_value_buf.typecode, [msg_value])
+                * len(dst_vids)
+            )
+            return
+
+        if isinstance(dst_vids, np.ndarray):
+            dst_vids = dst_vids.tolist()
+
+        send_cur_message = self.send_cur_message
+        for dst_vid in dst_vids:
+            send_cur_message(src_vid, dst_vid, msg_value)
+
+    def send_cur_message_to_mirrors(self, src_vid, msg_value):
+        """
+        send the same message from a hub to all its out neighbors
+        through the mirrors of the hub; there are no hubs by default
+        :param src_vid: int, source vertex id
+        :param msg_value: message value
+        :return: Boolean, False if src_vid is not a hub
+            and the message was not sent
+        """
+
+        return False
+
+    def halt(self, vertex_id):
+        """
+        deactivate a vertex
+        :param vertex_id: int
+        :return: None
+        """
+
+        self._halt_vertices.add(vertex_id)
+
+    def get_superstep(self):
+        """
+        return the current local superstep
+        :return: int
+        """
+
+        return self._local_superstep
+
+    def get_num_of_vertices(self):
+        """
+        return the total number of vertices
+        :return: int
+        """
+
+        return self._num_of_vertices
+
+    def aggregate(self, name, value):
+        """
+        contribute a value to an aggregator in this superstep
+        :param name: str, aggregator name
+        :param value: a number
+        :return: None
+        """
+
+        self._aggregators.aggregate(
+            self._aggregating_values,
+            self._aggregators.get_slot(name),
+            value
+        )
+
+    def get_aggregated_value(self, name):
+        """
+        get the value of an aggregator in the last superstep
+        :param name: str, aggregator name
+        :return: a number
+        """
+
+        if name not in self._aggregated_values:
+            raise KeyError("aggregator %s is not registered" % name)
+
+        return self._aggregated_values[name]
+
+    def _swap_messages(self):
+        """
+        make the messages of the next superstep the current ones
+        at the start of a superstep
+        :return: None
+        """
+
+        self._cur_messages = self._next_messages
+        self._next_messages = dict()
+        self._num_of_next_messages = 0
+
+    def _put_next_message(self, src_vid, dst_vid, msg_value):
+        """
+        put a message into the map of next messages;
+        with a combiner, each vertex keeps only one combined message
+        :param src_vid: int or None, source vertex id
+        :param dst_vid: int, destination vertex id
+        :param msg_value: message value
+        :return: None
+        """
+
+        msgs = self._next_messages.get(dst_vid)
+
+        if msgs is None or not self._combiner:
+            # a message that is not combined into a kept one
+            # takes memory unless it is spilled
+            if self._num_of_next_messages >= self._message_budget:
+                self._spill().add(src_vid, dst_vid, msg_value)
+                return
+
+            self._num_of_next_messages += 1
+
+        if self._anonymous:
+            if msgs is None:
+                self._next_messages[dst_vid] = deque([msg_value])
+            elif self._combiner:
+                _, msgs[0] = self._combiner.combine(
+                    (None, msgs[0]), (None, msg_value)
+                )
+            else:
+                msgs.append(msg_value)
+        elif msgs is None:
+            self._next_messages[dst_vid] = deque([(src_vid, msg_value)])
+        elif self._combiner:
+            msgs[0] = tuple(
+                self._combiner.combine(msgs[0], (src_vid, msg_value))
+            )
+        else:
+            msgs.append((src_vid, msg_value))
+
+    def _put_next_arrays(self, dst, values):
+        """
+        put typed messages into the partition program, or into the map
+        of next messages up to the message budget and spill the others
+        :param dst: int64 NumPy array of destination vertex ids
+        :param values: NumPy array of message values, combined already
+            if there is a combiner
+        :return: None
+        """
+
+        if self._program_partition is not None:
+            self._program_partition._deliver(dst, values)
+            return
+
+        num_of_kept_messages = \
+            self._message_budget - self._num_of_next_messages
+        if len(dst) > num_of_kept_messages:
+            # the messages over the budget are spilled
+            self._spill().add_arrays(dst[num_of_kept_messages:],
+                                     values[num_of_kept_messages:])
+            dst = dst[:num_of_kept_messages]
+            values = values[:num_of_kept_messages]
+
+        self._num_of_next_messages += len(dst)
+
+        # split the messages into the map of next messages
+        next_messages = self._next_messages
+        for dst_vid, msg_value in zip(dst.tolist(), values.tolist()):
+            if dst_vid not in next_messages:
+                next_messages[dst_vid] = deque()
+
+            next_messages[dst_vid].append(msg_value)
+
+    def _spill(self):
+        """
+        only a _Worker with a message budget spills messages
+        :return: a _MessageSpill object
+        """
+
+        raise NotImplementedError(
+            "_MessageHandler _spill() interface not implemented"
+        )
+
+    def _reset_typed_bufs(self):
+        """
+        create empty typed message buffers
+        :return: None
+        """
+
+        self._typed_dst_buf = array("q")
+        self._typed_value_buf = array(np.dtype(self._msg_dtype).char)
+
+    def _update_active_vertices(self):
+        """
+        find the vertices to compute in the next superstep from the ones
+        computed in this superstep and the ones that received messages,
+        without scanning the whole partition
+        :return: None
+        """
+
+        halted = self._halt_vertices
+        next_messages = self._next_messages
+        vertex_map = self._vertex_map
+
+        # the vertices that did not vote to halt stay active;
+        # the ones that received messages are added below, each once
+        active = [vid for vid in self._active_vertices
+                  if vid not in halted and vid not in next_messages]
+
+        # the vertices that received messages should be active
+        # in the next step, whether they voted to halt or not
+        active.extend(vid for vid in next_messages if vid in vertex_map)
+        halted.difference_update(next_messages)
+
+        self._active_vertices = self._order_active_vertices(active)
+
+    def _order_active_vertices(self, active):
+        """
+        put the vertices to compute in the next superstep in the order
+        in which they are computed
+        :param active: list of vertex ids
+        :return: list of vertex ids
+        """
+
+        if self._disk_partition is not None:
+            # the edges are read in the order of the files
+            self._disk_partition.sort_vertices(active)
+
+        return active
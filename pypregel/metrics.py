@@ -0,0 +1,245 @@
+import json
+import numpy as np
+import time
+
+
+# the columns of the metrics of a worker in a superstep:
+#     start: time.time() when the superstep started
+#     total_sec: the whole superstep
+#     compute_sec: compute() of the vertices or the partition program
+#     send_sec: packing and sending messages to other workers,
+#         including the collective exchange of typed messages
+#     receive_sec: receiving messages and putting them into
+#         the messages of the next superstep
+#     sync_sec: the all-reduce ending the superstep, i.e. the time
+#         of waiting for the slowest worker
+#     checkpoint_sec: capturing a checkpoint
+#     active_vertices: the vertices computed in the superstep
+#     local_messages, remote_messages: sent to vertices of this worker
+#         and of other workers
+#     received_messages: arrived from other workers (after combining)
+#     sent_bytes, received_bytes: to and from other workers
+#     spilled_messages, spilled_bytes: messages of the next superstep
+#         over the message budget, written to run files
+#     read_bytes: out edges of the active vertices read from disk
+#     compressed_batches: pickled batches sent compressed
+#     uncompressed_bytes, compressed_bytes: their size before and
+#         after compression
+#     compress_sec, decompress_sec: encoding the batches sent and
+#         decoding the batches received
+_FIELDS = (
+    "superstep", "start", "total_sec", "compute_sec", "send_sec",
+    "receive_sec", "sync_sec", "checkpoint_sec", "active_vertices",
+    "local_messages", "remote_messages", "received_messages",
+    "sent_bytes", "received_bytes", "spilled_messages", "spilled_bytes",
+    "read_bytes", "compressed_batches", "uncompressed_bytes",
+    "compressed_bytes", "compress_sec", "decompress_sec",
+)
+
+# the phases of a superstep in a Chrome trace, drawn one after another
+_PHASES = ("compute", "send", "receive", "sync", "checkpoint")
+
+
+class _Metrics:
+    """
+    _Metrics is an inner class that collects the metrics of a worker,
+    one row per superstep; the phases add their times and counts to
+    the attributes of the current superstep
+    """
+
+    def __init__(self):
+        self._rows = []
+        self._start_time = None
+
+        # the message counters of the worker at the end of the
+        # last superstep
+        self._num_of_local_messages = 0
+        self._num_of_remote_messages = 0
+
+        self.start(0, 0)
+
+    def start(self, superstep, num_of_active_vertices):
+        """
+        reset the attributes for a superstep
+        :param superstep: int
+        :param num_of_active_vertices: int, the vertices to compute
+        :return: None
+        """
+
+        self._start_time = time.time()
+
+        self.superstep = superstep
+        self.active_vertices = num_of_active_vertices
+
+        self.compute_sec = 0.0
+        self.send_sec = 0.0
+        self.receive_sec = 0.0
+        self.sync_sec = 0.0
+        self.checkpoint_sec = 0.0
+
+        self.received_messages = 0
+        self.sent_bytes = 0
+        self.received_bytes = 0
+        self.spilled_messages = 0
+        self.spilled_bytes = 0
+        self.read_bytes = 0
+        self.compressed_batches = 0
+        self.uncompressed_bytes = 0
+        self.compressed_bytes = 0
+        self.compress_sec = 0.0
+        self.decompress_sec = 0.0
+
+    def finish(self, num_of_local_messages, num_of_remote_messages):
+        """
+        store the row of the superstep
+        :param num_of_local_messages: int, the counter of the worker
+        :param num_of_remote_messages: int, the counter of the worker
+        :return: float, the seconds of the superstep
+        """
+
+        total_sec = time.time() - self._start_time
+
+        self._rows.append((
+            self.superstep, self._start_time, total_sec, self.compute_sec,
+            self.send_sec, self.receive_sec, self.sync_sec,
+            self.checkpoint_sec, self.active_vertices,
+            num_of_local_messages - self._num_of_local_messages,
+            num_of_remote_messages - self._num_of_remote_messages,
+            self.received_messages, self.sent_bytes, self.received_bytes,
+            self.spilled_messages, self.spilled_bytes, self.read_bytes,
+            self.compressed_batches, self.uncompressed_bytes,
+            self.compressed_bytes, self.compress_sec, self.decompress_sec
+        ))
+
+        self._num_of_local_messages = num_of_local_messages
+        self._num_of_remote_messages = num_of_remote_messages
+
+        return total_sec
+
+    def get_rows(self):
+        """
+        :return: float64 NumPy array, one row of _FIELDS per superstep
+        """
+
+        return np.array(self._rows, dtype=np.float64).reshape(
+            -1, len(_FIELDS)
+        )
+
+    def get_totals(self, fields):
+        """
+        :param fields: tuple of names of _FIELDS
+        :return: float64 NumPy array, the sum of each field
+            over all supersteps
+        """
+
+        rows = self.get_rows()
+        return rows[:, [_FIELDS.index(field) for field in fields]].sum(axis=0)
+
+
+def _to_records(rows):
+    """
+    :param rows: NumPy array of metrics rows
+    :return: list of dict of field -> number
+    """
+
+    records = []
+    for row in rows.tolist():
+        record = dict(zip(_FIELDS, row))
+        for field in _FIELDS:
+            if field != "start" and not field.endswith("_sec"):
+                record[field] = int(record[field])
+
+        records.append(record)
+
+    return records
+
+
+def _metrics_json(gathered):
+    """
+    the metrics of each superstep, with the slowest worker and the
+    imbalance (the longest over the mean time a worker was busy,
+    i.e. not waiting in the all-reduce)
+    :param gathered: list of the metrics rows of all workers,
+        by worker index
+    :return: dict
+    """
+
+    supersteps = []
+    for i in range(min(len(rows) for rows in gathered)):
+        workers = _to_records(np.array([rows[i] for rows in gathered]))
+        busy = np.array([w["total_sec"] - w["sync_sec"] for w in workers])
+
+        supersteps.append({
+            "superstep": workers[0]["superstep"],
+            "slowest_worker": int(np.argmax(busy)),
+            "max_busy_sec": float(busy.max()),
+            "imbalance": float(busy.max() / max(busy.mean(), 1e-9)),
+            "workers": workers,
+        })
+
+    return {"fields": list(_FIELDS), "supersteps": supersteps}
+
+
+def _chrome_trace(gathered):
+    """
+    a timeline in the Trace Event Format of chrome://tracing and
+    Perfetto: a thread per worker, an event per superstep with the
+    counts as arguments, and the phases inside it
+    :param gathered: list of the metrics rows of all workers,
+        by worker index
+    :return: dict
+    """
+
+    starts = [rows[:, 1].min() for rows in gathered if len(rows) > 0]
+    first_start = min(starts) if starts else 0.0
+
+    events = [{"name": "process_name", "ph": "M", "pid": 0,
+               "args": {"name": "pypregel"}}]
+
+    for index, rows in enumerate(gathered):
+        events.append({"name": "thread_name", "ph": "M", "pid": 0,
+                       "tid": index, "args": {"name": "worker %d" % index}})
+
+        for record in _to_records(rows):
+            # microseconds since the first superstep
+            ts = (record["start"] - first_start) * 1e6
+
+            events.append({
+                "name": "superstep %d" % record["superstep"],
+                "ph": "X", "pid": 0, "tid": index, "ts": ts,
+                "dur": record["total_sec"] * 1e6,
+                "args": {field: record[field] for field in _FIELDS
+                         if not field.endswith("_sec") and
+                         field not in ("superstep", "start")},
+            })
+
+            for phase in _PHASES:
+                dur = record[phase + "_sec"] * 1e6
+                if dur > 0:
+                    events.append({"name": phase, "ph": "X", "pid": 0,
+                                   "tid": index, "ts": ts, "dur": dur})
+                ts += dur
+
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def _write_metrics(file_name, file_format, gathered):
+    """
+    write the gathered metrics of all workers
+    :param file_name: str
+    :param file_format: "json" or "chrome"
+    :param gathered: list of the metrics rows of all workers,
+        by worker index
+    :return: None
+    """
+
+    if file_format == "chrome":
+        data = _chrome_trace(gathered)
+    else:
+        data = _metrics_json(gathered)
+
+    with open(file_name, "w") as f:
+        json.dump(data, f)
+
+    print("--- metrics of %d workers written to %s ---" %
+          (len(gathered), file_name))
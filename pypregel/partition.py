@@ -0,0 +1,231 @@
+import numpy as np
+
+from array import array
+
+from pypregel.vertex import Edge, _EdgeView
+
+
+def _extend(buf, items, dtype):
+    """
+    append a list or a NumPy array of numbers to a typed array
+    :param buf: array.array
+    :param items: list or NumPy array
+    :param dtype: NumPy dtype of buf
+    :return: None
+    """
+
+    if isinstance(items, np.ndarray):
+        buf.frombytes(items.astype(dtype, copy=False).tobytes())
+    else:
+        buf.extend(items)
+
+
+class _CSRPartition:
+    """
+    _CSRPartition is an inner class that stores the out edges of
+    the vertices of one worker as contiguous arrays in CSR layout:
+        vids[i] is the id of the i-th vertex of this partition,
+        dst[offsets[i]:offsets[i + 1]] are its destination ids and
+        weights[offsets[i]:offsets[i + 1]] are its edge values
+    """
+
+    def __init__(self):
+        # growable buffers are used while vertices are being added;
+        # they are turned into NumPy arrays by finalize()
+        self._vid_buf = array("q")
+        self._offset_buf = array("q", [0])
+        self._dst_buf = array("q")
+
+        # the weights are int64 ("q") if the first one is an int,
+        # otherwise and as soon as one is not an int64, float64 ("d")
+        self._weight_buf = array("d")
+
+        # None: no edge seen yet; False: unweighted; True: weighted
+        self._weighted = None
+
+        self.vids = None
+        self.offsets = None
+        self.dst = None
+        self.weights = None
+
+    def add_vertex(self, vertex):
+        """
+        move the out edges of a vertex into the partition arrays
+        and replace them by a read-only view
+        :param vertex: a Vertex object
+        :return: None
+        """
+
+        if self.dst is not None:
+            raise AttributeError("partition is already finalized")
+
+        lo = len(self._dst_buf)
+
+        for e in vertex.get_out_edges():
+            self._dst_buf.append(e.get_dst_vid())
+            self._add_weight(e.get_value())
+
+        hi = len(self._dst_buf)
+
+        self._vid_buf.append(vertex.get_vertex_id())
+        self._offset_buf.append(hi)
+
+        vertex.set_out_edges(_EdgeView(self, lo, hi))
+
+    def _add_weight(self, weight):
+        """
+        append an edge value to the weight buffer
+        :param weight: int, float or None
+        :return: None
+        """
+
+        if self._weighted is None:
+            self._weighted = weight is not None
+            if isinstance(weight, int):
+                self._weight_buf = array("q")
+
+        if weight is None:
+            if self._weighted:
+                raise ValueError("either all or no edges should have values.")
+            return
+
+        if not self._weighted:
+            raise ValueError("either all or no edges should have values.")
+
+        if not isinstance(weight, (int, float)):
+            raise TypeError(
+                "compact storage only supports numeric edge values."
+            )
+
+        if self._weight_buf.typecode == "q":
+            if not isinstance(weight, int):
+                self._to_float_weights()
+            elif not -2 ** 63 <= weight < 2 ** 63:
+                self._to_float_weights()
+
+        self._weight_buf.append(weight)
+
+    def _to_float_weights(self):
+        """
+        store the weights as floats from now on
+        :return: None
+        """
+
+        self._weight_buf = array("d", self._weight_buf)
+
+    def load_arrays(self, vids, offsets, dst, weights):
+        """
+        take over complete CSR arrays instead of adding vertices;
+        the arrays are not copied
+        :param vids: int64 array of vertex ids
+        :param offsets: int64 array of len(vids) + 1 edge offsets
+        :param dst: int64 array of destination vertex ids
+        :param weights: numeric array of edge values or None
+        :return: None
+        """
+
+        if len(self._vid_buf) > 0:
+            raise AttributeError("partition already has vertices")
+
+        self.vids = vids
+        self.offsets = offsets
+        self.dst = dst
+        self.weights = weights
+
+    def get_edge_view(self, index):
+        """
+        create a read-only view of the out edges of the index-th vertex
+        :param index: int
+        :return: an _EdgeView object
+        """
+
+        return _EdgeView(
+            self, self.offsets[index].item(), self.offsets[index + 1].item()
+        )
+
+    def finalize(self):
+        """
+        freeze the growable buffers into NumPy arrays
+        :return: None
+        """
+
+        if self.dst is not None:
+            # the arrays were loaded directly
+            return
+
+        # np.frombuffer does not copy; the buffers stay alive
+        # as the base objects of the arrays
+        self.vids = np.frombuffer(self._vid_buf, dtype=np.int64)
+        self.offsets = np.frombuffer(self._offset_buf, dtype=np.int64)
+        self.dst = np.frombuffer(self._dst_buf, dtype=np.int64)
+
+        if self._weighted:
+            self.weights = np.frombuffer(
+                self._weight_buf,
+                dtype=np.int64 if self._weight_buf.typecode == "q"
+                else np.float64
+            )
+
+    def get_dst(self, lo, hi):
+        """
+        get the destination vertex ids of the edges lo to hi
+        :param lo: int
+        :param hi: int
+        :return: int64 NumPy array
+        """
+
+        return self.dst[lo:hi]
+
+    def get_weights(self, lo, hi):
+        """
+        get the values of the edges lo to hi
+        :param lo: int
+        :param hi: int
+        :return: NumPy array or None if the edges have no value
+        """
+
+        if self.weights is None:
+            return None
+
+        return self.weights[lo:hi]
+
+    def get_edge(self, index):
+        """
+        create an Edge object for the edge at a position of the arrays
+        :param index: int
+        :return: an Edge object
+        """
+
+        weight = None
+        if self.weights is not None:
+            weight = self.weights[index].item()
+
+        return Edge(self.dst[index].item(), weight)
+
+    def get_num_of_vertices(self):
+        """
+        get the number of vertices in this partition
+        :return: int
+        """
+
+        return len(self.vids)
+
+    def get_num_of_edges(self):
+        """
+        get the number of edges in this partition
+        :return: int
+        """
+
+        return len(self.dst)
+
+    def nbytes(self):
+        """
+        get the number of bytes used by the partition arrays
+        :return: int
+        """
+
+        total = self.vids.nbytes + self.offsets.nbytes + self.dst.nbytes
+        if self.weights is not None:
+            total += self.weights.nbytes
+
+        return total
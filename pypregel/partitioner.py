@@ -0,0 +1,230 @@
+import numpy as np
+
+
+def _check_vid(vid, num_of_vertices):
+    """
+    :param vid: int
+    :param num_of_vertices: int
+    :return: None; raises a ValueError for an id outside [0, n)
+    """
+
+    if not 0 <= vid < num_of_vertices:
+        raise ValueError(
+            "vertex id %d is not in [0, %d)" % (vid, num_of_vertices)
+        )
+
+
+def _check_vids(vids, num_of_vertices):
+    """
+    :param vids: int64 NumPy array
+    :param num_of_vertices: int
+    :return: None; raises a ValueError for an id outside [0, n)
+    """
+
+    if len(vids) > 0:
+        _check_vid(vids.min().item(), num_of_vertices)
+        _check_vid(vids.max().item(), num_of_vertices)
+
+
+class Partitioner:
+    """
+    Partitioner is a public class that decides which worker owns a vertex;
+    user may extend it. Workers are numbered from 0 and
+    vertex ids are expected to be in [0, number of vertices)
+    """
+
+    # a static partitioner does not look at the edges in assign()
+    static = True
+
+    def __init__(self):
+        self._num_of_vertices = None
+        self._num_of_workers = None
+
+    def setup(self, num_of_vertices, num_of_workers):
+        """
+        called on every process before reading the graph
+        :param num_of_vertices: int
+        :param num_of_workers: int
+        :return: None
+        """
+
+        self._num_of_vertices = num_of_vertices
+        self._num_of_workers = num_of_workers
+
+    def assign(self, vid, dst_vids):
+        """
+        called once for each vertex while reading the graph, in reading
+        order; a locality-aware partitioner may choose a worker here
+        :param vid: int
+        :param dst_vids: list or NumPy array of destination vertex ids
+        :return: None
+        """
+
+        pass
+
+    def get_owner_array(self):
+        """
+        get the worker of each vertex chosen by assign(), so that it can be
+        shared with other processes; -1 for a vertex not assigned here
+        :return: int32 NumPy array, or None for a static partitioner
+        """
+
+        return None
+
+    def set_owner_array(self, owners):
+        """
+        set the worker of each vertex after sharing
+        :param owners: int32 NumPy array
+        :return: None
+        """
+
+        pass
+
+    def get_sizes(self):
+        """
+        get the number of vertices assign() gave to each worker; with
+        parallel loading, the workers add up their sizes while assigning
+        the vertices of their shards
+        :return: int64 NumPy array, or None for a static partitioner
+        """
+
+        return None
+
+    def set_sizes(self, sizes):
+        """
+        set the number of vertices of each worker after adding up
+        :param sizes: int64 NumPy array
+        :return: None
+        """
+
+        pass
+
+    def get_worker(self, vid):
+        """
+        user needs to overwrite this method; it should take O(1) time
+        :param vid: int
+        :return: int, 0 <= worker < number of workers
+        """
+
+        raise NotImplementedError(
+            "Partitioner get_worker() interface not implemented"
+        )
+
+    def get_workers(self, vids):
+        """
+        get the worker of each vertex of an array
+        :param vids: int64 NumPy array
+        :return: int64 NumPy array
+        """
+
+        return np.fromiter((self.get_worker(vid) for vid in vids.tolist()),
+                           dtype=np.int64, count=len(vids))
+
+
+class HashPartitioner(Partitioner):
+    """
+    HashPartitioner places a vertex on worker vid % number of workers
+    """
+    def get_worker(self, vid):
+        return vid % self._num_of_workers
+
+    def get_workers(self, vids):
+        return vids % self._num_of_workers
+
+
+class RangePartitioner(Partitioner):
+    """
+    RangePartitioner places consecutive vertex ids on the same worker;
+    worker i owns [n * i // w, n * (i + 1) // w), the same rows as
+    shard i of a binary graph file with sorted vertex ids;
+    a vertex id outside [0, n) raises a ValueError
+    """
+    def get_worker(self, vid):
+        _check_vid(vid, self._num_of_vertices)
+        return ((vid + 1) * self._num_of_workers - 1) // self._num_of_vertices
+
+    def get_workers(self, vids):
+        _check_vids(vids, self._num_of_vertices)
+        return ((vids + 1) * self._num_of_workers - 1) // self._num_of_vertices
+
+
+class LDGPartitioner(Partitioner):
+    """
+    LDGPartitioner is a streaming locality-aware partitioner
+    (linear deterministic greedy): each vertex goes to the worker that
+    already owns most of its out neighbors, weighted by the remaining
+    capacity of the worker. With parallel loading, every worker assigns
+    the vertices of its own shard and only sees the owners of neighbors
+    in that shard; the numbers of vertices of the workers are added up
+    whenever all workers together have assigned about load_batch_size
+    vertices. A vertex id outside [0, n) raises a ValueError
+    """
+
+    static = False
+
+    def __init__(self, slack=0.05):
+        """
+        :param slack: float, how much a worker may exceed an even share
+        """
+
+        super().__init__()
+        self._slack = slack
+        self._owners = None
+        self._sizes = None
+        self._capacity = None
+
+    def setup(self, num_of_vertices, num_of_workers):
+        super().setup(num_of_vertices, num_of_workers)
+
+        self._owners = np.full(num_of_vertices, -1, dtype=np.int32)
+        self._sizes = np.zeros(num_of_workers, dtype=np.int64)
+        self._capacity = (1 + self._slack) * num_of_vertices / num_of_workers
+
+    def assign(self, vid, dst_vids):
+        dst_vids = np.asarray(dst_vids, dtype=np.int64)
+        _check_vid(vid, self._num_of_vertices)
+        _check_vids(dst_vids, self._num_of_vertices)
+
+        owners = self._owners[dst_vids]
+        neighbors = np.bincount(owners[owners >= 0],
+                                minlength=self._num_of_workers)
+
+        score = neighbors * np.maximum(0.0, 1 - self._sizes / self._capacity)
+
+        # among the best workers, take the least loaded one
+        best = np.flatnonzero(score == score.max())
+        worker = best[np.argmin(self._sizes[best])]
+
+        self._owners[vid] = worker
+        self._sizes[worker] += 1
+
+    def get_owner_array(self):
+        return self._owners
+
+    def set_owner_array(self, owners):
+        self._owners = owners
+
+    def get_sizes(self):
+        return self._sizes
+
+    def set_sizes(self, sizes):
+        self._sizes = sizes
+
+    def get_worker(self, vid):
+        _check_vid(vid, self._num_of_vertices)
+
+        worker = self._owners[vid]
+        if worker < 0:
+            # not in the graph file; fall back to hashing
+            return vid % self._num_of_workers
+
+        return worker.item()
+
+    def get_workers(self, vids):
+        _check_vids(vids, self._num_of_vertices)
+
+        workers = self._owners[vids].astype(np.int64)
+        unassigned = workers < 0
+        workers[unassigned] = vids[unassigned] % self._num_of_workers
+
+        return workers
@@ -0,0 +1,191 @@
+import numpy as np
+
+
+class PartitionProgram:
+    """
+    PartitionProgram is a public class that user may extend instead of
+    writing Vertex.compute(); its compute() runs once per superstep
+    over all vertices of a worker, given as NumPy arrays
+    """
+
+    # the NumPy dtype of vertex values; values start at 0
+    value_dtype = np.float64
+
+    def compute(self, partition):
+        """
+        user needs to overwrite this method;
+        only the vertices in partition.active should change their values,
+        send messages or stay active
+        :param partition: a Partition object of this worker
+        :return: a tuple (values, active, msg_dst, msg_values):
+            the new values of all vertices, a Boolean array of the vertices
+            that stay active (the others vote to halt), and the arrays of
+            destination vertex ids and values of the messages to send,
+            or None for both if there is no message
+        """
+
+        raise NotImplementedError(
+            "PartitionProgram compute() interface not implemented.")
+
+
+class Partition:
+    """
+    Partition is a public class that holds the vertices of one worker
+    for a PartitionProgram as NumPy arrays; the i-th item of each
+    array belongs to the same vertex:
+        vids: int64 vertex ids
+        values: the vertex values of the last superstep
+        active: Boolean, whether a vertex computes in this superstep
+        has_messages: Boolean, whether a vertex received messages
+        messages: the combined message of each vertex; 0 without messages
+        degrees: int64 numbers of out edges
+    and the out edges of the vertices in CSR layout:
+        dst[offsets[i]:offsets[i + 1]] are the destination ids of vertex i
+        and weights[offsets[i]:offsets[i + 1]] their values (or None)
+    the arrays must not be changed by the program; superstep and
+    num_of_vertices (of the whole graph) are ints
+    """
+
+    def __init__(self, program, csr_partition, msg_dtype, worker):
+        """
+        :param program: a PartitionProgram object
+        :param csr_partition: a finalized _CSRPartition object
+        :param msg_dtype: NumPy dtype of message values
+        :param worker: the _Worker or _LocalEngine object of the partition
+        """
+
+        self._program = program
+        self._worker = worker
+        self._msg_dtype = msg_dtype
+
+        self.vids = csr_partition.vids
+        self.offsets = csr_partition.offsets
+        self.dst = csr_partition.dst
+        self.weights = csr_partition.weights
+        self.degrees = np.diff(self.offsets)
+
+        n = len(self.vids)
+
+        self.superstep = 0
+        self.num_of_vertices = worker.get_num_of_vertices()
+        self.values = np.zeros(n, dtype=program.value_dtype)
+        self.active = np.ones(n, dtype=bool)
+        self.has_messages = np.zeros(n, dtype=bool)
+        self.messages = np.zeros(n, dtype=msg_dtype)
+
+        # the vertex ids in ascending order to find the rows of messages
+        self._order = np.argsort(self.vids, kind="stable")
+        self._sorted_vids = self.vids[self._order]
+
+    def get_edges(self, rows):
+        """
+        find the out edges of some vertices
+        :param rows: int64 array of vertex positions in this partition
+        :return: a tuple (sources, edges) of int64 arrays: for each
+            out edge of the vertices, the position of its source vertex
+            and its position in dst and weights
+        """
+
+        degrees = self.degrees[rows]
+        starts = self.offsets[:-1][rows]
+
+        sources = np.repeat(rows, degrees)
+        edges = np.repeat(starts - np.cumsum(degrees) + degrees, degrees) + \
+            np.arange(degrees.sum())
+
+        return sources, edges
+
+    def aggregate(self, name, value):
+        """
+        contribute a value to an aggregator in this superstep
+        :param name: str, aggregator name
+        :param value: a number, e.g. the sum over the partition
+        :return: None
+        """
+
+        self._worker.aggregate(name, value)
+
+    def get_aggregated_value(self, name):
+        """
+        get the value of an aggregator in the last superstep
+        :param name: str, aggregator name
+        :return: a number
+        """
+
+        return self._worker.get_aggregated_value(name)
+
+    def get_num_of_active_vertices(self):
+        """
+        :return: int, the number of vertices active in the next superstep
+        """
+
+        return int(np.count_nonzero(self.active))
+
+    def _compute(self, superstep):
+        """
+        run the program for a superstep
+        :param superstep: int
+        :return: a tuple (msg_dst, msg_values) of NumPy arrays or Nones
+        """
+
+        self.superstep = superstep
+
+        if not self.active.any():
+            return None, None
+
+        n = len(self.vids)
+        values, active, msg_dst, msg_values = self._program.compute(self)
+
+        values = np.asarray(values, dtype=self.values.dtype)
+        active = np.asarray(active, dtype=bool)
+        if values.shape != (n,) or active.shape != (n,):
+            raise ValueError("a program should return one value and "
+                             "one active flag for each vertex.")
+
+        if (msg_dst is None) != (msg_values is None) or \
+                msg_dst is not None and len(msg_dst) != len(msg_values):
+            raise ValueError("there should be one value for each destination.")
+
+        self.values = values
+
+        # a halted vertex is only woken up by a message
+        self.active = active & self.active
+
+        return msg_dst, msg_values
+
+    def _deliver(self, dst, values):
+        """
+        replace the messages by the combined messages of the next superstep
+        and activate their vertices
+        :param dst: int64 array of distinct destination vertex ids
+        :param values: array of message values
+        :return: None
+        """
+
+        n = len(self.vids)
+        self.has_messages = np.zeros(n, dtype=bool)
+        self.messages = np.zeros(n, dtype=self._msg_dtype)
+
+        if n == 0 or len(dst) == 0:
+            return
+
+        pos = np.minimum(np.searchsorted(self._sorted_vids, dst), n - 1)
+
+        # messages to vertices that do not exist are dropped
+        found = self._sorted_vids[pos] == dst
+        rows = self._order[pos[found]]
+
+        self.has_messages[rows] = True
+        self.messages[rows] = values[found]
+        self.active |= self.has_messages
+
+    def _store_values(self, vertices):
+        """
+        set the values of the Vertex objects of the partition,
+        e.g. before writing them
+        :param vertices: Vertex objects in the order of vids
+        :return: None
+        """
+
+        for v, value in zip(vertices, self.values.tolist()):
+            v.set_value(value)
@@ -1,3 +1,6 @@
+import os
+
+
 class Reader:
     """
     Reader is a public class that user has to extend
@@ -13,6 +16,7 @@ class Reader:
 
         self.config_fp = open(config, "r")
         self.graph_fp = open(graph, "r")
+        self.graph_file = graph
 
     def read_num_of_vertices(self):
         """
@@ -56,6 +60,28 @@ class Reader:
 
         return vertex_list
 
+    def set_shard(self, index, num_of_shards):
+        """
+        restrict reading to one of num_of_shards byte ranges of equal size
+        of the graph file; a line belongs to the range of its first byte.
+        graph_fp is replaced, so read_vertex() only sees lines of this shard
+        :param index: int, 0 <= index < num_of_shards
+        :param num_of_shards: int
+        :return: None
+        """
+
+        if not 0 <= index < num_of_shards:
+            raise ValueError("shard index out of range.")
+
+        size = os.path.getsize(self.graph_file)
+
+        self.graph_fp.close()
+        self.graph_fp = _ShardFile(
+            self.graph_file,
+            size * index // num_of_shards,
+            size * (index + 1) // num_of_shards
+        )
+
     def __del__(self):
         """
         close file pointers
@@ -64,3 +90,45 @@ class Reader:
 
         self.config_fp.close()
         self.graph_fp.close()
+
+
+class _ShardFile:
+    """
+    _ShardFile is a private read-only text file over the lines
+    that start in the byte range [start, end) of a file
+    """
+
+    def __init__(self, file_name, start, end):
+        self._fp = open(file_name, "rb")
+        self._end = end
+        self._pos = start
+
+        if start > 0:
+            # skip the line that starts before this range;
+            # if the byte before start is a newline, only it is skipped
+            self._fp.seek(start - 1)
+            self._pos = start - 1 + len(self._fp.readline())
+
+    def readline(self):
+        """
+        read the next line of this range
+        :return: str; empty at the end of the range
+        """
+
+        if self._pos >= self._end:
+            return ""
+
+        line = self._fp.readline()
+        self._pos += len(line)
+
+        return line.decode()
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                break
+            yield line
+
+    def close(self):
+        self._fp.close()
@@ -0,0 +1,251 @@
+import heapq
+import numpy as np
+import os
+import pickle
+import tempfile
+
+from array import array
+
+from pypregel.partition import _extend
+
+
+# the number of messages pickled together in a run file;
+# a run is read back one chunk at a time
+_CHUNK_SIZE = 4096
+
+# the smallest number of messages per run, so that a small budget does
+# not create a file for every few messages
+_MIN_RUN_SIZE = 16384
+
+
+def _read_run(file_name):
+    """
+    read a run file chunk by chunk
+    :param file_name: str
+    :return: a generator of (dst_vid, list of messages) in ascending
+        order of dst_vid; a message is a value or a tuple (src_vid, value)
+    """
+
+    cur_vid = None
+    cur_msgs = None
+
+    with open(file_name, "rb") as f:
+        while True:
+            try:
+                dsts, srcs, values = pickle.load(f)
+            except EOFError:
+                break
+
+            if isinstance(values, np.ndarray):
+                values = values.tolist()
+
+            msgs = values if srcs is None else list(zip(srcs, values))
+
+            for dst_vid, msg in zip(dsts.tolist(), msgs):
+                if dst_vid != cur_vid:
+                    if cur_vid is not None:
+                        yield cur_vid, cur_msgs
+
+                    cur_vid = dst_vid
+                    cur_msgs = []
+
+                cur_msgs.append(msg)
+
+        # end of while
+
+    if cur_vid is not None:
+        yield cur_vid, cur_msgs
+
+
+class _MessageSpill:
+    """
+    _MessageSpill is an inner class that keeps the messages of the next
+    superstep that do not fit into the message budget of a worker.
+    They are buffered up to run_size messages, sorted by destination
+    vertex and written to a temporary file as a run of pickled chunks
+    (NumPy arrays for typed messages); in the next superstep, the runs
+    are merged while the active vertices are computed in ascending order
+    """
+
+    def __init__(self, directory, run_size, msg_dtype, anonymous, combiner):
+        """
+        :param directory: str, the directory of the run files,
+            or None for the default temporary directory
+        :param run_size: int, the number of messages per run,
+            at least _MIN_RUN_SIZE
+        :param msg_dtype: NumPy dtype of typed message values or None
+        :param anonymous: Boolean; if False, the source vertex ids
+            are kept with the values
+        :param combiner: a Combiner object or None; typed runs are
+            combined before they are written
+        """
+
+        self._dir = directory
+        self._run_size = max(run_size, _MIN_RUN_SIZE)
+        self._msg_dtype = msg_dtype
+        self._anonymous = anonymous
+        self._combiner = combiner
+
+        # the names of the run files and the unique sorted
+        # destination vertex ids of each run
+        self._file_names = []
+        self._recipients = []
+
+        self._dsts = None
+        self._srcs = None
+        self._values = None
+        self._reset_bufs()
+
+        self.num_of_messages = 0
+        self.num_of_bytes = 0
+
+    def _reset_bufs(self):
+        """
+        create the empty buffer of the next run
+        :return: None
+        """
+
+        self._dsts = array("q")
+        self._srcs = None if self._anonymous else []
+
+        if self._msg_dtype is not None:
+            self._values = array(np.dtype(self._msg_dtype).char)
+        else:
+            self._values = []
+
+    def add(self, src_vid, dst_vid, msg_value):
+        """
+        spill a message
+        :param src_vid: int or None, source vertex id
+        :param dst_vid: int, destination vertex id
+        :param msg_value: message value
+        :return: None
+        """
+
+        self._dsts.append(dst_vid)
+        self._values.append(msg_value)
+        if self._srcs is not None:
+            self._srcs.append(src_vid)
+
+        if len(self._dsts) >= self._run_size:
+            self._write_run()
+
+    def add_arrays(self, dst_vids, values):
+        """
+        spill typed messages
+        :param dst_vids: int64 NumPy array of destination vertex ids
+        :param values: NumPy array of message values
+        :return: None
+        """
+
+        _extend(self._dsts, dst_vids, np.int64)
+        _extend(self._values, values, self._msg_dtype)
+
+        if len(self._dsts) >= self._run_size:
+            self._write_run()
+
+    def _write_run(self):
+        """
+        sort the buffered messages by destination vertex id
+        and write them to a new run file
+        :return: None
+        """
+
+        dsts = np.frombuffer(self._dsts, dtype=np.int64)
+        srcs = self._srcs
+
+        if self._msg_dtype is not None:
+            values = np.frombuffer(self._values, dtype=self._msg_dtype)
+            if self._combiner:
+                dsts, values = self._combiner.combine_batch(dsts, values)
+
+            order = np.argsort(dsts, kind="stable")
+            dsts = dsts[order]
+            values = values[order]
+        else:
+            order = np.argsort(dsts, kind="stable")
+            dsts = dsts[order]
+
+            order = order.tolist()
+            values = [self._values[i] for i in order]
+            if srcs is not None:
+                srcs = [srcs[i] for i in order]
+
+        self._reset_bufs()
+
+        fd, file_name = tempfile.mkstemp(prefix="pypregel-spill-",
+                                         suffix=".run", dir=self._dir)
+        self._file_names.append(file_name)
+
+        with os.fdopen(fd, "wb") as f:
+            for lo in range(0, len(dsts), _CHUNK_SIZE):
+                hi = lo + _CHUNK_SIZE
+                pickle.dump(
+                    (dsts[lo:hi], None if srcs is None else srcs[lo:hi],
+                     values[lo:hi]),
+                    f, protocol=pickle.HIGHEST_PROTOCOL
+                )
+
+            self.num_of_bytes += f.tell()
+
+        self._recipients.append(np.unique(dsts))
+        self.num_of_messages += len(dsts)
+
+    def finish(self):
+        """
+        write the buffered messages; no message is added afterwards
+        :return: None
+        """
+
+        if len(self._dsts) > 0:
+            self._write_run()
+
+    def get_recipients(self):
+        """
+        :return: list of the destination vertex ids of all runs,
+            each once, in ascending order
+        """
+
+        if not self._recipients:
+            return []
+
+        return np.unique(np.concatenate(self._recipients)).tolist()
+
+    def stream(self):
+        """
+        merge the runs
+        :return: a generator of (dst_vid, list of messages) in ascending
+            order of dst_vid, each dst_vid once
+        """
+
+        runs = [_read_run(file_name) for file_name in self._file_names]
+
+        cur_vid = None
+        cur_msgs = None
+        for dst_vid, msgs in heapq.merge(*runs, key=lambda group: group[0]):
+            if dst_vid == cur_vid:
+                cur_msgs.extend(msgs)
+                continue
+
+            if cur_vid is not None:
+                yield cur_vid, cur_msgs
+
+            cur_vid = dst_vid
+            cur_msgs = msgs
+
+        # end of for
+
+        if cur_vid is not None:
+            yield cur_vid, cur_msgs
+
+    def close(self):
+        """
+        delete the run files
+        :return: None
+        """
+
+        for file_name in self._file_names:
+            os.remove(file_name)
+
+        self._file_names = []
+        self._recipients = []
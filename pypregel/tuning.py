@@ -0,0 +1,280 @@
+import math
+import os
+
+
+# a probe of a flush size counts as better only if it lowers
+# the send cost per byte by more than this fraction
+_TOLERANCE = 0.05
+
+# the tuning of a destination ends once the factor between two probed
+# flush sizes falls below this
+_MIN_STEP = 1.2
+
+# a superstep tells about a flush size only if at least this many
+# batches of that size were sent to the destination
+_MIN_FLUSHES = 2
+
+
+def _available_memory():
+    """
+    get the memory that can still be allocated on this host
+    :return: int, bytes, or None if it is unknown
+    """
+
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+class Tuning:
+    """
+    Tuning is a public class that holds the sizes of the message exchange
+    and of the loading. By default, a batch of pickled messages to a
+    worker is sent once it holds buffer_capacity messages. With
+    flush_bytes, it is sent once its estimated size reaches flush_bytes
+    instead; with adaptive, every worker tunes this size for each
+    destination worker during the first supersteps
+    """
+
+    def __init__(self, buffer_capacity=1000, flush_bytes=None,
+                 adaptive=False, min_flush_bytes=1 << 12,
+                 max_flush_bytes=1 << 24, memory_fraction=0.1,
+                 load_batch_size=1000, progress_interval=64):
+        """
+        :param buffer_capacity: int, the number of messages of a batch;
+            with flush_bytes, the first batch to each worker has this
+            many messages so that the size of a message can be measured
+        :param flush_bytes: int or None, the bytes of a batch
+        :param adaptive: Boolean; if True, the bytes of the batches to
+            each worker start from flush_bytes (64 KiB by default) and
+            are multiplied or divided while that lowers the measured send
+            time per byte: encoding, sending and waiting for the previous
+            batch to the same worker
+        :param min_flush_bytes: int, the smallest adaptive flush size
+        :param max_flush_bytes: int, the largest adaptive flush size
+        :param memory_fraction: float; the batches of a worker, two per
+            destination worker, take at most this fraction of the memory
+            available on the host at the end of each superstep
+        :param load_batch_size: int, the number of vertices read and
+            scattered at once by rank 0 without parallel loading
+        :param progress_interval: int; pending batches are received
+            after computing this many vertices
+        """
+
+        if buffer_capacity <= 0:
+            raise ValueError("buffer capacity should be positive.")
+
+        if flush_bytes is not None and flush_bytes <= 0:
+            raise ValueError("flush bytes should be positive.")
+
+        if not 0 < min_flush_bytes <= max_flush_bytes:
+            raise ValueError(
+                "flush bytes should have 0 < minimum <= maximum."
+            )
+
+        if not 0 < memory_fraction <= 1:
+            raise ValueError("memory fraction should be in (0, 1].")
+
+        if load_batch_size <= 0 or progress_interval <= 0:
+            raise ValueError(
+                "load batch size and progress interval should be positive."
+            )
+
+        if adaptive and flush_bytes is None:
+            flush_bytes = 1 << 16
+
+        self.buffer_capacity = buffer_capacity
+        self.flush_bytes = flush_bytes
+        self.adaptive = adaptive
+        self.min_flush_bytes = min_flush_bytes
+        self.max_flush_bytes = max_flush_bytes
+        self.memory_fraction = memory_fraction
+        self.load_batch_size = load_batch_size
+        self.progress_interval = progress_interval
+
+
+class _FlushTuner:
+    """
+    _FlushTuner is an inner class that turns the flush size in bytes of
+    each destination worker into a number of messages from the measured
+    bytes per message. With an adaptive Tuning, it searches the flush
+    size of each destination with the lowest send time per byte:
+    the size is multiplied by step while that helps, then the search
+    turns around from the best size with the square root of step
+    """
+
+    def __init__(self, tuning, num_of_workers, my_index):
+        """
+        :param tuning: a Tuning object with flush_bytes
+        :param num_of_workers: int
+        :param my_index: int, the index of this worker
+        """
+
+        self._tuning = tuning
+        self._num_of_workers = num_of_workers
+        self._my_index = my_index
+
+        # the number of messages of a batch to each worker;
+        # the worker reads this list directly
+        self.capacities = [tuning.buffer_capacity] * num_of_workers
+
+        self._flush_bytes = [float(tuning.flush_bytes)] * num_of_workers
+        self._bytes_per_message = [None] * num_of_workers
+
+        # the search of each destination: the factor and direction
+        # of the next probe, the best size and its cost so far
+        self._steps = [2.0] * num_of_workers
+        self._directions = [1] * num_of_workers
+        self._best_bytes = [None] * num_of_workers
+        self._best_costs = [None] * num_of_workers
+        self._done = [not tuning.adaptive] * num_of_workers
+        self._done[my_index] = True
+
+        # the batches, bytes and seconds to each worker in this superstep
+        self._num_of_flushes = [0] * num_of_workers
+        self._num_of_bytes = [0] * num_of_workers
+        self._seconds = [0.0] * num_of_workers
+
+    def record(self, dst_index, num_of_messages, num_of_bytes, seconds):
+        """
+        account for a batch that was sent
+        :param dst_index: int, the index of the destination worker
+        :param num_of_messages: int
+        :param num_of_bytes: int, the size of the sent data
+        :param seconds: float, the time of encoding, sending and waiting
+            for the previous batch to the same worker
+        :return: None
+        """
+
+        self._num_of_flushes[dst_index] += 1
+        self._num_of_bytes[dst_index] += num_of_bytes
+        self._seconds[dst_index] += seconds
+
+        size = num_of_bytes / max(num_of_messages, 1)
+        last_size = self._bytes_per_message[dst_index]
+        if last_size is not None:
+            size = (size + last_size) / 2
+
+        self._bytes_per_message[dst_index] = size
+        self._update_capacity(dst_index)
+
+    def _update_capacity(self, dst_index):
+        """
+        :param dst_index: int
+        :return: None
+        """
+
+        size = self._bytes_per_message[dst_index]
+        if size is not None:
+            self.capacities[dst_index] = max(
+                1, int(self._flush_bytes[dst_index] / size)
+            )
+
+    def end_superstep(self):
+        """
+        take the measurements of a superstep and choose the flush sizes
+        of the next one
+        :return: Boolean, whether a flush size changed
+        """
+
+        tuning = self._tuning
+        max_bytes = tuning.max_flush_bytes
+
+        available = _available_memory()
+        if available is not None:
+            # one batch being filled and one on its way per worker
+            max_bytes = min(max_bytes, tuning.memory_fraction * available /
+                            (2 * self._num_of_workers))
+        max_bytes = max(max_bytes, tuning.min_flush_bytes)
+
+        changed = False
+        for dst_index in range(self._num_of_workers):
+            old_bytes = self._flush_bytes[dst_index]
+
+            if not self._done[dst_index] and \
+                    self._num_of_flushes[dst_index] >= _MIN_FLUSHES:
+                self._probe(dst_index, max_bytes)
+
+            if dst_index != self._my_index:
+                self._flush_bytes[dst_index] = min(
+                    self._flush_bytes[dst_index], max_bytes
+                )
+
+            if self._flush_bytes[dst_index] != old_bytes:
+                self._update_capacity(dst_index)
+                changed = True
+
+            self._num_of_flushes[dst_index] = 0
+            self._num_of_bytes[dst_index] = 0
+            self._seconds[dst_index] = 0.0
+
+        # end of for
+
+        return changed
+
+    def _probe(self, dst_index, max_bytes):
+        """
+        compare the send time per byte of the size used in this superstep
+        with the best size, and choose the size of the next superstep
+        :param dst_index: int
+        :param max_bytes: float, the largest flush size
+        :return: None
+        """
+
+        tuning = self._tuning
+        flush_bytes = self._flush_bytes[dst_index]
+        cost = self._seconds[dst_index] / max(self._num_of_bytes[dst_index], 1)
+        best_cost = self._best_costs[dst_index]
+
+        if best_cost is None or cost < best_cost * (1 - _TOLERANCE):
+            self._best_bytes[dst_index] = flush_bytes
+            self._best_costs[dst_index] = cost
+        else:
+            # turn around from the best size with a smaller step
+            self._directions[dst_index] = -self._directions[dst_index]
+            self._steps[dst_index] = math.sqrt(self._steps[dst_index])
+
+        step = self._steps[dst_index]
+        best_bytes = self._best_bytes[dst_index]
+
+        if step < _MIN_STEP:
+            self._flush_bytes[dst_index] = best_bytes
+            self._done[dst_index] = True
+            return
+
+        next_bytes = min(max(best_bytes * step ** self._directions[dst_index],
+                             tuning.min_flush_bytes), max_bytes)
+
+        if next_bytes == best_bytes:
+            # a bound is reached; try the other direction
+            self._directions[dst_index] = -self._directions[dst_index]
+            next_bytes = min(max(best_bytes * step **
+                                 self._directions[dst_index],
+                                 tuning.min_flush_bytes), max_bytes)
+
+        self._flush_bytes[dst_index] = next_bytes
+
+    def converged(self):
+        """
+        :return: Boolean, whether no flush size is tuned any more
+        """
+
+        return all(self._done)
+
+    def get_flush_bytes(self):
+        """
+        :return: list of the flush sizes in bytes of the other workers,
+            as tuples (worker index, bytes, messages)
+        """
+
+        return [(i, int(self._flush_bytes[i]), self.capacities[i])
+                for i in range(self._num_of_workers) if i != self._my_index]
@@ -1,3 +1,6 @@
+import numpy as np
+
+
 class Vertex:
     """
     Vertex is a public class that user should extend
@@ -77,12 +80,22 @@ class Vertex:
 
     def get_out_edges(self):
         """
-        get the list of out edges
+        get the list of out edges;
+        with compact storage this is a read-only view of Edges
         :return: list of Edges
         """
 
         return self._out_edges
 
+    def set_out_edges(self, out_edges):
+        """
+        set the list of out edges
+        :param out_edges: list of Edges
+        :return: None
+        """
+
+        self._out_edges = out_edges
+
     def get_num_of_vertices(self):
         """
         get the total number of vertices
@@ -105,6 +118,32 @@ class Vertex:
 
         self._worker.halt(self._vid)
 
+    def aggregate(self, name, value):
+        """
+        contribute a value to an aggregator;
+        the aggregated value is visible in the next superstep
+        :param name: str, aggregator name
+        :param value: a number
+        :return: None
+        """
+
+        if not self.has_worker():
+            raise AttributeError("Vertex worker not set")
+
+        self._worker.aggregate(name, value)
+
+    def get_aggregated_value(self, name):
+        """
+        get the value of an aggregator in the last superstep
+        :param name: str, aggregator name
+        :return: a number
+        """
+
+        if not self.has_worker():
+            raise AttributeError("Vertex worker not set")
+
+        return self._worker.get_aggregated_value(name)
+
     def send_message_to_vertex(self, dst_vid, msg_value):
         """
         send a message to another vertex
@@ -132,13 +171,64 @@ class Vertex:
     def get_message(self):
         """
         get a message of this vertex
-        :return: a _Message object
+        :return: a value object; user-defined type
         """
 
         if not self.has_worker():
             raise AttributeError("Vertex worker not set")
 
-        return self._worker.get_cur_message(self._vid).get_value()
+        return self._worker.get_cur_message(self._vid)
+
+    def get_messages(self):
+        """
+        get all messages of this vertex at once;
+        get_message() does not return them any more
+        :return: list of values; user-defined type
+        """
+
+        if not self.has_worker():
+            raise AttributeError("Vertex worker not set")
+
+        return self._worker.get_cur_messages(self._vid)
+
+    def send_messages(self, dst_vids, msg_values):
+        """
+        send a message to each of several vertices at once
+        :param dst_vids: list or NumPy array of destination vertex ids
+        :param msg_values: list or NumPy array of the same length,
+            the value of each message
+        :return: None
+        """
+
+        if not self.has_worker():
+            raise AttributeError("Vertex worker not set")
+
+        if len(dst_vids) != len(msg_values):
+            raise ValueError("there should be one value for each destination.")
+
+        self._worker.send_cur_messages(self._vid, dst_vids, msg_values)
+
+    def get_out_edge_arrays(self):
+        """
+        get the destination vertex ids and the values of the out edges
+        as NumPy arrays; with compact storage they are read-only views
+        :return: a tuple (dst_vids, values); values is None
+            if the edges have no value, and both are empty without edges
+        """
+
+        edges = self._out_edges
+        if len(edges) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        if isinstance(edges, _EdgeView):
+            return edges.get_dst_array(), edges.get_value_array()
+
+        dst_vids = np.array([e.get_dst_vid() for e in edges], dtype=np.int64)
+
+        if edges[0].get_value() is None:
+            return dst_vids, None
+
+        return dst_vids, np.array([e.get_value() for e in edges])
 
     def send_message_to_all_neighbors(self, msg_value):
         """
@@ -147,8 +237,20 @@ class Vertex:
         :return: None
         """
 
-        for e in self._out_edges:
-            self.send_message_to_vertex(e.get_dst_vid(), msg_value)
+        if not self.has_worker():
+            raise AttributeError("Vertex worker not set")
+
+        # the mirrors of a hub on all workers send to its edges
+        if self._worker.send_cur_message_to_mirrors(self._vid, msg_value):
+            return
+
+        if isinstance(self._out_edges, _EdgeView):
+            # hand the whole edge array over without creating Edge objects
+            dst_vids = self._out_edges.get_dst_array()
+        else:
+            dst_vids = [e.get_dst_vid() for e in self._out_edges]
+
+        self._worker.send_cur_message_to_all(self._vid, dst_vids, msg_value)
 
 
 class Edge:
@@ -196,3 +298,81 @@ class Edge:
         """
 
         self._value = value
+
+
+class _EdgeView:
+    """
+    _EdgeView is a private read-only sequence of Edges backed by
+    a slice of the CSR arrays of a worker partition (or of its files)
+    """
+
+    __slots__ = ("_partition", "_lo", "_hi")
+
+    def __init__(self, partition, lo, hi):
+        self._partition = partition
+        self._lo = lo
+        self._hi = hi
+
+    def __len__(self):
+        return self._hi - self._lo
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+
+        if index < 0:
+            index += len(self)
+
+        if not 0 <= index < len(self):
+            raise IndexError("edge index out of range")
+
+        return self._partition.get_edge(self._lo + index)
+
+    def __iter__(self):
+        dst_vids = self.get_dst_vids()
+        weights = self.get_values()
+        for i in range(len(dst_vids)):
+            yield Edge(dst_vids[i], weights[i])
+
+    def get_dst_vids(self):
+        """
+        get the destination vertex ids of the viewed edges
+        :return: list of int
+        """
+
+        return self._partition.get_dst(self._lo, self._hi).tolist()
+
+    def get_values(self):
+        """
+        get the values (or weights) of the viewed edges
+        :return: list of values; None for unweighted edges
+        """
+
+        weights = self._partition.get_weights(self._lo, self._hi)
+        if weights is None:
+            return [None] * len(self)
+
+        return weights.tolist()
+
+    def get_dst_array(self):
+        """
+        get the destination vertex ids of the viewed edges
+        :return: read-only int64 NumPy array
+        """
+
+        dst = self._partition.get_dst(self._lo, self._hi)
+        dst.flags.writeable = False
+        return dst
+
+    def get_value_array(self):
+        """
+        get the values (or weights) of the viewed edges
+        :return: read-only NumPy array; None for unweighted edges
+        """
+
+        weights = self._partition.get_weights(self._lo, self._hi)
+        if weights is None:
+            return None
+
+        weights.flags.writeable = False
+        return weights
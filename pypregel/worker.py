@@ -1,12 +1,25 @@
 import numpy as np
+import sys
 import time
 
+from array import array
 from mpi4py import MPI
-from threading import Thread
-from queue import Queue
 from collections import deque
 
-from pypregel.message import _Message
+from pypregel.binary import BinaryReader
+from pypregel.checkpoint import _find_latest_checkpoint, _pack, _unpack
+from pypregel.compression import _BatchCodec
+from pypregel.disk import _DiskPartition
+from pypregel.hook import _VertexSampler, _print_hot_vertices
+from pypregel.messaging import _MessageHandler
+from pypregel.master import _print_checkpoint_reports, \
+    _print_compression, _print_edge_cut, _print_messages, _print_restart, \
+    _scatter_vertices
+from pypregel.metrics import _Metrics, _write_metrics
+from pypregel.partition import _CSRPartition
+from pypregel.program import Partition
+from pypregel.spill import _MessageSpill
+from pypregel.tuning import _FlushTuner
 
 
 # define several Marcos
@@ -14,53 +27,222 @@ _MASTER_MSG_TAG = 0
 _USER_MSG_TAG = 1
 _EOF = "$$$"
 
-# this is a parameter of this system
-_BUFFER_CAPACITY = 10
+# the number of vertices serialized at once when writing in parallel
+_WRITE_BATCH_SIZE = 10000
 
+# the number of edges whose workers are looked up at once
+# for the edge cut report
+_EDGE_CUT_CHUNK_SIZE = 1 << 20
 
-class _Worker:
+
+def _alltoallv(comm, send_buf, send_counts, recv_counts):
+    """
+    exchange a NumPy array among all processes of comm;
+    the parts of send_buf for each process are stored one after another
+    :param comm: MPI communicator
+    :param send_buf: NumPy array
+    :param send_counts: int64 array, the number of items for each process
+    :param recv_counts: int64 array, the number of items from each process
+    :return: NumPy array of the received items
+    """
+
+    send_displs = np.cumsum(send_counts) - send_counts
+    recv_displs = np.cumsum(recv_counts) - recv_counts
+
+    recv_buf = np.empty(recv_counts.sum(), dtype=send_buf.dtype)
+
+    comm.Alltoallv(
+        [send_buf, (send_counts.tolist(), send_displs.tolist())],
+        [recv_buf, (recv_counts.tolist(), recv_displs.tolist())]
+    )
+
+    return recv_buf
+
+
+class _Worker(_MessageHandler):
     """
     _Worker is an inner class used to define methods of workers of Pypregel
     """
 
-    def __init__(self, comm, writer, combiner, rtt):
+    def __init__(self, *, comm, worker_comm, reader, writer, combiner,
+                 storage, msg_dtype, aggregators, partitioner, checkpointer,
+                 restart, parallel_load, halt_condition, dedicated_master,
+                 anonymous_messages, program, metrics_file, metrics_format,
+                 hooks, hot_vertices, hot_vertex_interval, hub_threshold,
+                 message_budget, spill_dir, edge_dir, compression,
+                 compression_threshold, tuning):
+        super().__init__(combiner, msg_dtype, anonymous_messages,
+                         aggregators)
+
         self._comm = comm
+
+        # a Tuning object with the sizes of batches and of loading
+        self._tuning = tuning
+
+        # pending batches are received after computing this many vertices
+        self._progress_interval = tuning.progress_interval
+
+        # without a dedicated master, every process is a worker,
+        # rank 0 also does the work of the master and all workers
+        # decide the end of the computation from the all-reduced values
+        self._dedicated_master = dedicated_master
+        self._is_coordinator = not dedicated_master and comm.Get_rank() == 0
+        self._halt_condition = halt_condition
+
+        # the partitioner decides the worker index (from 0) of each vertex
+        self._partitioner = partitioner
+        self._get_worker = partitioner.get_worker
+
+        # with parallel loading, this worker loads a shard of the graph file
+        # itself; otherwise it receives its vertices from rank 0
+        self._reader = reader
+        self._parallel_load = parallel_load
         self._writer = writer
-        self._combiner = combiner
-        self._RTT = rtt
 
-        self._local_superstep = 0
+        # a communicator of workers only; rank i in it is worker i,
+        # which is rank i + 1 in comm if there is a dedicated master
+        self._worker_comm = worker_comm
+
+        # with a message dtype, remote messages are exchanged as
+        # NumPy arrays instead of pickled batches
+
         self._my_id = self._comm.Get_rank()
+        self._my_index = self._worker_comm.Get_rank()
+
+        # the computation starts from this superstep
+        self._first_superstep = 1
 
-        # self._vertex_map: vid -> vertex object
-        self._vertex_map = dict()
+        # with compact storage, out edges of all vertices are kept
+        # in CSR arrays and vertices only hold views of them
+        self._partition = None
+        if storage == "csr":
+            self._partition = _CSRPartition()
+
+        # with disk storage, the out edges are in files of this worker;
+        # the edges of the active vertices are read ahead of the compute
+        # loop of every superstep, which visits them in file order
+        if storage == "disk":
+            self._partition = self._disk_partition = \
+                _DiskPartition(edge_dir)
 
-        self._num_of_vertices = None
         self._num_of_workers = None
 
-        # self._active_vertices and self._halt_vertices
-        # are sets of vertex id
-        self._active_vertices = set()
-        self._halt_vertices = set()
+        # the number of messages sent to vertices of this worker
+        # and of other workers
+        self._num_of_local_messages = 0
+        self._num_of_remote_messages = 0
 
-        # get the vertex and adjacent lists of vertices
-        # belonging to this worker
-        self._read()
+        # a _Checkpointer object or None
+        self._checkpointer = checkpointer
 
-        # two thread-safe queues are used for
-        # sending and receiving threads
+        # the metrics of every superstep are measured, and gathered
+        # to rank 0 at the end if they are written to a file
+        self._metrics = _Metrics()
+        self._metrics_file = metrics_file
+        self._metrics_format = metrics_format
 
-        self._out_messages = Queue()
-        self._send_thr = None
+        # Hook objects called around every superstep
+        self._hooks = hooks
 
-        self._in_messages = Queue()
-        self._recv_thr = None
+        # with hot_vertices, compute() of every hot_vertex_interval-th
+        # active vertex is timed and the slowest ones are reported
+        self._num_of_hot_vertices = hot_vertices
+        self._vertex_sampler = None
+        if hot_vertices > 0:
+            self._vertex_sampler = _VertexSampler(hot_vertices,
+                                                  hot_vertex_interval)
 
-        # self._cur_messages: vertex_id -> deque of _Message object
-        self._cur_messages = dict()
+        # get the vertex and adjacent lists of vertices
+        # belonging to this worker
+        self._read()
 
-        # self._next_messages: vertex_id -> deque of _Message object
-        self._next_messages = dict()
+        # vertex-cut of hubs: self._hubs is the set of the vertices of
+        # this worker with at least hub_threshold out edges;
+        # self._mirrors maps every hub of any worker to the array of its
+        # out neighbors on this worker. A hub sending to all neighbors
+        # only adds its message to self._fan_out_vids and
+        # self._fan_out_values, which every worker gets at the end of
+        # the superstep; the mirrors send it to their neighbors there
+        self._hubs = set()
+        self._mirrors = dict()
+        self._has_hubs = False
+        self._fan_out_vids = []
+        self._fan_out_values = []
+        if hub_threshold is not None:
+            self._mirror_hubs(hub_threshold)
+
+        # a partition program computes all vertices at once
+        if program is not None:
+            self._program_partition = Partition(
+                program, self._partition, msg_dtype, self
+            )
+
+        self._num_of_active_vertices = self._num_of_vertices
+
+        self._report_edge_cut()
+
+        # pickled messages to other workers are double buffered:
+        # for each worker, one batch is being filled while the previous
+        # one is on the way with a non-blocking send.
+        # a batch is stored by columns, worker index -> array of dst_vid,
+        # list of src_vid (None if anonymous) and list of values;
+        # with a combiner, self._send_positions maps worker index ->
+        # dst_vid -> position of its message in the batch
+        # self._send_reqs: worker index -> request of the batch on the way
+        self._send_dsts = None
+        self._send_srcs = None
+        self._send_values = None
+        self._send_positions = None
+        self._send_reqs = [None] * self._num_of_workers
+
+        # the number of batches sent to and received from each worker
+        # in this superstep
+        self._num_of_sent_batches = None
+        self._num_of_recv_batches = None
+
+        # the number of messages of a batch to each worker; with
+        # flush bytes, a _FlushTuner object derives it from the measured
+        # bytes per message and, if adaptive, tunes the bytes
+        self._flush_tuner = None
+        self._buffer_capacities = \
+            [tuning.buffer_capacity] * self._num_of_workers
+        if tuning.flush_bytes is not None and self._msg_dtype is None:
+            self._flush_tuner = _FlushTuner(tuning, self._num_of_workers,
+                                            self._my_index)
+            self._buffer_capacities = self._flush_tuner.capacities
+
+        # with compression, a _BatchCodec object encodes every batch
+        # and large ones are compressed
+        self._batch_codec = None
+        if compression is not None:
+            self._batch_codec = _BatchCodec(compression,
+                                            compression_threshold)
+
+        if self._msg_dtype is None:
+            self._reset_send_bufs()
+
+        # with a message budget, a worker keeps at most this many
+        # messages of the next superstep in self._next_messages and
+        # spills the others to self._next_spill, a _MessageSpill object
+        # created when the budget is exceeded; in the next superstep,
+        # it is self._cur_spill and is read back in vertex id order
+        if message_budget is not None:
+            self._message_budget = message_budget
+        self._spill_dir = spill_dir
+        self._next_spill = None
+        self._cur_spill = None
+
+        # the number of messages and bytes spilled in all supersteps
+        self._num_of_spilled_messages = 0
+        self._num_of_spilled_bytes = 0
+
+        # the number of bytes of edges read from disk in all supersteps
+        self._num_of_read_bytes = 0
+
+        # the typed message buffers are split by
+        # destination worker at the end of the superstep
+        if restart:
+            self._restore()
 
     def _read(self):
         """
@@ -71,62 +253,537 @@ class _Worker:
         comm = self._comm
 
         # get the configuration information
-        self._num_of_vertices, self._num_of_workers = comm.bcast(None, root=0)
+        config = None
+        if self._is_coordinator:
+            config = (self._reader.read_num_of_vertices(),
+                      self._worker_comm.Get_size())
+
+        self._num_of_vertices, self._num_of_workers = \
+            comm.bcast(config, root=0)
+        self._partitioner.setup(self._num_of_vertices, self._num_of_workers)
+
+        if self._parallel_load:
+            self._read_shard()
+
+            if not self._partitioner.static:
+                # every worker assigned the vertices of its own shard
+                owners = self._partitioner.get_owner_array()
+                self._worker_comm.Allreduce(MPI.IN_PLACE, owners, op=MPI.MAX)
+                self._partitioner.set_owner_array(owners)
+        elif self._is_coordinator:
+            # read the graph and keep a part of it
+            _scatter_vertices(comm, self._reader, self._partitioner,
+                              self._num_of_workers,
+                              self._tuning.load_batch_size,
+                              self._add_vertices)
+        else:
+            while True:
+                # get the adjacent lists
+                vertex_list = comm.scatter(None, root=0)
+                if vertex_list == _EOF:
+                    break
+
+                self._add_vertices(vertex_list)
+
+            # rank 0 assigned all vertices while reading
+            owners = comm.bcast(None, root=0)
+            if owners is not None:
+                self._partitioner.set_owner_array(owners)
+
+        if self._partition is not None:
+            self._partition.finalize()
+
+    def _read_shard(self):
+        """
+        parse this worker's byte range of the graph file and
+        shuffle the vertices to their workers with one all-to-all
+        :return: None
+        """
+
+        reader = self._reader
+        reader.set_shard(self._my_index, self._num_of_workers)
+
+        if self._partition is not None and isinstance(reader, BinaryReader):
+            # no Edge object is created on this path
+            self._read_csr_shard()
+            return
+
+        partitioner = self._partitioner
+
+        vertices = []
+        while True:
+            v = reader.read_vertex()
+            if v is None:
+                break
+
+            vertices.append(v)
+
+        if not partitioner.static:
+            self._assign_shard(
+                (v.get_vertex_id(), [e.get_dst_vid() for e in
+                                     v.get_out_edges()])
+                for v in vertices
+            )
+
+        send_list = [[] for _ in range(self._num_of_workers)]
+        for v in vertices:
+            send_list[partitioner.get_worker(v.get_vertex_id())].append(v)
+
+        for vertex_list in self._worker_comm.alltoall(send_list):
+            self._add_vertices(vertex_list)
+
+    def _assign_shard(self, shard):
+        """
+        let a locality-aware partitioner assign the vertices of this
+        worker's shard; the workers regularly add up how many vertices
+        each of them gave to every worker, so that the capacities hold
+        for the whole graph. All workers together assign about
+        load_batch_size vertices between two sums
+        :param shard: iterator of tuples (vid, destination vertex ids)
+        :return: None
+        """
+
+        partitioner = self._partitioner
+        batch_size = max(1, self._tuning.load_batch_size //
+                         self._num_of_workers)
+
+        synced = partitioner.get_sizes().copy()
+        more = True
 
         while True:
-            # get the adjacent lists
-            vertex_list = comm.recv(source=0, tag=_MASTER_MSG_TAG)
-            if vertex_list == _EOF:
+            if more:
+                num_of_assigned = 0
+                for vid, dst_vids in shard:
+                    partitioner.assign(vid, dst_vids)
+                    num_of_assigned += 1
+                    if num_of_assigned == batch_size:
+                        break
+                else:
+                    more = False
+
+            # the last item counts the workers with vertices left
+            counts = np.append(partitioner.get_sizes() - synced, int(more))
+            self._worker_comm.Allreduce(MPI.IN_PLACE, counts, op=MPI.SUM)
+
+            synced += counts[:-1]
+            partitioner.set_sizes(synced.copy())
+
+            if counts[-1] == 0:
                 break
 
-            for v in vertex_list:
-                # set basic properties for each vertex
-                v.set_worker(self)
-                self._vertex_map[v.get_vertex_id()] = v
-                self._active_vertices.add(v.get_vertex_id())
+        # end of while
+
+    def _read_csr_shard(self):
+        """
+        map this worker's rows of a binary graph file and shuffle them
+        to their workers as CSR arrays
+        :return: None
+        """
 
-    def write(self):
+        reader = self._reader
+        worker_comm = self._worker_comm
+
+        vids, offsets, dst, weights = reader.read_csr()
+
+        partitioner = self._partitioner
+        if not partitioner.static:
+            self._assign_shard(
+                (vid, dst[offsets[i]:offsets[i + 1]])
+                for i, vid in enumerate(vids.tolist())
+            )
+
+        # the worker index (from 0) of each vertex
+        owners = partitioner.get_workers(vids)
+
+        # if every worker owns exactly the rows it mapped,
+        # e.g. with a RangePartitioner, the arrays are used without a copy
+        shuffle = worker_comm.allreduce(
+            bool(np.any(owners != self._my_index)), op=MPI.LOR
+        )
+
+        if shuffle:
+            degrees = np.diff(offsets)
+
+            send_counts = np.bincount(owners, minlength=self._num_of_workers)
+            send_edge_counts = np.bincount(
+                owners, weights=degrees, minlength=self._num_of_workers
+            ).astype(np.int64)
+
+            # sort rows by worker and gather their edges in the same order
+            order = np.argsort(owners, kind="stable")
+            degrees = degrees[order]
+            starts = offsets[:-1][order]
+            edge_index = np.repeat(starts - np.cumsum(degrees) + degrees,
+                                   degrees) + np.arange(degrees.sum())
+
+            recv_counts = np.zeros(self._num_of_workers, dtype=np.int64)
+            recv_edge_counts = np.zeros(self._num_of_workers, dtype=np.int64)
+            worker_comm.Alltoall(send_counts, recv_counts)
+            worker_comm.Alltoall(send_edge_counts, recv_edge_counts)
+
+            vids = _alltoallv(worker_comm, vids[order],
+                              send_counts, recv_counts)
+            degrees = _alltoallv(worker_comm, degrees,
+                                 send_counts, recv_counts)
+            dst = _alltoallv(worker_comm, dst[edge_index],
+                             send_edge_counts, recv_edge_counts)
+            if weights is not None:
+                weights = _alltoallv(worker_comm, weights[edge_index],
+                                     send_edge_counts, recv_edge_counts)
+
+            offsets = np.concatenate(([0], np.cumsum(degrees)))
+
+        self._partition.load_arrays(vids, offsets, dst, weights)
+
+        for i, vid in enumerate(vids.tolist()):
+            v = reader.create_vertex(vid, self._partition.get_edge_view(i))
+            v.set_worker(self)
+            self._vertex_map[vid] = v
+            self._active_vertices.append(vid)
+
+    def _mirror_hubs(self, hub_threshold):
+        """
+        find the hubs of this worker and split the out edges of each
+        of them by the worker of their destinations into mirrors;
+        the edges of a hub stay with its vertex as well
+        :param hub_threshold: int, the smallest out degree of a hub
+        :return: None
+        """
+
+        worker_comm = self._worker_comm
+        send_list = [[] for _ in range(self._num_of_workers)]
+
+        num_of_hub_edges = 0
+        for vid, v in self._vertex_map.items():
+            if len(v.get_out_edges()) < hub_threshold:
+                continue
+
+            self._hubs.add(vid)
+
+            dst_vids, _ = v.get_out_edge_arrays()
+            num_of_hub_edges += len(dst_vids)
+
+            workers = self._partitioner.get_workers(dst_vids)
+            order = np.argsort(workers, kind="stable")
+            counts = np.bincount(workers, minlength=self._num_of_workers)
+
+            parts = np.split(dst_vids[order], np.cumsum(counts)[:-1])
+            for index, part in enumerate(parts):
+                if len(part) > 0:
+                    send_list[index].append((vid, part))
+
+        # end of for
+
+        for mirrors in worker_comm.alltoall(send_list):
+            for vid, dst_vids in mirrors:
+                self._mirrors[vid] = dst_vids
+
+        num_of_hubs, num_of_hub_edges = worker_comm.allreduce(
+            np.array([len(self._hubs), num_of_hub_edges], dtype=np.int64),
+            op=MPI.SUM
+        ).tolist()
+        self._has_hubs = num_of_hubs > 0
+
+        if self._my_index == 0:
+            print("--- hubs: %d vertices with at least %d out edges, "
+                  "%d edges mirrored ---" %
+                  (num_of_hubs, hub_threshold, num_of_hub_edges))
+
+    def _exchange_fan_outs(self):
+        """
+        send the messages of the hubs of this superstep to every worker
+        with an all-gather and find the ones this worker's mirrors send
+        :return: list of tuples (hub vertex id, message value,
+            int64 array of destination vertex ids on this worker)
+        """
+
+        gathered = self._worker_comm.allgather(
+            (self._fan_out_vids, self._fan_out_values)
+        )
+        self._fan_out_vids = []
+        self._fan_out_values = []
+
+        fan_outs = []
+        for vids, values in gathered:
+            for vid, msg_value in zip(vids, values):
+                dst_vids = self._mirrors.get(vid)
+                if dst_vids is None:
+                    continue
+
+                # count the messages as if the hub had sent them
+                if self._get_worker(vid) == self._my_index:
+                    self._num_of_local_messages += len(dst_vids)
+                else:
+                    self._num_of_remote_messages += len(dst_vids)
+
+                fan_outs.append((vid, msg_value, dst_vids))
+
+        # end of for
+
+        return fan_outs
+
+    def _report_edge_cut(self):
+        """
+        reduce the number of out edges of this worker and the number of
+        them whose destination is on another worker to rank 0
+        :return: None
+        """
+
+        my_index = self._my_index
+
+        if self._partition is not None:
+            # the edges may be mapped from disk, so they are
+            # looked up chunk by chunk
+            dst = self._partition.dst
+            num_of_edges = len(dst)
+            num_of_cut_edges = 0
+            for lo in range(0, num_of_edges, _EDGE_CUT_CHUNK_SIZE):
+                num_of_cut_edges += np.count_nonzero(
+                    self._partitioner.get_workers(
+                        dst[lo:lo + _EDGE_CUT_CHUNK_SIZE]
+                    ) != my_index
+                )
+        else:
+            num_of_edges = 0
+            num_of_cut_edges = 0
+            for v in self._vertex_map.values():
+                for e in v.get_out_edges():
+                    num_of_edges += 1
+                    if self._get_worker(e.get_dst_vid()) != my_index:
+                        num_of_cut_edges += 1
+
+        reduced = None
+        if self._is_coordinator:
+            reduced = np.zeros(2, dtype=np.int64)
+
+        self._comm.Reduce(
+            np.array([num_of_cut_edges, num_of_edges], dtype=np.int64),
+            reduced,
+            op=MPI.SUM,
+            root=0
+        )
+
+        if self._is_coordinator:
+            _print_edge_cut(reduced)
+
+    def _add_vertices(self, vertex_list):
+        """
+        take over a list of vertices belonging to this worker
+        :param vertex_list: a list of Vertex objects
+        :return: None
+        """
+
+        for v in vertex_list:
+            # set basic properties for each vertex
+            v.set_worker(self)
+            self._vertex_map[v.get_vertex_id()] = v
+            self._active_vertices.append(v.get_vertex_id())
+
+            if self._partition is not None:
+                self._partition.add_vertex(v)
+
+    def _checkpoint(self):
+        """
+        capture the vertex values, the halted vertices and the messages
+        of the next superstep; the checkpointer writes them in
+        the background while the next supersteps are computed
+        :return: None
+        """
+
+        start_time = time.time()
+
+        msg_dst = []
+        msg_src = None
+        msg_values = []
+        if self._anonymous:
+            for dst_vid, msgs in self._next_messages.items():
+                msg_dst.extend([dst_vid] * len(msgs))
+                msg_values.extend(msgs)
+        else:
+            msg_src = []
+            for dst_vid, msgs in self._next_messages.items():
+                for src_vid, msg_value in msgs:
+                    msg_dst.append(dst_vid)
+                    msg_src.append(src_vid)
+                    msg_values.append(msg_value)
+
+        state = {
+            "vids": np.fromiter(self._vertex_map.keys(), dtype=np.int64,
+                                count=len(self._vertex_map)),
+            "values": _pack([v.get_value()
+                             for v in self._vertex_map.values()]),
+            "halted": np.fromiter(self._halt_vertices, dtype=np.int64,
+                                  count=len(self._halt_vertices)),
+            "msg_dst": np.array(msg_dst, dtype=np.int64),
+            "msg_src": msg_src,
+            "msg_values": _pack(msg_values),
+            "aggregated": dict(self._aggregated_values)
+        }
+
+        self._checkpointer.save(self._local_superstep, state,
+                                time.time() - start_time)
+
+    def _restore(self):
+        """
+        agree with all processes on the latest checkpoint that every worker
+        has written and load it; the computation resumes
+        from the next superstep
+        :return: None
+        """
+
+        comm = self._comm
+        checkpointer = self._checkpointer
+
+        superstep = _find_latest_checkpoint(
+            comm, checkpointer.available_checkpoints()
+        )
+
+        if superstep is not None:
+            state = checkpointer.load(superstep)
+
+            for vid, value in zip(state["vids"].tolist(),
+                                  _unpack(state["values"])):
+                self._vertex_map[vid].set_value(value)
+
+            self._halt_vertices = set(state["halted"].tolist())
+
+            msg_dst = state["msg_dst"].tolist()
+            msg_src = state["msg_src"] or [None] * len(msg_dst)
+            for dst_vid, src_vid, msg_value in zip(
+                    msg_dst, msg_src, _unpack(state["msg_values"])):
+                self._put_next_message(src_vid, dst_vid, msg_value)
+
+            self._aggregated_values = state["aggregated"]
+            self._first_superstep = superstep + 1
+
+            # the whole partition is scanned only once here
+            self._halt_vertices -= self._next_messages.keys()
+            self._active_vertices = [
+                vid for vid in self._vertex_map
+                if vid not in self._halt_vertices
+            ]
+
+        # all processes start with the number of active vertices
+        self._num_of_active_vertices = comm.allreduce(
+            len(self._active_vertices), op=MPI.SUM
+        )
+
+        if self._is_coordinator:
+            _print_restart(superstep)
+
+    def write(self, write_mode):
         """
         invoke user defined writer to serialize a vertex,
-        then send vertices to the master
+        then send vertices to the master or write them directly
+        :param write_mode: "master", "parts" or "mpiio"
         :return: None
         """
 
+        if write_mode == "parts":
+            self._write_part()
+            return
+
+        if write_mode == "mpiio":
+            self._write_mpiio()
+            return
+
         comm = self._comm
         vertex_list = []
         for v in self._vertex_map.values():
             # serialize each vertex
             vertex_list.append(self._writer.write_vertex(v))
 
+        if not self._dedicated_master:
+            # rank 0 gathers the results of all workers, including its own
+            vertex_lists = comm.gather(vertex_list, root=0)
+            if self._is_coordinator:
+                for vertex_list in vertex_lists:
+                    self._writer.write_batch_to_file(vertex_list)
+
+                self._writer.close()
+            return
+
         # send results back to master
         comm.send(
             vertex_list,
             dest=0,
             tag=_MASTER_MSG_TAG)
 
-    def has_cur_message(self, vertex_id):
+    def close(self):
         """
-        check whether this vertex has message
-        :param vertex_id: int
-        :return: Boolean
+        delete the edge files of disk storage
+        :return: None
         """
 
-        if vertex_id not in self._cur_messages:
-            return False
+        if self._disk_partition is not None:
+            self._disk_partition.close()
 
-        return len(self._cur_messages[vertex_id]) > 0
+    def _serialized_batches(self):
+        """
+        serialize the vertices of this worker batch by batch
+        :return: a generator of lists of tuples (vertex_id, str)
+        """
 
-    def get_cur_message(self, vertex_id):
+        vertex_list = []
+        for v in self._vertex_map.values():
+            vertex_list.append(self._writer.write_vertex(v))
+
+            if len(vertex_list) >= _WRITE_BATCH_SIZE:
+                yield vertex_list
+                vertex_list = []
+
+        if len(vertex_list) > 0:
+            yield vertex_list
+
+    def _write_part(self):
         """
-        get a piece of message from this vertex
-        :param vertex_id:
-        :return:
+        write the vertices of this worker to its own part file
+        :return: None
         """
 
-        if not self.has_cur_message(vertex_id):
-            raise AttributeError("no more message")
+        writer = self._writer
+        writer.open_part(self._my_index)
+
+        for vertex_list in self._serialized_batches():
+            writer.write_batch_to_file(vertex_list)
 
-        return self._cur_messages[vertex_id].popleft()
+        writer.close()
+
+    def _write_mpiio(self):
+        """
+        write the vertices of all workers into one file with MPI-IO;
+        the first pass computes the byte size of this worker's output,
+        the second pass formats the vertices again and writes them
+        at this worker's offset
+        :return: None
+        """
+
+        writer = self._writer
+        worker_comm = self._worker_comm
+
+        size = 0
+        for vertex_list in self._serialized_batches():
+            size += len(writer.format_batch(vertex_list).encode())
+
+        # the offset of this worker is the size of all lower workers
+        offset = worker_comm.exscan(size) or 0
+        total_size = worker_comm.allreduce(size)
+
+        fh = MPI.File.Open(
+            worker_comm,
+            writer.get_output_file(),
+            MPI.MODE_WRONLY | MPI.MODE_CREATE
+        )
+
+        # truncate an old output file
+        fh.Set_size(total_size)
+
+        for vertex_list in self._serialized_batches():
+            data = writer.format_batch(vertex_list).encode()
+            fh.Write_at(offset, data)
+            offset += len(data)
+
+        fh.Close()
 
     def send_cur_message(self, src_vid, dst_vid, msg_value):
         """
@@ -137,55 +794,62 @@ class _Worker:
         :return: None
         """
 
-        # create a message object
-        msg = _Message(self._local_superstep, src_vid, dst_vid, msg_value)
+        if self._msg_dtype is not None:
+            # typed messages are buffered until the end of the superstep,
+            # including the ones to this worker, so that they are
+            # combined in one batch with the received messages
+            self._typed_dst_buf.append(dst_vid)
+            self._typed_value_buf.append(msg_value)
+            return
 
-        # get the worker vertex id
-        dst_worker_id = self._vertex_to_worker_id(dst_vid)
+        # get the index of the destination worker
+        dst_index = self._get_worker(dst_vid)
 
-        if dst_worker_id == self._my_id:
+        if dst_index == self._my_index:
             # if belonging to the same worker
-            if dst_vid not in self._next_messages:
-                self._next_messages[dst_vid] = deque()
-
-            self._next_messages[dst_vid].append(msg)
+            self._num_of_local_messages += 1
+            self._put_next_message(src_vid, dst_vid, msg_value)
         else:
-            # otherwise, put this message into sending threading queue
-            self._out_messages.put(msg)
+            # otherwise, put this message into the batch of its worker
+            self._num_of_remote_messages += 1
+            self._buffer_message(dst_index, src_vid, dst_vid, msg_value)
 
-    def halt(self, vertex_id):
+    def send_cur_message_to_mirrors(self, src_vid, msg_value):
         """
-        deactivate a vertex
-        :param vertex_id: int
-        :return: None
+        send the same message from a hub to all its out neighbors
+        through the mirrors of the hub
+        :param src_vid: int, source vertex id
+        :param msg_value: message value
+        :return: Boolean, False if src_vid is not a hub
+            and the message was not sent
         """
 
-        self._halt_vertices.add(vertex_id)
-
-    def get_superstep(self):
-        """
-        return the current local superstep
-        :return: int
-        """
+        if src_vid not in self._hubs:
+            return False
 
-        return self._local_superstep
+        self._fan_out_vids.append(src_vid)
+        self._fan_out_values.append(msg_value)
+        return True
 
-    def get_num_of_vertices(self):
+    def _order_active_vertices(self, active):
         """
-        return the total number of vertices
-        :return: int
+        put the vertices to compute in the next superstep in the order
+        in which they are computed
+        :param active: list of vertex ids
+        :return: list of vertex ids
         """
 
-        return self._num_of_vertices
+        if self._next_spill is None:
+            return super()._order_active_vertices(active)
 
-    def _vertex_to_worker_id(self, vertex_id):
-        """
-        map a vertex_id to worker_id
-        :param vertex_id: int
-        :return: int
-        """
+        # the vertices with spilled messages are computed in
+        # ascending id order, in which the runs are merged
+        vertex_map = self._vertex_map
+        spilled = [vid for vid in self._next_spill.get_recipients()
+                   if vid in vertex_map]
+        self._halt_vertices.difference_update(spilled)
 
-        return vertex_id % self._num_of_workers + 1
+        return sorted(set(active).union(spilled))
 
     def debug(self):
         print(self._num_of_vertices, self._num_of_workers)
@@ -194,229 +858,786 @@ class _Worker:
 
     def run(self):
         """
-        start a loop until receiving -1 from master:
+        start a loop until receiving -1 from master, or without a
+        dedicated master, until no vertex is active or the halt condition
+        holds:
             1. master broadcasts superstep and worker synchronizes it
-            2. create sending and receiving threads
-            3. worker loops through current active vertices to compute
+            2. worker loops through current active vertices to compute,
+                sending full batches of messages and receiving
+                arrived ones on the way
+            3. worker sends the remaining batches and receives
+                until every batch of this superstep has arrived
             4. worker splits received next-step messages to each vertex
             5. worker count the number of vertices that will be
-                active in the next step; reduce the number to the master.
+                active in the next step; all-reduce the number
+                together with the aggregators.
         """
 
         # self.debug()
 
         comm = self._comm
+        metrics = self._metrics
+        superstep = self._first_superstep
+        start_time = time.time()
 
         while True:
-            # local superstep synchronization
-            self._local_superstep = comm.bcast(None, root=0)
-
-            # if the computation is over, break
-            if self._local_superstep == -1:
+            if self._dedicated_master:
+                # local superstep synchronization
+                superstep = comm.bcast(None, root=0)
+
+                # if the computation is over, break
+                if superstep == -1:
+                    break
+            elif self._num_of_active_vertices == 0:
                 break
 
-            # set the map of cur messages
-            self._cur_messages = self._next_messages
+            self._local_superstep = superstep
+
+            for hook in self._hooks:
+                hook.superstep_start(self._my_id, superstep)
+
+            if self._program_partition is not None:
+                metrics.start(
+                    superstep,
+                    self._program_partition.get_num_of_active_vertices()
+                )
+            else:
+                metrics.start(superstep, len(self._active_vertices))
+
+            # the next messages become the current ones
+            self._swap_messages()
 
-            # reset the map of next messages
-            self._next_messages = dict()
+            self._cur_spill = self._next_spill
+            self._next_spill = None
 
-            # create and start sending and receiving threads
-            self._send_thr = Thread(target=self._send_worker)
-            self._recv_thr = Thread(target=self._recv_worker)
+            # loop through current active vertices to compute;
+            # the time of sending and receiving on the way is not
+            # compute time
+            compute_start_time = time.time()
 
-            self._send_thr.start()
-            self._recv_thr.start()
+            if self._program_partition is not None:
+                self._compute_partition(superstep)
+            else:
+                if self._disk_partition is not None:
+                    self._disk_partition.start_stream(self._active_vertices)
+
+                if self._cur_spill is not None:
+                    self._compute_spilled(superstep)
+                elif self._vertex_sampler is not None:
+                    self._compute_sampled(superstep)
+                elif self._msg_dtype is None:
+                    for i, v in enumerate(self._active_vertices):
+                        self._vertex_map[v].compute()
+
+                        # take the batches that have arrived meanwhile
+                        if i % self._progress_interval == 0:
+                            self._receive_batches()
+                else:
+                    for v in self._active_vertices:
+                        self._vertex_map[v].compute()
+
+                if self._disk_partition is not None:
+                    metrics.read_bytes = self._disk_partition.stop_stream()
+                    self._num_of_read_bytes += metrics.read_bytes
+
+                metrics.compute_sec += time.time() - compute_start_time - \
+                    metrics.send_sec - metrics.receive_sec
+
+            if self._program_partition is not None:
+                # the messages of the program were exchanged already
+                self._aggregating_values[0] = \
+                    self._program_partition.get_num_of_active_vertices()
+            else:
+                if self._msg_dtype is not None:
+                    # typed messages are exchanged collectively;
+                    # no message can be on the way afterwards
+                    self._exchange_typed_messages()
+                else:
+                    self._finish_pickled_messages()
+
+                    if self._flush_tuner is not None and \
+                            self._flush_tuner.end_superstep():
+                        self._print_flush_bytes("after superstep %d" %
+                                                superstep)
+
+                if self._next_spill is not None:
+                    spill_start_time = time.time()
+                    self._finish_spill()
+                    metrics.receive_sec += time.time() - spill_start_time
+
+                update_start_time = time.time()
+                self._update_active_vertices()
+                metrics.compute_sec += time.time() - update_start_time
+
+                # an all-reduce communication is performed
+                # master and workers will get the number of active vertices
+                # and the aggregated values of this superstep
+                self._aggregating_values[0] = len(self._active_vertices)
+
+            sync_start_time = time.time()
+            self._num_of_active_vertices, self._aggregated_values = \
+                self._aggregators.allreduce(comm, self._aggregating_values)
+            metrics.sync_sec = time.time() - sync_start_time
+
+            self._aggregating_values = self._aggregators.initial_values()
+
+            if self._checkpointer is not None and \
+                    self._checkpointer.due(self._local_superstep):
+                checkpoint_start_time = time.time()
+                self._checkpoint()
+                metrics.checkpoint_sec = time.time() - checkpoint_start_time
+
+            seconds = metrics.finish(self._num_of_local_messages,
+                                     self._num_of_remote_messages)
+            print("worker %d finishes %d in %f sec" %
+                  (self._my_id, self._local_superstep, seconds))
+
+            for hook in self._hooks:
+                hook.superstep_end(self._my_id, superstep, seconds)
+
+            if not self._dedicated_master:
+                # every process has the same aggregated values,
+                # so all of them make the same decision
+                if self._halt_condition is not None and \
+                        self._halt_condition(superstep,
+                                             self._aggregated_values):
+                    break
+
+                superstep += 1
+
+        # end of while
+
+        seconds = time.time() - start_time
+
+        if self._next_spill is not None:
+            # the messages of a superstep that is not computed
+            self._next_spill.close()
+            self._next_spill = None
+
+        if self._program_partition is not None:
+            self._program_partition._store_values(self._vertex_map.values())
+
+        # report the number of local and cross-worker messages
+        reduced = None
+        if self._is_coordinator:
+            reduced = np.zeros(2, dtype=np.int64)
+
+        comm.Reduce(
+            np.array([self._num_of_local_messages,
+                      self._num_of_remote_messages], dtype=np.int64),
+            reduced,
+            op=MPI.SUM,
+            root=0
+        )
+
+        if self._is_coordinator:
+            _print_messages(reduced, seconds)
+
+        if self._message_budget != sys.maxsize:
+            # the workers sum up the spilled messages among themselves
+            reduced = None
+            if self._my_index == 0:
+                reduced = np.zeros(2, dtype=np.int64)
+
+            self._worker_comm.Reduce(
+                np.array([self._num_of_spilled_messages,
+                          self._num_of_spilled_bytes], dtype=np.int64),
+                reduced,
+                op=MPI.SUM,
+                root=0
+            )
+
+            if self._my_index == 0:
+                print("--- spilled %d messages, %d bytes ---" %
+                      tuple(reduced.tolist()))
+
+        if self._flush_tuner is not None and self._tuning.adaptive:
+            self._print_flush_bytes("at the end")
+
+        if self._batch_codec is not None:
+            # the workers sum up the compression counters of
+            # all supersteps among themselves
+            reduced = None
+            if self._my_index == 0:
+                reduced = np.zeros(5, dtype=np.float64)
+
+            self._worker_comm.Reduce(
+                self._metrics.get_totals((
+                    "compressed_batches", "uncompressed_bytes",
+                    "compressed_bytes", "compress_sec", "decompress_sec"
+                )),
+                reduced,
+                op=MPI.SUM,
+                root=0
+            )
+
+            if self._my_index == 0:
+                _print_compression(reduced)
+
+        if self._disk_partition is not None:
+            # the workers sum up the edges read among themselves
+            reduced = None
+            if self._my_index == 0:
+                reduced = np.zeros(2, dtype=np.int64)
+
+            self._worker_comm.Reduce(
+                np.array([self._num_of_read_bytes,
+                          self._disk_partition.nbytes()], dtype=np.int64),
+                reduced,
+                op=MPI.SUM,
+                root=0
+            )
+
+            if self._my_index == 0:
+                print("--- read %d bytes of edges from disk; "
+                      "%d bytes of edge offsets in memory ---" %
+                      tuple(reduced.tolist()))
+
+        if self._checkpointer is not None:
+            self._checkpointer.wait()
+            gathered = comm.gather(self._checkpointer.get_reports(), root=0)
+
+            if self._is_coordinator:
+                _print_checkpoint_reports(gathered)
+
+        if self._metrics_file is not None:
+            gathered = comm.gather(self._metrics.get_rows(), root=0)
+
+            if self._is_coordinator:
+                _write_metrics(self._metrics_file, self._metrics_format,
+                               gathered)
+
+        if self._vertex_sampler is not None:
+            gathered = comm.gather(self._vertex_sampler.get_hot_vertices(),
+                                   root=0)
+
+            if self._is_coordinator:
+                _print_hot_vertices(gathered, self._num_of_hot_vertices)
+
+    def _compute_sampled(self, superstep):
+        """
+        compute the active vertices and time some of them
+        :param superstep: int
+        :return: None
+        """
 
-            # loop through current active vertices to compute
-            for v in self._active_vertices:
-                assert v in self._vertex_map
+        sampler = self._vertex_sampler
+        interval = sampler.interval
+        offset = sampler.get_offset(superstep)
+        pickled = self._msg_dtype is None
+
+        for i, v in enumerate(self._active_vertices):
+            if i % interval == offset:
+                sampler.compute(self._vertex_map[v], superstep)
+            else:
                 self._vertex_map[v].compute()
 
-            # we need to put an EOF to out_messages
-            # to terminate the sending thread
-            self._out_messages.put(_EOF)
+            # take the batches that have arrived meanwhile
+            if pickled and i % self._progress_interval == 0:
+                self._receive_batches()
 
-            self._send_thr.join()
+        # end of for
 
-            # all workers finish sending now
-            comm.Barrier()
+    def _compute_spilled(self, superstep):
+        """
+        compute the active vertices in ascending id order while the
+        spilled messages of this superstep are merged from their runs;
+        the messages of a vertex are dropped after its compute()
+        :param superstep: int
+        :return: None
+        """
 
-            # there might be some messages on the way to be received
-            # by the receiving thread.
+        cur_messages = self._cur_messages
+        sampler = self._vertex_sampler
+        offset = sampler.get_offset(superstep) if sampler else None
+        pickled = self._msg_dtype is None
 
-            # for most cases, a RTT waiting time is enough
+        groups = self._cur_spill.stream()
+        group = next(groups, None)
 
-            # user may reset this RTT time
-            # the default RTT time is 0.001
-            time.sleep(self._RTT)
+        for i, v in enumerate(self._active_vertices):
+            # skip the messages to vertices that do not exist
+            while group is not None and group[0] < v:
+                group = next(groups, None)
 
-            # send the worker itself an EOF
-            # to terminate the receiving thread
-            comm.send(_EOF, dest=self._my_id, tag=_USER_MSG_TAG)
+            if group is not None and group[0] == v:
+                msgs = cur_messages.get(v)
+                if msgs is None:
+                    msgs = cur_messages[v] = deque()
 
-            self._recv_thr.join()
+                msgs.extend(group[1])
+                if self._combiner and len(msgs) > 1:
+                    cur_messages[v] = self._combine_messages(msgs)
 
-            # iterate the received messages
-            while not self._in_messages.empty():
-                msg = self._in_messages.get()
+                group = next(groups, None)
 
-                # split a message into the map of next messages
-                dst_vid = msg.get_dst_vid()
-                if dst_vid not in self._next_messages:
-                    self._next_messages[dst_vid] = deque()
+            if sampler is not None and i % sampler.interval == offset:
+                sampler.compute(self._vertex_map[v], superstep)
+            else:
+                self._vertex_map[v].compute()
 
-                self._next_messages[dst_vid].append(msg)
-            # end of while
+            cur_messages.pop(v, None)
 
-            # the vertices that received messages should be active in the next step
-            self._halt_vertices -= self._next_messages.keys()
+            # take the batches that have arrived meanwhile
+            if pickled and i % self._progress_interval == 0:
+                self._receive_batches()
 
-            # compute the active vertices set
-            self._active_vertices = self._vertex_map.keys() - self._halt_vertices
+        # end of for
 
-            # an all-reduce communication is performed
-            # master will get the number of active vertices
-            size_of_active_vertices = np.zeros(1)
-            size_of_active_vertices[0] = len(self._active_vertices)
+        groups.close()
+        self._cur_spill.close()
+        self._cur_spill = None
 
-            comm.Reduce(size_of_active_vertices,
-                        np.zeros(1),
-                        op=MPI.SUM,
-                        root=0)
+    def _combine_messages(self, msgs):
+        """
+        combine the messages of a vertex into one
+        :param msgs: deque of messages
+        :return: deque of the combined message
+        """
 
-            print(
-                "worker %d finishes %d" %
-                (self._my_id, self._local_superstep))
+        combine = self._combiner.combine
+        combined = msgs.popleft()
 
-        # end of while
+        for msg in msgs:
+            if self._anonymous:
+                _, combined = combine((None, combined), (None, msg))
+            else:
+                combined = tuple(combine(combined, msg))
 
-    def _send_worker(self):
+        return deque([combined])
+
+    def _spill(self):
         """
-        the target function of the sending thread
+        :return: the _MessageSpill object of the next superstep,
+            created on the first message over the budget
         """
 
-        comm = self._comm
+        if self._next_spill is None:
+            # a run is sorted in memory; it holds as many messages
+            # as the budget, but at least _MIN_RUN_SIZE of spill.py
+            self._next_spill = _MessageSpill(
+                self._spill_dir, self._message_budget,
+                self._msg_dtype, self._anonymous, self._combiner
+            )
 
-        # msg_buf: dst_worker_id -> dst_vid -> messages
-        msg_buf = dict()
+        return self._next_spill
 
-        # msg_buf_size: dst_worker_id -> size
-        msg_buf_size = dict()
+    def _finish_spill(self):
+        """
+        write the last run of the spilled messages of this superstep
+        :return: None
+        """
 
-        while True:
-            msg = self._out_messages.get()
-            if msg == _EOF:
-                # if getting an EOF, send all messages from buffer
-                for dst_worker_id in msg_buf:
-                    # send each worker only one list
-                    msg_list = []
-                    for msgs in msg_buf[dst_worker_id].values():
-                        msg_list.extend(msgs)
-
-                    comm.send(
-                        msg_list,
-                        dest=dst_worker_id,
-                        tag=_USER_MSG_TAG
-                    )
+        spill = self._next_spill
+        spill.finish()
 
-                # end of for
-                break
-            else:
-                # get the destination vertex id
-                dst_vid = msg.get_dst_vid()
-
-                # get the destination worker id
-                dst_worker_id = self._vertex_to_worker_id(dst_vid)
-
-                # create data structures if needed
-                if dst_worker_id not in msg_buf:
-                    msg_buf[dst_worker_id] = dict()
-                    msg_buf_size[dst_worker_id] = 0
-
-                if dst_vid not in msg_buf[dst_worker_id]:
-                    msg_buf[dst_worker_id][dst_vid] = []
-
-                # append the new message
-                msg_buf[dst_worker_id][dst_vid].append(msg)
-
-                # increase the corresponding buf size
-                msg_buf_size[dst_worker_id] += 1
-
-                if self._combiner:
-                    # if there is a combiner, then combine two messages
-                    while len(msg_buf[dst_worker_id][dst_vid]) >= 2:
-                        # get the last two messages
-                        msg_x = msg_buf[dst_worker_id][dst_vid].pop()
-                        msg_y = msg_buf[dst_worker_id][dst_vid].pop()
-
-                        # invoke the user-defined combiner
-                        msg_src, msg_value = self._combiner.combine(
-                            (msg_x.get_src_vid(), msg_x.get_value()),
-                            (msg_y.get_src_vid(), msg_y.get_value())
-                        )
-
-                        # append the combined message back
-                        msg_buf[dst_worker_id][dst_vid].append(
-                            _Message(
-                                self._local_superstep,
-                                msg_src,
-                                dst_vid,
-                                msg_value
-                            )
-                        )
-
-                        # decrease the buf size by one
-                        msg_buf_size[dst_worker_id] -= 1
-
-                    # end of while
-
-                # end of if
-
-                if msg_buf_size[dst_worker_id] >= _BUFFER_CAPACITY:
-                    # if the buffer is full, then send the messages of the destination worker
-                    msg_list = []
-                    for msgs in msg_buf[dst_worker_id].values():
-                        msg_list.extend(msgs)
-
-                    comm.send(
-                        msg_list,
-                        dest=dst_worker_id,
-                        tag=_USER_MSG_TAG
+        self._metrics.spilled_messages = spill.num_of_messages
+        self._metrics.spilled_bytes = spill.num_of_bytes
+        self._num_of_spilled_messages += spill.num_of_messages
+        self._num_of_spilled_bytes += spill.num_of_bytes
+
+    def _compute_partition(self, superstep):
+        """
+        run the partition program for a superstep and
+        exchange its messages
+        :param superstep: int
+        :return: None
+        """
+
+        compute_start_time = time.time()
+        msg_dst, msg_values = self._program_partition._compute(superstep)
+        self._metrics.compute_sec += time.time() - compute_start_time
+
+        if msg_dst is None:
+            msg_dst = np.empty(0, dtype=np.int64)
+            msg_values = np.empty(0, dtype=self._msg_dtype)
+
+        self._exchange_typed_messages(
+            np.asarray(msg_dst, dtype=np.int64),
+            np.asarray(msg_values, dtype=self._msg_dtype)
+        )
+
+    def _reset_send_bufs(self):
+        """
+        create empty batches and batch counters for each worker
+        :return: None
+        """
+
+        n = self._num_of_workers
+
+        self._send_dsts = [array("q") for _ in range(n)]
+        self._send_values = [[] for _ in range(n)]
+        self._send_srcs = [None] * n
+        if not self._anonymous:
+            self._send_srcs = [[] for _ in range(n)]
+
+        self._send_positions = None
+        if self._combiner:
+            self._send_positions = [dict() for _ in range(n)]
+
+        self._num_of_sent_batches = [0] * n
+        self._num_of_recv_batches = [0] * n
+
+    def _buffer_message(self, dst_index, src_vid, dst_vid, msg_value):
+        """
+        add a message to the batch of a worker, combine it with
+        the buffered message to the same vertex if there is a combiner,
+        and send the batch once it is full
+        :param dst_index: int, index of the destination worker
+        :param src_vid: int, source vertex id
+        :param dst_vid: int, destination vertex id
+        :param msg_value: message value
+        :return: None
+        """
+
+        values = self._send_values[dst_index]
+        srcs = self._send_srcs[dst_index]
+
+        if self._combiner:
+            positions = self._send_positions[dst_index]
+            pos = positions.get(dst_vid)
+            if pos is not None:
+                # if there is a combiner, then combine two messages
+                if srcs is None:
+                    _, values[pos] = self._combiner.combine(
+                        (None, values[pos]), (None, msg_value)
                     )
+                else:
+                    srcs[pos], values[pos] = self._combiner.combine(
+                        (srcs[pos], values[pos]), (src_vid, msg_value)
+                    )
+                return
 
-                    # reset the msg buf and msg buf size
-                    msg_buf[dst_worker_id] = dict()
-                    msg_buf_size[dst_worker_id] = 0
+            positions[dst_vid] = len(values)
 
-                # end of if
+        self._send_dsts[dst_index].append(dst_vid)
+        values.append(msg_value)
+        if srcs is not None:
+            srcs.append(src_vid)
 
-            # end of if-else
+        if len(values) >= self._buffer_capacities[dst_index]:
+            self._send_batch(dst_index)
 
-        # end of while
+    def _send_batch(self, dst_index):
+        """
+        start a non-blocking send of the batch of a worker;
+        the previous batch to the worker has to be on its way first,
+        so arrived batches are received while waiting for it.
+        a batch is a tuple (superstep, array of dst_vid,
+        list of src_vid or None, list of values)
+        :param dst_index: int, index of the destination worker
+        :return: None
+        """
+
+        metrics = self._metrics
+        start_time = time.time()
+        receive_sec = metrics.receive_sec
+
+        req = self._send_reqs[dst_index]
+        if req is not None:
+            while not req.Test():
+                self._receive_batches()
+
+        # pickled here rather than by isend() to count the bytes;
+        # the request keeps the data until it is sent
+        if self._batch_codec is None:
+            data = MPI.pickle.dumps(
+                (self._local_superstep,
+                 self._send_dsts[dst_index],
+                 self._send_srcs[dst_index],
+                 self._send_values[dst_index])
+            )
+        else:
+            data = self._encode_batch(dst_index)
+
+        self._send_reqs[dst_index] = self._worker_comm.Isend(
+            [data, MPI.BYTE],
+            dest=dst_index,
+            tag=_USER_MSG_TAG
+        )
+
+        self._num_of_sent_batches[dst_index] += 1
+        metrics.sent_bytes += len(data)
+
+        seconds = time.time() - start_time - \
+            (metrics.receive_sec - receive_sec)
+        metrics.send_sec += seconds
+
+        if self._flush_tuner is not None:
+            self._flush_tuner.record(dst_index,
+                                     len(self._send_values[dst_index]),
+                                     len(data), seconds)
+
+        # start a new batch
+        self._send_dsts[dst_index] = array("q")
+        self._send_values[dst_index] = []
+        if self._send_srcs[dst_index] is not None:
+            self._send_srcs[dst_index] = []
+        if self._combiner:
+            self._send_positions[dst_index] = dict()
+
+    def _print_flush_bytes(self, when):
+        """
+        log the flush sizes of the batches to the other workers
+        :param when: str, the point of the computation
+        :return: None
+        """
 
-    # end of _send_worker
+        # worker i is rank i + 1 if there is a dedicated master
+        first_rank = self._comm.Get_size() - self._num_of_workers
 
-    def _recv_worker(self):
+        tuner = self._flush_tuner
+        print("--- worker %d flush sizes %s%s: %s ---" % (
+            self._my_id, when,
+            " (converged)" if tuner.converged() else "",
+            ", ".join("worker %d: %d bytes (%d messages)" %
+                      (index + first_rank, num_of_bytes, num_of_messages)
+                      for index, num_of_bytes, num_of_messages
+                      in tuner.get_flush_bytes())
+        ))
+
+    def _encode_batch(self, dst_index):
         """
-        the target function of the receiving thread
+        encode the batch of a worker with the batch codec
+        :param dst_index: int, index of the destination worker
+        :return: bytes
         """
 
-        comm = self._comm
+        metrics = self._metrics
+        start_time = time.time()
+
+        data, num_of_bytes = self._batch_codec.encode(
+            self._local_superstep,
+            self._send_dsts[dst_index],
+            self._send_srcs[dst_index],
+            self._send_values[dst_index]
+        )
+
+        metrics.compress_sec += time.time() - start_time
+        if num_of_bytes is not None:
+            metrics.compressed_batches += 1
+            metrics.uncompressed_bytes += num_of_bytes
+            metrics.compressed_bytes += len(data)
+
+        return data
+
+    def _receive_batches(self):
+        """
+        receive every batch that has already arrived, without waiting
+        :return: None
+        """
+
+        comm = self._worker_comm
+        status = MPI.Status()
+        start_time = time.time()
 
         while True:
-            # wait for messages from any source
-            msg_list = comm.recv(source=MPI.ANY_SOURCE, tag=_USER_MSG_TAG)
-
-            if msg_list != _EOF:
-                # if receiving a message list
-                for msg in msg_list:
-                    # append each message belonging to this superstep
-                    # to the message buf queue
-                    if msg.get_msg_superstep() != self._local_superstep:
-                        continue
-
-                    self._in_messages.put(msg)
-            else:
-                # if receiving EOF, the break
+            msg = comm.improbe(
+                source=MPI.ANY_SOURCE,
+                tag=_USER_MSG_TAG,
+                status=status
+            )
+            if msg is None:
                 break
+
+            self._take_batch(status.Get_source(),
+                             self._recv_batch(msg, status))
+
+        self._metrics.receive_sec += time.time() - start_time
+
+    def _recv_batch(self, msg, status):
+        """
+        receive a probed batch
+        :param msg: MPI.Message of the batch
+        :param status: MPI.Status of the probe
+        :return: a tuple (superstep, array of dst_vid,
+            list of src_vid or None, list of values)
+        """
+
+        data = bytearray(status.Get_count(MPI.BYTE))
+        msg.Recv([data, MPI.BYTE])
+
+        self._metrics.received_bytes += len(data)
+
+        if self._batch_codec is None:
+            return MPI.pickle.loads(data)
+
+        start_time = time.time()
+        batch = self._batch_codec.decode(data)
+        self._metrics.decompress_sec += time.time() - start_time
+        return batch
+
+    def _take_batch(self, src_index, batch):
+        """
+        split a received batch into the map of next messages
+        :param src_index: int, index of the source worker
+        :param batch: a tuple (superstep, array of dst_vid,
+            list of src_vid or None, list of values)
+        :return: None
+        """
+
+        superstep, dsts, srcs, values = batch
+        if superstep != self._local_superstep:
+            raise RuntimeError(
+                "worker %d received a batch of superstep %d from worker %d "
+                "in superstep %d" %
+                (self._worker_comm.Get_rank(), superstep, src_index,
+                 self._local_superstep)
+            )
+
+        self._num_of_recv_batches[src_index] += 1
+        self._metrics.received_messages += len(dsts)
+
+        if srcs is None:
+            srcs = [None] * len(dsts)
+
+        for src_vid, dst_vid, msg_value in zip(srcs, dsts, values):
+            self._put_next_message(src_vid, dst_vid, msg_value)
+
+    def _finish_pickled_messages(self):
+        """
+        send the remaining batches, learn how many batches every other
+        worker has sent to this one with a non-blocking all-to-all, and
+        receive until all of them have arrived
+        :return: None
+        """
+
+        worker_comm = self._worker_comm
+        metrics = self._metrics
+
+        for dst_index in range(self._num_of_workers):
+            if len(self._send_dsts[dst_index]) > 0:
+                self._send_batch(dst_index)
+
+        # other workers may still wait for their previous batch to this
+        # one to be received before they send their last batches, so
+        # batches are received until the counts have been exchanged
+        start_time = time.time()
+        receive_sec = metrics.receive_sec
+
+        expected = np.zeros(self._num_of_workers, dtype=np.int64)
+        req = worker_comm.Ialltoall(
+            np.array(self._num_of_sent_batches, dtype=np.int64), expected
+        )
+        while not req.Test():
+            self._receive_batches()
+
+        expected = expected.tolist()
+        metrics.send_sec += time.time() - start_time - \
+            (metrics.receive_sec - receive_sec)
+
+        start_time = time.time()
+        status = MPI.Status()
+        for src_index in range(self._num_of_workers):
+            while self._num_of_recv_batches[src_index] < expected[src_index]:
+                # every batch still missing is known to be on its way
+                msg = worker_comm.mprobe(
+                    source=MPI.ANY_SOURCE,
+                    tag=_USER_MSG_TAG,
+                    status=status
+                )
+                self._take_batch(status.Get_source(),
+                                 self._recv_batch(msg, status))
+
+        # end of for
+
+        if self._has_hubs:
+            for vid, msg_value, dst_vids in self._exchange_fan_outs():
+                for dst_vid in dst_vids.tolist():
+                    self._put_next_message(vid, dst_vid, msg_value)
+
+        metrics.receive_sec += time.time() - start_time
+
+        start_time = time.time()
+        MPI.Request.Waitall(
+            [req for req in self._send_reqs if req is not None]
+        )
+        self._send_reqs = [None] * self._num_of_workers
+        metrics.send_sec += time.time() - start_time
+
+        self._reset_send_bufs()
+
+    def _exchange_typed_messages(self, dst=None, values=None):
+        """
+        exchange the buffered typed messages among workers
+        (including this one):
+        an Alltoall of message counts, then an Alltoallv of destination
+        vertex ids and an Alltoallv of message values
+        :param dst: int64 array of destination vertex ids to send
+            instead of the buffered messages, or None
+        :param values: array of message values to send, or None
+        :return: None
+        """
+
+        worker_comm = self._worker_comm
+        partitioner = self._partitioner
+        metrics = self._metrics
+        start_time = time.time()
+
+        if dst is None:
+            dst = np.frombuffer(self._typed_dst_buf, dtype=np.int64)
+            values = np.frombuffer(self._typed_value_buf,
+                                   dtype=self._msg_dtype)
+            self._reset_typed_bufs()
+
+        # the index of the destination worker of each message
+        workers = partitioner.get_workers(dst)
+
+        num_of_local_messages = np.count_nonzero(workers == self._my_index)
+        self._num_of_local_messages += num_of_local_messages
+        self._num_of_remote_messages += len(dst) - num_of_local_messages
+
+        if self._combiner:
+            # combine before sending; the messages from
+            # different workers are combined again after receiving
+            dst, values = self._combiner.combine_batch(dst, values)
+            workers = partitioner.get_workers(dst)
+
+        # sort the messages by destination worker
+        order = np.argsort(workers, kind="stable")
+        send_counts = np.bincount(
+            workers, minlength=self._num_of_workers
+        ).astype(np.int64)
+
+        recv_counts = np.zeros(self._num_of_workers, dtype=np.int64)
+        worker_comm.Alltoall(send_counts, recv_counts)
+
+        recv_dst = _alltoallv(worker_comm, dst[order],
+                              send_counts, recv_counts)
+        recv_values = _alltoallv(worker_comm, values[order],
+                                 send_counts, recv_counts)
+
+        # the messages to this worker do not go over the network
+        message_size = dst.itemsize + values.itemsize
+        metrics.sent_bytes += message_size * \
+            int(send_counts.sum() - send_counts[self._my_index])
+        num_of_received_messages = \
+            int(recv_counts.sum() - recv_counts[self._my_index])
+        metrics.received_messages += num_of_received_messages
+        metrics.received_bytes += message_size * num_of_received_messages
+
+        metrics.send_sec += time.time() - start_time
+        start_time = time.time()
+
+        if self._has_hubs:
+            fan_outs = self._exchange_fan_outs()
+            if fan_outs:
+                _, fan_out_values, fan_out_dst = zip(*fan_outs)
+                recv_dst = np.concatenate((recv_dst,) + fan_out_dst)
+                recv_values = np.concatenate((
+                    recv_values,
+                    np.repeat(
+                        np.array(fan_out_values, dtype=recv_values.dtype),
+                        [len(dst_vids) for dst_vids in fan_out_dst]
+                    )
+                ))
+
+        if self._combiner:
+            # combine the messages from different workers
+            recv_dst, recv_values = self._combiner.combine_batch(
+                recv_dst, recv_values
+            )
+
+        self._put_next_arrays(recv_dst, recv_values)
+
+        metrics.receive_sec += time.time() - start_time
@@ -7,7 +7,18 @@ class Writer:
         # the file pointer is private
         # user only needs to define how to translate a vertex
 
-        self._output_file_fp = open(output_file, "w")
+        # the file is opened on the first write, so that processes
+        # that do not write do not create or truncate it
+        self._output_file = output_file
+        self._output_file_fp = None
+
+    def get_output_file(self):
+        """
+        get the name of the output file
+        :return: str
+        """
+
+        return self._output_file
 
     def write_vertex(self, vertex):
         """
@@ -21,15 +32,48 @@ class Writer:
             "Writer write_vertex() interface not implemented"
         )
 
+    def format_batch(self, vertex_list):
+        """
+        format a list of serialized vertices as lines
+        :param vertex_list: a list of tuples (vertex_id, str)
+        :return: str
+        """
+
+        return "".join(["%d %s\n" % (v[0], v[1]) for v in vertex_list])
+
+    def open_part(self, index):
+        """
+        write to the part file of a worker instead of the output file
+        :param index: int, the worker index
+        :return: None
+        """
+
+        self.close()
+        self._output_file_fp = open(
+            "%s.part-%05d" % (self._output_file, index), "w"
+        )
+
     def write_batch_to_file(self, vertex_list):
         """
         write a vertex list to file
-        :param vertex_list: a list of Vertex objects
+        :param vertex_list: a list of tuples (vertex_id, str)
+        :return: None
+        """
+
+        if self._output_file_fp is None:
+            self._output_file_fp = open(self._output_file, "w")
+
+        self._output_file_fp.write(self.format_batch(vertex_list))
+
+    def close(self):
+        """
+        close the file pointer if it is open
         :return: None
         """
 
-        for v in vertex_list:
-            self._output_file_fp.write("%d %s\n" % (v[0], v[1]))
+        if self._output_file_fp is not None:
+            self._output_file_fp.close()
+            self._output_file_fp = None
 
     def __del__(self):
         """
@@ -37,4 +81,4 @@ class Writer:
         :return: None
         """
 
-        self._output_file_fp.close()
+        self.close()
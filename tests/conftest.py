@@ -0,0 +1,13 @@
+import os
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the tests import pypregel from this tree and the example apps
+# from their directories
+for path in (ROOT,
+             os.path.join(ROOT, "apps", "pagerank"),
+             os.path.join(ROOT, "apps", "sssp")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
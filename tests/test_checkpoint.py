@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from pypregel.checkpoint import _Checkpointer, _find_latest_checkpoint, \
+    _pack, _unpack
+
+
+@pytest.mark.parametrize("values", [
+    [],
+    [0, -1, 2 ** 63 - 1, -2 ** 63],
+    [0.1, -2.5, 1e300],
+    [2 ** 63, 1],
+    [1, 2.0],
+    [True, False],
+    [None, "a", (1, 2)],
+])
+def test_pack_round_trip(values):
+    unpacked = _unpack(_pack(values))
+
+    assert unpacked == values
+    assert [type(x) for x in unpacked] == [type(x) for x in values]
+
+
+def test_pack_uses_arrays_for_numbers():
+    assert _pack([1, 2]).dtype == np.int64
+    assert _pack([1.5]).dtype == np.float64
+    assert isinstance(_pack([2 ** 64]), bytes)
+
+
+def test_pack_copies_values():
+    values = [[1], [2]]
+    packed = _pack(values)
+    values[0].append(3)
+
+    assert _unpack(packed) == [[1], [2]]
+
+
+class _Comm:
+    """
+    a communicator whose allgather returns the items of all processes
+    """
+
+    def __init__(self, items):
+        self._items = items
+
+    def allgather(self, item):
+        return self._items
+
+
+def test_latest_common_checkpoint():
+    comm = _Comm([None,
+                  (2, {(2, 2), (4, 2), (6, 2)}),
+                  (2, {(2, 2), (4, 2)})])
+
+    assert _find_latest_checkpoint(comm, None) == 4
+
+
+def test_no_checkpoint():
+    comm = _Comm([None, (2, set()), (2, set())])
+
+    assert _find_latest_checkpoint(comm, None) is None
+
+
+def test_checkpoints_of_other_workers_raise_everywhere():
+    comm = _Comm([None, (2, {(4, 3)}), (2, {(4, 3)})])
+
+    # the master and the workers see the same gathered items
+    for checkpoints in (None, (2, {(4, 3)})):
+        with pytest.raises(ValueError, match="3 workers, not 2"):
+            _find_latest_checkpoint(comm, checkpoints)
+
+
+def test_available_checkpoints(tmp_path):
+    old = _Checkpointer(str(tmp_path), 2, 0, 3)
+    old.save(2, {"values": []}, 0.0)
+    old.wait()
+
+    new = _Checkpointer(str(tmp_path), 2, 0, 2)
+    new.save(4, {"values": []}, 0.0)
+    new.wait()
+
+    assert new.available_checkpoints() == (2, {(2, 3), (4, 2)})
+    assert new.load(4)["superstep"] == 4
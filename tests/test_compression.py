@@ -0,0 +1,85 @@
+from array import array
+
+import numpy as np
+import pytest
+
+from pypregel.compression import _BatchCodec, _decode_varints, \
+    _encode_varints
+
+
+@pytest.mark.parametrize("values", [
+    [],
+    [0],
+    [127, 128],
+    [16383, 16384],
+    [1, 0, 300, 2 ** 32, 5],
+    [2 ** 63 - 1, 2 ** 63, 2 ** 64 - 1],
+])
+def test_varints_round_trip(values):
+    values = np.array(values, dtype=np.uint64)
+    decoded = _decode_varints(_encode_varints(values))
+
+    assert decoded.dtype == np.uint64
+    assert decoded.tolist() == values.tolist()
+
+
+def test_varint_lengths():
+    # 7 bits per byte
+    assert _encode_varints(np.array([0], dtype=np.uint64)) == b"\x00"
+    assert _encode_varints(np.array([127], dtype=np.uint64)) == b"\x7f"
+    assert _encode_varints(np.array([128], dtype=np.uint64)) == b"\x80\x01"
+    assert len(_encode_varints(np.array([2 ** 64 - 1],
+                                        dtype=np.uint64))) == 10
+
+
+def _batch(num_of_messages, with_srcs):
+    rng = np.random.default_rng(0)
+    dsts = array("q", rng.integers(0, 50, num_of_messages).tolist())
+    srcs = rng.integers(0, 50, num_of_messages).tolist() if with_srcs \
+        else None
+    values = [("value", i) for i in range(num_of_messages)]
+    return dsts, srcs, values
+
+
+@pytest.mark.parametrize("codec", ["zlib", "lzma"])
+@pytest.mark.parametrize("with_srcs", [False, True])
+def test_batch_round_trip(codec, with_srcs):
+    dsts, srcs, values = _batch(1000, with_srcs)
+    data, num_of_bytes = _BatchCodec(codec, 256).encode(7, dsts, srcs,
+                                                        values)
+
+    assert num_of_bytes is not None
+    superstep, dsts2, srcs2, values2 = _BatchCodec(codec, 256).decode(data)
+
+    # the batch comes back sorted by destination, in a stable order
+    order = sorted(range(len(dsts)), key=lambda i: dsts[i])
+    assert superstep == 7
+    assert dsts2 == [dsts[i] for i in order]
+    assert values2 == [values[i] for i in order]
+    if with_srcs:
+        assert srcs2 == [srcs[i] for i in order]
+    else:
+        assert srcs2 is None
+
+
+def test_small_batch_is_not_compressed():
+    dsts, srcs, values = _batch(10, True)
+    codec = _BatchCodec("zlib", 256)
+    data, num_of_bytes = codec.encode(3, dsts, srcs, values)
+
+    assert num_of_bytes is None
+    superstep, dsts2, srcs2, values2 = codec.decode(bytearray(data))
+    assert superstep == 3
+    assert list(dsts2) == list(dsts)
+    assert srcs2 == srcs
+    assert values2 == values
+
+
+def test_large_vertex_ids():
+    dsts = array("q", [2 ** 62, 0, 2 ** 40, 2 ** 62])
+    codec = _BatchCodec("zlib", 1)
+    data, _ = codec.encode(1, dsts, None, [1, 2, 3, 4])
+
+    _, dsts2, _, values2 = codec.decode(data)
+    assert dsts2 == [0, 2 ** 40, 2 ** 62, 2 ** 62]
+    assert values2 == [2, 3, 1, 4]
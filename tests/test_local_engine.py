@@ -0,0 +1,136 @@
+import os
+
+import numpy as np
+import pytest
+
+import pagerank
+import sssp
+from pypregel import Pypregel
+from pypregel.aggregator import SumAggregator
+from pypregel.combiner import MinCombiner, SumCombiner
+
+
+# vertex -> [(dst, weight)]; vertex 4 is not reachable from vertex 0
+_SSSP_GRAPH = {
+    0: [(1, 4), (2, 1)],
+    1: [(3, 1)],
+    2: [(1, 2), (3, 5)],
+    3: [],
+    4: [(0, 1)],
+}
+_SSSP_DISTANCES = {0: 0, 1: 3, 2: 1, 3: 4, 4: sssp.INT_MAX}
+
+_PAGERANK_GRAPH = {
+    0: [1, 2],
+    1: [2],
+    2: [0],
+    3: [0, 2],
+}
+
+
+def _write_graph(tmp_path, lines):
+    config_file = str(tmp_path / "config.txt")
+    graph_file = str(tmp_path / "graph.txt")
+
+    with open(config_file, "w") as f:
+        f.write("%d\n" % len(lines))
+    with open(graph_file, "w") as f:
+        f.write("".join("%s\n" % line for line in lines))
+
+    return config_file, graph_file
+
+
+def _read_output(output_file):
+    values = dict()
+    with open(output_file) as f:
+        for line in f:
+            vid, value = line.split()
+            values[int(vid)] = float(value)
+
+    return values
+
+
+@pytest.mark.parametrize("storage", ["object", "csr", "disk"])
+@pytest.mark.parametrize("msg_dtype", [None, np.int64])
+def test_sssp(tmp_path, storage, msg_dtype):
+    config_file, graph_file = _write_graph(tmp_path, [
+        "%d:%s" % (vid, " ".join("%d,%d" % e for e in edges))
+        for vid, edges in _SSSP_GRAPH.items()
+    ])
+    output_file = str(tmp_path / "output.txt")
+    edge_dir = tmp_path / "edges"
+    edge_dir.mkdir()
+
+    Pypregel(
+        reader=sssp.SSSPReader(config_file, graph_file),
+        writer=sssp.SSSPWriter(output_file),
+        combiner=MinCombiner(),
+        msg_dtype=msg_dtype,
+        storage=storage,
+        engine="local",
+        edge_dir=str(edge_dir)
+    ).run()
+
+    assert _read_output(output_file) == _SSSP_DISTANCES
+
+    # the edge files of disk storage are deleted
+    assert os.listdir(str(edge_dir)) == []
+
+
+def _pagerank_reference(graph, num_of_supersteps):
+    """
+    the values of PageRankVertex after num_of_supersteps supersteps
+    """
+
+    n = len(graph)
+    matrix = np.zeros((n, n))
+    for src, dsts in graph.items():
+        for dst in dsts:
+            matrix[dst, src] = 1.0 / len(dsts)
+
+    values = np.zeros(n)
+    for _ in range(num_of_supersteps):
+        values = 0.15 / n + 0.85 * matrix.dot(values)
+
+    return dict(enumerate(values.tolist()))
+
+
+@pytest.mark.parametrize("storage", ["object", "csr"])
+@pytest.mark.parametrize("msg_dtype", [None, np.float64])
+def test_pagerank(tmp_path, storage, msg_dtype):
+    config_file, graph_file = _write_graph(tmp_path, [
+        "%d:%s" % (vid, " ".join(str(dst) for dst in dsts))
+        for vid, dsts in _PAGERANK_GRAPH.items()
+    ])
+    output_file = str(tmp_path / "output.txt")
+
+    # without a halt condition, every vertex computes
+    # MAX_SUPERSTEPS supersteps
+    Pypregel(
+        reader=pagerank.PageRankReader(config_file, graph_file),
+        writer=pagerank.PageRankWriter(output_file),
+        combiner=SumCombiner(),
+        msg_dtype=msg_dtype,
+        storage=storage,
+        engine="local",
+        aggregators={"delta": SumAggregator()}
+    ).run()
+
+    values = _read_output(output_file)
+    expected = _pagerank_reference(_PAGERANK_GRAPH, pagerank.MAX_SUPERSTEPS)
+
+    assert values.keys() == expected.keys()
+    for vid in expected:
+        assert values[vid] == pytest.approx(expected[vid], rel=1e-12)
+
+
+def test_local_engine_rejects_mpi_options(tmp_path):
+    config_file, graph_file = _write_graph(tmp_path, ["0:"])
+
+    with pytest.raises(ValueError, match="parallel_load needs the mpi"):
+        Pypregel(
+            reader=sssp.SSSPReader(config_file, graph_file),
+            writer=sssp.SSSPWriter(str(tmp_path / "output.txt")),
+            parallel_load=True,
+            engine="local"
+        )
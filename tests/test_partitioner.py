@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from pypregel.partitioner import LDGPartitioner, RangePartitioner
+
+
+def test_range_owners():
+    partitioner = RangePartitioner()
+    partitioner.setup(10, 3)
+
+    # worker i owns [n * i // w, n * (i + 1) // w)
+    owners = [0, 0, 0, 1, 1, 1, 2, 2, 2, 2]
+    assert [partitioner.get_worker(vid) for vid in range(10)] == owners
+    assert partitioner.get_workers(np.arange(10)).tolist() == owners
+
+
+@pytest.mark.parametrize("vid", [-1, 10])
+def test_range_rejects_ids_out_of_range(vid):
+    partitioner = RangePartitioner()
+    partitioner.setup(10, 3)
+
+    with pytest.raises(ValueError):
+        partitioner.get_worker(vid)
+    with pytest.raises(ValueError):
+        partitioner.get_workers(np.array([0, vid]))
+
+
+def test_ldg_owners():
+    partitioner = LDGPartitioner(slack=0.0)
+    partitioner.setup(12, 3)
+
+    # a chain: every vertex follows its predecessor until the worker
+    # is full
+    for vid in range(10):
+        partitioner.assign(vid, [vid - 1] if vid > 0 else [])
+
+    owners = [partitioner.get_worker(vid) for vid in range(12)]
+    assert partitioner.get_workers(np.arange(12)).tolist() == owners
+    assert partitioner.get_sizes().tolist() == [
+        owners[:10].count(i) for i in range(3)
+    ]
+    assert max(partitioner.get_sizes()) <= 4
+
+    # a vertex that was not assigned falls back to hashing
+    assert owners[10:] == [10 % 3, 11 % 3]
+
+
+def test_ldg_rejects_ids_out_of_range():
+    partitioner = LDGPartitioner()
+    partitioner.setup(4, 2)
+
+    with pytest.raises(ValueError):
+        partitioner.assign(4, [])
+    with pytest.raises(ValueError):
+        partitioner.assign(0, [1, 5])
+    with pytest.raises(ValueError):
+        partitioner.get_worker(-1)
+    with pytest.raises(ValueError):
+        partitioner.get_workers(np.array([0, 4]))
@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+
+from pypregel.combiner import SumCombiner
+from pypregel.spill import _MIN_RUN_SIZE, _MessageSpill
+
+
+def test_runs_are_merged_in_order(tmp_path):
+    spill = _MessageSpill(str(tmp_path), 0, None, False, None)
+
+    # two runs, each sorted when it is written
+    for dst_vid in (5, 1, 3, 1):
+        spill.add(100 + dst_vid, dst_vid, "a%d" % dst_vid)
+    spill.finish()
+    for dst_vid in (3, 0, 1):
+        spill.add(200 + dst_vid, dst_vid, "b%d" % dst_vid)
+    spill.finish()
+
+    assert len(os.listdir(str(tmp_path))) == 2
+    assert spill.num_of_messages == 7
+    assert spill.get_recipients() == [0, 1, 3, 5]
+
+    # each vertex once, in ascending order; the messages of the earlier
+    # run come first
+    assert list(spill.stream()) == [
+        (0, [(200, "b0")]),
+        (1, [(101, "a1"), (101, "a1"), (201, "b1")]),
+        (3, [(103, "a3"), (203, "b3")]),
+        (5, [(105, "a5")]),
+    ]
+
+    spill.close()
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_run_size_is_at_least_min_run_size(tmp_path):
+    spill = _MessageSpill(str(tmp_path), 1, None, True, None)
+
+    for i in range(_MIN_RUN_SIZE + 1):
+        spill.add(None, (_MIN_RUN_SIZE - i) % 10, i)
+
+    # one full run is written, the last message is still buffered
+    assert len(os.listdir(str(tmp_path))) == 1
+    spill.finish()
+    assert len(os.listdir(str(tmp_path))) == 2
+
+    merged = list(spill.stream())
+    assert [dst_vid for dst_vid, _ in merged] == list(range(10))
+    assert sum(len(msgs) for _, msgs in merged) == _MIN_RUN_SIZE + 1
+
+    spill.close()
+
+
+def test_typed_runs_are_combined(tmp_path):
+    spill = _MessageSpill(str(tmp_path), 0, np.float64, True, SumCombiner())
+
+    spill.add_arrays(np.array([4, 2, 4, 2, 9], dtype=np.int64),
+                     np.array([1.0, 2.0, 3.0, 4.0, 5.0]))
+    spill.finish()
+    spill.add_arrays(np.array([2, 0], dtype=np.int64),
+                     np.array([0.5, 0.25]))
+    spill.finish()
+
+    assert list(spill.stream()) == [
+        (0, [0.25]),
+        (2, [6.0, 0.5]),
+        (4, [4.0]),
+        (9, [5.0]),
+    ]
+
+    spill.close()
@@ -0,0 +1,66 @@
+import math
+
+import pytest
+
+from pypregel.tuning import Tuning, _FlushTuner
+
+
+# a send costs a fixed latency, the time of the bytes, and a penalty
+# growing with the size of the batch; the send time per byte is
+# lowest at sqrt(_LATENCY / _PENALTY) bytes
+_LATENCY = 1e-4
+_SEC_PER_BYTE = 1e-9
+_PENALTY = 1e-13
+_BEST_BYTES = math.sqrt(_LATENCY / _PENALTY)
+
+_BYTES_PER_MESSAGE = 100
+
+
+def _send_seconds(num_of_bytes):
+    return _LATENCY + num_of_bytes * _SEC_PER_BYTE + \
+        _PENALTY * num_of_bytes ** 2
+
+
+def _run_superstep(tuner):
+    for _ in range(4):
+        num_of_messages = tuner.capacities[1]
+        num_of_bytes = num_of_messages * _BYTES_PER_MESSAGE
+        tuner.record(1, num_of_messages, num_of_bytes,
+                     _send_seconds(num_of_bytes))
+
+    return tuner.end_superstep()
+
+
+def test_capacity_follows_message_size():
+    tuner = _FlushTuner(Tuning(buffer_capacity=10, flush_bytes=4096), 2, 0)
+
+    assert tuner.converged()
+    assert tuner.capacities == [10, 10]
+
+    tuner.record(1, 10, 10 * _BYTES_PER_MESSAGE, 0.0)
+    assert tuner.capacities[1] == 4096 // _BYTES_PER_MESSAGE
+
+
+@pytest.mark.parametrize("flush_bytes", [1 << 12, 1 << 16, 1 << 20])
+def test_adaptive_flush_size_converges(flush_bytes):
+    tuning = Tuning(buffer_capacity=10, flush_bytes=flush_bytes,
+                    adaptive=True, max_flush_bytes=1 << 24)
+    tuner = _FlushTuner(tuning, 2, 0)
+
+    for superstep in range(1, 21):
+        _run_superstep(tuner)
+        if tuner.converged():
+            break
+
+    # end of for
+
+    assert tuner.converged()
+    assert superstep <= 16
+
+    [(index, num_of_bytes, num_of_messages)] = tuner.get_flush_bytes()
+    assert index == 1
+    assert _BEST_BYTES / 2 <= num_of_bytes <= _BEST_BYTES * 2
+    assert num_of_messages == num_of_bytes // _BYTES_PER_MESSAGE
+
+    # the size stays once the search is done
+    assert not _run_superstep(tuner)